@@ -97,6 +97,7 @@ def generate_reorder_rules(combinations):
         
         rules.append({
             'item_id': combo['item_id'],
+            'warehouse_id': combo['warehouse_id'],
             'safety_stock': base_safety_stock,
             'lead_time_days': base_lead_time,
             'reorder_threshold': reorder_threshold,
@@ -402,10 +403,11 @@ def main():
     #     for rule in rules_list:
     #         cursor.execute("""
     #             INSERT INTO REORDER_RULES 
-    #             (item_id, safety_stock, lead_time_days, reorder_threshold, last_updated, rule_owner)
-    #             VALUES (%s, %s, %s, %s, %s, %s)
+    #             (item_id, warehouse_id, safety_stock, lead_time_days, reorder_threshold, last_updated, rule_owner)
+    #             VALUES (%s, %s, %s, %s, %s, %s, %s)
     #         """, (
     #             rule['item_id'],
+    #             rule['warehouse_id'],
     #             rule['safety_stock'],
     #             rule['lead_time_days'],
     #             rule['reorder_threshold'],
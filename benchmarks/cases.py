@@ -0,0 +1,141 @@
+"""
+What the benchmarks call: one case per database-facing function in
+src/snowflake/service.py (the SQL the routers used to inline lives there
+too). Arguments are picked from the loaded data, so every scale exercises
+the same code paths; writes run last and write back values already stored.
+
+CHECKS are invariants of the results, verified once per scale before the
+timings.
+"""
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from src.auth.models import UserInfo
+
+
+@dataclass
+class Sample:
+    """Arguments drawn from the dataset"""
+    item_id: str
+    warehouse_id: str
+    safety_stock: int
+    reorder_threshold: int
+    events: List[Dict[str, Any]]
+    user: UserInfo = field(default_factory=lambda: UserInfo(
+        id="bench-user", name="Benchmark User", email="benchmark@example.com", roles="GENERAL"
+    ))
+
+
+def draw_sample(db: Session) -> Sample:
+    """The item with the most stockouts, its latest rule and its events"""
+    item_id = db.execute(text("""
+        SELECT item_id FROM STOCKOUT_EVENTS GROUP BY item_id ORDER BY COUNT(*) DESC, item_id LIMIT 1
+    """)).scalar()
+    rule = db.execute(text("""
+        SELECT warehouse_id, safety_stock, reorder_threshold FROM REORDER_RULES
+        WHERE item_id = :item_id ORDER BY last_updated DESC LIMIT 1
+    """), {"item_id": item_id}).fetchone()
+    events = db.execute(text("""
+        SELECT item_id, warehouse_id, stockout_date, root_cause, analysis_confidence
+        FROM STOCKOUT_EVENTS WHERE item_id = :item_id
+    """), {"item_id": item_id}).fetchall()
+    return Sample(
+        item_id=item_id,
+        warehouse_id=rule[0],
+        safety_stock=int(rule[1]),
+        reorder_threshold=int(rule[2]),
+        events=[dict(row._mapping) for row in events],
+    )
+
+
+def _none(sample: Sample) -> Dict[str, Any]:
+    return {}
+
+
+def _item(sample: Sample) -> Dict[str, Any]:
+    return {"item_id": sample.item_id}
+
+
+@dataclass
+class Case:
+    function: str
+    kwargs: Callable[[Sample], Dict[str, Any]] = _none
+    writes: bool = False
+
+
+CASES = [
+    Case("get_events", lambda s: {"limit": 100}),
+    Case("get_event_details", _item),
+    Case("get_event_details_batch"),
+    Case("simulate_event", _item),
+    Case("simulate_items"),
+    Case("simulate_scenario", lambda s: {"safety_stock_multiplier": 1.5}),
+    Case("get_dashboard_summary", lambda s: {"days": 30}),
+    Case("get_root_cause_distribution"),
+    Case("get_stockout_trends", lambda s: {"days": 90}),
+    Case("get_trend_counts", lambda s: {"days": 90, "granularity": "week"}),
+    Case("get_inventory_points", lambda s: {"item_id": s.item_id, "days": 90}),
+    Case("get_inventory_timeline", lambda s: {"item_id": s.item_id, "days": 90, "max_points": 500}),
+    Case("get_forecast_accuracy", _item),
+    Case("get_forecast_pairs"),
+    Case("get_worst_forecast_items"),
+    Case("get_forecast_quality", _item),
+    Case("get_supplier_performance"),
+    Case("get_event_watermark"),
+    Case("get_fingerprint_versions"),
+    Case("get_similar_failures", _item),
+    Case("get_latest_stockout", _item),
+    Case("get_stockouts_for_analysis"),
+    Case("get_reorder_triggers", lambda s: {"days": 90}),
+    Case("get_rule_health"),
+    Case("get_recommendations"),
+    Case("get_replay_inputs", _item),
+    Case("compare_configurations", lambda s: {
+        "item_id": s.item_id,
+        "new_safety_stock": s.safety_stock * 2,
+        "new_threshold": s.reorder_threshold * 2,
+    }),
+    Case("iter_failure_report"),
+    Case("get_failure_report"),
+    Case("count_failure_report"),
+    Case("stream_failure_report", lambda s: {"fmt": "csv"}),
+    Case("get_root_cause_inputs"),
+    Case("reclassify_stockouts", lambda s: {"apply": False}),
+    Case("get_user_by_email", lambda s: {"email": s.user.email}),
+    Case("save_user_info", lambda s: {"user": s.user}, writes=True),
+    Case("update_user_role", lambda s: {"email": s.user.email, "role": "GENERAL"}, writes=True),
+    Case("create_users", lambda s: {"users": [{"email": s.user.email, "name": s.user.name}], "role": "GENERAL"}, writes=True),
+    Case("update_root_causes", lambda s: {"updates": s.events}, writes=True),
+]
+
+# Functions of service.py that never touch the database
+NO_DATABASE = {
+    "analysis_results",
+    "build_stockout_prompt",
+    "trend_granularity",
+}
+
+
+def _event_count(db: Session) -> int:
+    return db.execute(text("SELECT COUNT(*) FROM STOCKOUT_EVENTS")).scalar()
+
+
+def _failure_report_rows(db: Session, sample: Sample) -> Tuple[int, int]:
+    """The export holds one row per event, whatever the number of rules per item"""
+    from src.snowflake.service import get_failure_report
+    return _event_count(db), len(get_failure_report.uncached(db))
+
+
+def _failure_report_count(db: Session, sample: Sample) -> Tuple[int, int]:
+    from src.snowflake.service import count_failure_report
+    return _event_count(db), count_failure_report.uncached(db)
+
+
+# name -> check(db, sample) returning (expected, actual)
+CHECKS: Dict[str, Callable[[Session, Sample], Tuple[Any, Any]]] = {
+    "failure_report_rows_equal_events": _failure_report_rows,
+    "failure_report_count_equals_events": _failure_report_count,
+}
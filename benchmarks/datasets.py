@@ -0,0 +1,81 @@
+"""
+Datasets for the benchmarks.
+
+1x is the bundled CSV extract at the repo root. Larger scales come from the
+synthetic generator in SampleData.py with its item count multiplied by the
+scale (5 warehouses and 90 days per item, as in the extract). Items are
+generated a chunk at a time and appended to the CSVs, so 100x does not need
+the whole dataset in memory; a finished dataset is reused on later runs.
+"""
+import os
+import random
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+import SampleData
+from src.snowflake.columnar import TABLE_FILES
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Items generated per chunk
+CHUNK_ITEMS = 250
+# Written once every table of a dataset is complete
+COMPLETE_MARKER = ".complete"
+
+
+def _generate_chunk(first_item: int, last_item: int, seed: int) -> Dict[str, List[dict]]:
+    """Steps 1-6 of SampleData.main for items [first_item, last_item)"""
+    random.seed(seed)
+    np.random.seed(seed)
+    combinations = [
+        {"item_id": SampleData.generate_item_id(i), "warehouse_id": SampleData.generate_warehouse_id(w)}
+        for i in range(first_item, last_item)
+        for w in range(SampleData.NUM_WAREHOUSES)
+    ]
+    rules = SampleData.generate_reorder_rules(combinations)
+    rules_map = {r["item_id"]: r for r in rules}
+    forecasts = SampleData.generate_demand_forecast(combinations, rules_map)
+    forecast_map = {(f["item_id"], f["forecast_date"]): f for f in forecasts}
+    snapshots, _ = SampleData.generate_inventory_snapshots(combinations, rules_map, forecast_map)
+    orders = SampleData.generate_purchase_orders(combinations, rules_map, snapshots)
+    events = SampleData.generate_stockout_events(combinations, rules_map, snapshots, orders)
+    return {
+        "REORDER_RULES": rules,
+        "DEMAND_FORECAST": forecasts,
+        "INVENTORY_SNAPSHOT": snapshots,
+        "PURCHASE_ORDERS": orders,
+        "STOCKOUT_EVENTS": events,
+    }
+
+
+def generate_dataset(path: str, items: int, seed: int = 0) -> None:
+    """Write a dataset of `items` items to `path` in the bundled CSV layout"""
+    os.makedirs(path, exist_ok=True)
+    for file_name in TABLE_FILES.values():
+        if os.path.exists(os.path.join(path, file_name)):
+            os.remove(os.path.join(path, file_name))
+
+    next_order = 0
+    for first in range(0, items, CHUNK_ITEMS):
+        tables = _generate_chunk(first, min(first + CHUNK_ITEMS, items), seed + first)
+        # Order ids restart in every chunk; number them across the dataset
+        for order in tables["PURCHASE_ORDERS"]:
+            order["order_id"] = SampleData.generate_order_id(next_order)
+            next_order += 1
+        for name, rows in tables.items():
+            file_path = os.path.join(path, TABLE_FILES[name])
+            if rows:
+                pd.DataFrame(rows).to_csv(file_path, mode="a", header=not os.path.exists(file_path), index=False)
+    open(os.path.join(path, COMPLETE_MARKER), "w").close()
+
+
+def dataset_dir(scale: int, root: str) -> str:
+    """Directory holding the CSVs for `scale` (generated under `root` on first use)"""
+    if scale == 1:
+        return REPO_ROOT
+    path = os.path.join(root, f"{scale}x")
+    if not os.path.exists(os.path.join(path, COMPLETE_MARKER)):
+        generate_dataset(path, SampleData.NUM_ITEMS * scale)
+    return path
@@ -0,0 +1,285 @@
+"""
+Offline microbenchmarks of the service layer.
+
+    python -m benchmarks.run --scales 1,10,100 --repeat 5 --output benchmark-results.json
+
+Every database-facing function of src/snowflake/service.py (see cases.py)
+runs against a DuckDB stand-in loaded with the bundled CSVs (1x) or with
+data from the synthetic generator (10x, 100x, ...), no Snowflake account
+needed. Per function the report holds:
+
+- cold_seconds: min / median / p95 over `--repeat` runs with the read cache
+  (and the similarity index) emptied first, so every run reaches the database
+- warm_seconds: median of the same call served by the read cache
+- statements and db_seconds of the last cold run (see metrics.track_request)
+- result_rows and result_bytes (the JSON size of the result)
+
+The invariants in cases.CHECKS run first; a failed check is reported like a
+failed case.
+
+Each scale runs in a subprocess of its own, so module state (read cache,
+table versions, rollups, the similarity index) never carries across scales.
+Timings are DuckDB's, not Snowflake's: compare them across commits and
+scales, not with production latency.
+"""
+import argparse
+import inspect
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from importlib.metadata import PackageNotFoundError, version
+from typing import Any, Dict, List, Optional
+
+# The service layer reads its configuration on import: query the stand-in
+# through the Snowflake code path, with the in-memory read cache only
+os.environ["ANALYTICS_BACKEND"] = "snowflake"
+os.environ["READ_CACHE_DIR"] = ""
+os.environ.setdefault("REDIRECT_URI", "http://localhost:8000/auth/callback")
+
+import numpy as np  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from benchmarks.cases import CASES, CHECKS, NO_DATABASE, Case, Sample, draw_sample  # noqa: E402
+from benchmarks.datasets import dataset_dir  # noqa: E402
+from benchmarks.standin import create_standin  # noqa: E402
+from src.snowflake import service  # noqa: E402
+from src.snowflake.columnar import TABLE_FILES, Table  # noqa: E402
+from src.snowflake.read_cache import invalidate_versions, read_cache  # noqa: E402
+from src.snowflake.rollups import refresh_rollups  # noqa: E402
+from src.utils.metrics import instrument_engine, query_label, track_request  # noqa: E402
+
+DEFAULT_DATA_DIR = os.path.join(tempfile.gettempdir(), "retrace-benchmarks")
+
+
+def _materialize(result: Any) -> Any:
+    """Drain generators so streamed results are timed to their last chunk"""
+    if inspect.isgenerator(result):
+        return list(result)
+    return result
+
+
+def _jsonable(result: Any) -> Any:
+    if isinstance(result, Table):
+        return result.records()
+    if isinstance(result, (list, tuple)):
+        return [_jsonable(value) for value in result]
+    if isinstance(result, dict):
+        return {str(key): _jsonable(value) for key, value in result.items()}
+    if isinstance(result, bytes):
+        return result.decode("utf-8", "replace")
+    if isinstance(result, np.generic):
+        return result.item()
+    return result
+
+
+def _row_count(result: Any) -> Optional[int]:
+    """Rows of a row-shaped result (batches and table tuples are summed)"""
+    if isinstance(result, Table):
+        return len(result)
+    if isinstance(result, tuple) and all(isinstance(t, Table) for t in result):
+        return sum(len(t) for t in result)
+    if isinstance(result, list):
+        if any(isinstance(chunk, bytes) for chunk in result):
+            return None
+        if result and all(isinstance(batch, list) for batch in result):
+            return sum(len(batch) for batch in result)
+        return len(result)
+    return None
+
+
+def _percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q))
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    return {
+        "min": round(min(values), 6),
+        "median": round(statistics.median(values), 6),
+        "p95": round(_percentile(values, 95), 6),
+    }
+
+
+def _call(Session, case: Case, kwargs: Dict[str, Any]):
+    """One timed call in a fresh session; returns (seconds, result, timings)"""
+    fn = getattr(service, case.function)
+    db = Session()
+    try:
+        with query_label(case.function), track_request() as timings:
+            start = time.perf_counter()
+            result = _materialize(fn(db, **kwargs))
+            elapsed = time.perf_counter() - start
+    finally:
+        db.close()
+    return elapsed, result, timings
+
+
+def _reset_caches() -> None:
+    read_cache.clear()
+    service.failure_index._clear()
+
+
+def run_case(Session, case: Case, sample: Sample, repeat: int) -> Dict[str, Any]:
+    kwargs = case.kwargs(sample)
+    entry: Dict[str, Any] = {"function": case.function, "writes": case.writes}
+    try:
+        cold = []
+        for _ in range(repeat):
+            _reset_caches()
+            elapsed, result, timings = _call(Session, case, kwargs)
+            cold.append(elapsed)
+        entry["cold_seconds"] = _summary(cold)
+        entry["statements"] = timings.statements
+        entry["db_seconds"] = round(timings.db_seconds, 6)
+
+        if not case.writes:
+            warm = [_call(Session, case, kwargs)[0] for _ in range(repeat)]
+            entry["warm_seconds"] = round(statistics.median(warm), 6)
+
+        entry["result_rows"] = _row_count(result)
+        entry["result_bytes"] = len(json.dumps(_jsonable(result), default=str).encode())
+    except Exception as exc:
+        entry["error"] = f"{type(exc).__name__}: {str(exc).splitlines()[0] if str(exc) else ''}"
+    return entry
+
+
+def run_checks(Session, sample: Sample) -> List[Dict[str, Any]]:
+    results = []
+    for name, check in CHECKS.items():
+        db = Session()
+        try:
+            expected, actual = check(db, sample)
+            results.append({"check": name, "expected": expected, "actual": actual, "passed": expected == actual})
+        except Exception as exc:
+            results.append({"check": name, "passed": False, "error": f"{type(exc).__name__}: {exc}"})
+        finally:
+            db.close()
+    return results
+
+
+def uncovered_functions() -> List[str]:
+    """Public functions of service.py with no case and no reason to skip"""
+    covered = {case.function for case in CASES} | NO_DATABASE
+    return sorted(
+        name for name, fn in inspect.getmembers(service, inspect.isfunction)
+        if fn.__module__ == service.__name__ and not name.startswith("_") and name not in covered
+    )
+
+
+def run_scale(scale: int, repeat: int, data_dir: str) -> Dict[str, Any]:
+    source = dataset_dir(scale, data_dir)
+    os.makedirs(data_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    engine = create_standin(os.path.join(data_dir, f"standin-{scale}x.duckdb"), source)
+    load_seconds = time.perf_counter() - start
+    instrument_engine(engine, "benchmark")
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    with engine.connect() as conn:
+        rows = {name: conn.exec_driver_sql(f"SELECT COUNT(*) FROM {name}").scalar() for name in TABLE_FILES}
+    db = Session()
+    try:
+        sample = draw_sample(db)
+        # Dashboard reads use the rollups once a write path or job has built them
+        start = time.perf_counter()
+        refresh_rollups(db)
+        rollup_seconds = time.perf_counter() - start
+    finally:
+        db.close()
+
+    checks = run_checks(Session, sample)
+    invalidate_versions()
+    # Reads first: the writes change what the reads would see
+    cases = sorted(CASES, key=lambda case: case.writes)
+    results = [run_case(Session, case, sample, repeat) for case in cases]
+    engine.dispose()
+
+    return {
+        "scale": scale,
+        "as_of": engine.as_of.isoformat(),
+        "load_seconds": round(load_seconds, 3),
+        "rollup_refresh_seconds": round(rollup_seconds, 3),
+        "rows": rows,
+        "sample_item": sample.item_id,
+        "checks": checks,
+        "cases": results,
+        "skipped": {name: "no database access" for name in sorted(NO_DATABASE)},
+        "uncovered": uncovered_functions(),
+    }
+
+
+def _environment() -> Dict[str, Any]:
+    packages = {}
+    for package in ("duckdb", "duckdb_engine", "sqlglot", "sqlalchemy", "numpy", "pandas"):
+        try:
+            packages[package] = version(package)
+        except PackageNotFoundError:
+            packages[package] = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "packages": packages,
+    }
+
+
+def _run_in_subprocess(scale: int, args) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, "scale.json")
+        completed = subprocess.run([
+            sys.executable, "-m", "benchmarks.run",
+            "--scales", str(scale), "--repeat", str(args.repeat),
+            "--data-dir", args.data_dir, "--output", output, "--in-process",
+        ])
+        # A scale with failures still writes its report and exits 1; anything else is a crash
+        if not os.path.exists(output):
+            raise subprocess.CalledProcessError(completed.returncode, completed.args)
+        with open(output) as f:
+            return json.load(f)["scales"][0]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Exit status 1 when any case raised or any check failed, for CI"""
+    parser = argparse.ArgumentParser(description="Time the service layer against a local DuckDB stand-in")
+    parser.add_argument("--scales", default="1,10,100", help="Comma-separated multiples of the bundled dataset")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per function (cold and warm)")
+    parser.add_argument("--output", default="benchmark-results.json", help="JSON report path ('-' for stdout)")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="Where generated datasets and DuckDB files go")
+    parser.add_argument("--in-process", action="store_true", help="Run the scales in this process")
+    args = parser.parse_args(argv)
+
+    scales = [int(s) for s in args.scales.split(",") if s.strip()]
+    if args.in_process:
+        reports = [run_scale(scale, args.repeat, args.data_dir) for scale in scales]
+    else:
+        reports = [_run_in_subprocess(scale, args) for scale in scales]
+
+    report = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "repeat": args.repeat,
+        "environment": _environment(),
+        "scales": reports,
+    }
+    body = json.dumps(report, indent=2, default=str)
+    failed = sum(1 for scale in reports for case in scale["cases"] if "error" in case)
+    broken = sum(1 for scale in reports for check in scale["checks"] if not check["passed"])
+    if args.output == "-":
+        print(body)
+    else:
+        with open(args.output, "w") as f:
+            f.write(body)
+    print(
+        f"Wrote {args.output}: {len(reports)} scale(s), {failed} failed case(s), {broken} failed check(s)",
+        file=sys.stderr
+    )
+    return 1 if failed or broken else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
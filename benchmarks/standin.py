@@ -0,0 +1,93 @@
+"""
+DuckDB stand-in for the Snowflake schema.
+
+The five analytics tables are loaded from a directory of CSVs in the bundled
+layout, and every statement the service layer sends is transpiled from
+Snowflake SQL to DuckDB by sqlglot on its way to the driver, so the code
+under test runs unchanged. Parameters are bound by number ($1, $2, ...), so
+they stay attached to their values wherever the rewrite moves them. On top of the dialect translation:
+
+- CURRENT_DATE() is pinned to the day after the last snapshot, so queries
+  over "the last N days" see the data whatever day the benchmark runs
+- INFORMATION_SCHEMA.TABLES reads come from STANDIN_TABLE_VERSIONS, which
+  carries the LAST_ALTERED times the read cache keys on
+
+No credentials are involved: the database is a local DuckDB file.
+"""
+import os
+from datetime import date, timedelta
+from functools import lru_cache
+
+import sqlglot
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlglot import exp
+
+from src.snowflake.columnar import TABLE_FILES
+from src.utils.config import RETRACE_USER
+
+VERSIONS_TABLE = "STANDIN_TABLE_VERSIONS"
+
+
+def _rewrite(node: exp.Expression, as_of: str) -> exp.Expression:
+    if isinstance(node, exp.CurrentDate):
+        return exp.cast(exp.Literal.string(as_of), "DATE")
+    if isinstance(node, exp.Table) and node.db.upper() == "INFORMATION_SCHEMA" and node.name.upper() == "TABLES":
+        return exp.to_table(VERSIONS_TABLE, alias=node.alias or None)
+    return node
+
+
+def make_transpiler(as_of: date):
+    """Snowflake statement -> DuckDB statement, memoized per statement text"""
+    as_of = as_of.isoformat()
+
+    @lru_cache(maxsize=4096)
+    def transpile(statement: str) -> str:
+        trees = [tree for tree in sqlglot.parse(statement, read="snowflake") if tree is not None]
+        return ";\n".join(tree.transform(_rewrite, as_of).sql(dialect="duckdb") for tree in trees)
+
+    return transpile
+
+
+def _load(engine: Engine, data_dir: str) -> date:
+    """Create the tables from the CSVs; returns the day after the last snapshot"""
+    with engine.begin() as conn:
+        for name, file_name in TABLE_FILES.items():
+            source = os.path.join(data_dir, file_name).replace("'", "''")
+            conn.exec_driver_sql(f"CREATE OR REPLACE TABLE {name} AS SELECT * FROM read_csv_auto('{source}')")
+        # Same derivation as the columnar store: the extract has no forecast_created_date
+        columns = {row[0].lower() for row in conn.exec_driver_sql("DESCRIBE DEMAND_FORECAST").fetchall()}
+        if "forecast_created_date" not in columns:
+            conn.exec_driver_sql("ALTER TABLE DEMAND_FORECAST ADD COLUMN forecast_created_date DATE")
+            conn.exec_driver_sql("UPDATE DEMAND_FORECAST SET forecast_created_date = forecast_date")
+
+        conn.exec_driver_sql(f"""
+            CREATE OR REPLACE TABLE {RETRACE_USER} (
+                ID VARCHAR, NAME VARCHAR, EMAIL VARCHAR, ROLES VARCHAR, IS_ACTIVE BOOLEAN
+            )
+        """)
+        conn.exec_driver_sql(f"""
+            CREATE OR REPLACE TABLE {VERSIONS_TABLE} AS
+            SELECT table_name, CURRENT_SCHEMA() AS table_schema, CAST(NOW() AS VARCHAR) AS last_altered
+            FROM (VALUES {", ".join(f"('{name}')" for name in TABLE_FILES)}) AS t(table_name)
+        """)
+        last_snapshot = conn.exec_driver_sql("SELECT CAST(MAX(snapshot_time) AS DATE) FROM INVENTORY_SNAPSHOT").scalar()
+    return (last_snapshot or date.today()) + timedelta(days=1)
+
+
+def create_standin(path: str, data_dir: str) -> Engine:
+    """DuckDB engine at `path` holding the CSVs of `data_dir`, speaking Snowflake SQL"""
+    if os.path.exists(path):
+        os.remove(path)
+    # Numbered $n binds: sqlglot reorders (DATEADD) and repeats (GREATEST) the
+    # arguments it rewrites, which would misbind positional ? markers
+    engine = create_engine(f"duckdb:///{path}", paramstyle="numeric_dollar")
+    as_of = _load(engine, data_dir)
+    transpile = make_transpiler(as_of)
+
+    @event.listens_for(engine, "before_cursor_execute", retval=True)
+    def _to_duckdb(conn, cursor, statement, parameters, context, executemany):
+        return transpile(statement), parameters
+
+    engine.as_of = as_of
+    return engine
@@ -0,0 +1,37 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+
+from src.auth.dependencies import authorize_token
+from src.auth.models import UserInfo
+from src.utils.metrics import recent_statements
+from src.utils.middleware import slow_requests
+
+router = APIRouter()
+
+
+@router.get("/slow-requests")
+async def list_slow_requests(
+    _: UserInfo = Depends(authorize_token("ADMIN")),
+    limit: int = Query(50, ge=1, le=1000),
+    route: Optional[str] = Query(None, description="Route template, e.g. /events/dashboard-summary")
+):
+    """
+    **Requests that took SLOW_REQUEST_SECONDS or longer, newest first**
+
+    Each entry has the route, parameters, user, status, response size and
+    its time split into DB, pool wait and Python time, with the Snowflake
+    query IDs of its statements.
+    """
+    return slow_requests.records(limit, route)
+
+
+@router.get("/recent-statements")
+async def list_recent_statements(
+    _: UserInfo = Depends(authorize_token("ADMIN")),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """
+    **Latest SQL statements with their service function, time, rows and Snowflake query ID**
+    """
+    return recent_statements(limit)
@@ -1,3 +1,6 @@
+import hashlib
+import sys
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 
@@ -6,10 +9,18 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 
 from src.auth.models import UserInfo
-from src.utils.config import JWT_SECRET
+from src.utils.cache import LRUCache, SQLiteCache
+from src.utils.config import JWT_CACHE_MAX_ENTRIES, JWT_REVOCATION_DIR, JWT_SECRET
 
 authenticate = HTTPBearer()
 
+# Users of verified tokens, each kept until its token's exp. Keyed by the
+# token's SHA-256, so the cache never holds a usable credential.
+_verified = LRUCache(max_entries=JWT_CACHE_MAX_ENTRIES)
+# Digests of revoked tokens, on disk so every worker sees a logout. Rows are
+# never evicted, only purged once their token has expired anyway.
+_revoked = SQLiteCache(f"{JWT_REVOCATION_DIR}/revoked_tokens.sqlite", max_entries=sys.maxsize)
+
 
 def create_jwt_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
@@ -32,18 +43,55 @@ def decode_jwt_token(token: str) -> Optional[dict]:
     except JWTError:
         return None
 
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def revoke_token(token: str) -> None:
+    """Reject `token` from now on, in every worker, even before it expires"""
+    key = _token_key(token)
+    try:
+        expires_at = float(jwt.get_unverified_claims(token).get("exp") or 0)
+    except JWTError:
+        expires_at = 0.0
+    _revoked.purge_expired()
+    # Without a readable exp the token may never expire; keep it revoked
+    _revoked.set(key, True, ttl=expires_at - time.time() if expires_at else float("inf"))
+    _verified.delete(key)
+
+
+def verified_user(token: str) -> Optional[UserInfo]:
+    """User of a valid, unrevoked token; decoded once, then served from memory until exp"""
+    key = _token_key(token)
+    # Checked before the memory cache: another worker may have revoked it
+    if _revoked.get(key, False):
+        return None
+    user = _verified.get(key)
+    if user is not None:
+        return user
+
+    payload = decode_jwt_token(token)
+    if payload is None:
+        return None
+    user = UserInfo(**payload)
+    # Tokens without exp are not cached: there is no time to expire them at
+    if payload.get("exp"):
+        _verified.set(key, user, ttl=float(payload["exp"]) - time.time())
+    return user
+
+
 def authorize_token(required_role: Optional[str] = None):
-    def verify_token(credentials: HTTPAuthorizationCredentials = Depends(authenticate)):
-        token = credentials.credentials
-        payload = decode_jwt_token(token)
+    def verify_token(request: Request, credentials: HTTPAuthorizationCredentials = Depends(authenticate)):
+        user = verified_user(credentials.credentials)
 
-        if payload is None:
+        if user is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid token or token expired"
             )
 
-        user = UserInfo(**payload)
+        # Read by the request metrics middleware for slow-request records
+        request.state.user = user.email
 
         if required_role and user.roles != required_role:
             raise HTTPException(
@@ -0,0 +1,141 @@
+"""
+Azure AD sign-in: the authorization-code exchange and the Graph profile read.
+
+One MSAL application and one connection-pooled httpx.AsyncClient serve every
+login for the app's lifetime; the lifespan in main.py opens and closes them.
+MSAL is blocking (its constructor fetches the tenant's OpenID configuration
+and the code exchange is a synchronous POST), so both run on a small
+executor of their own: a burst of logins waits there instead of stalling
+the event loop or taking the threads other requests run on.
+
+Tokens are only needed once, to read the profile, so the MSAL application
+keeps none: its default in-memory cache would otherwise hold every signed-in
+user's access and refresh tokens for the life of the process.
+
+With SSO_BACKEND=stub the same code talks to sso_stub.py in-process. The stub
+signs in whoever the authorization code names, so it is refused unless
+ENVIRONMENT is a development or test one.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+import httpx
+import msal
+
+from src.utils.config import (
+    ENVIRONMENT,
+    GRAPH_API_URL,
+    REDIRECT_URI,
+    SSO_AUTHORITY_HOST,
+    SSO_BACKEND,
+    SSO_CLIENT_ID,
+    SSO_CLIENT_SECRET,
+    SSO_MAX_CONCURRENCY,
+    SSO_TENANT_ID,
+    SSO_TIMEOUT_SECONDS,
+)
+
+SCOPES = ["User.Read"]
+
+# Where SSO_BACKEND=stub may run
+STUB_ENVIRONMENTS = ("development", "dev", "local", "test")
+
+sso_executor = ThreadPoolExecutor(max_workers=SSO_MAX_CONCURRENCY, thread_name_prefix="sso")
+
+
+class _DiscardingTokenCache(msal.TokenCache):
+    """Token cache that stores nothing: MSAL still returns the tokens it obtains"""
+
+    def add(self, event, now=None):
+        pass
+
+
+class SSOClient:
+    """Shared MSAL application (built on first use) and Graph HTTP client"""
+
+    def __init__(self, msal_http_client: Any = None, graph_transport: Optional[httpx.AsyncBaseTransport] = None):
+        # None lets MSAL keep its own requests.Session
+        self._msal_http_client = msal_http_client
+        self._msal_app: Optional[msal.ConfidentialClientApplication] = None
+        self._msal_lock = threading.Lock()
+        self.graph = httpx.AsyncClient(
+            base_url=GRAPH_API_URL,
+            timeout=SSO_TIMEOUT_SECONDS,
+            transport=graph_transport,
+        )
+
+    def _app(self) -> msal.ConfidentialClientApplication:
+        with self._msal_lock:
+            if self._msal_app is None:
+                self._msal_app = msal.ConfidentialClientApplication(
+                    SSO_CLIENT_ID,
+                    authority=f"{SSO_AUTHORITY_HOST}/{SSO_TENANT_ID or 'common'}",
+                    client_credential=SSO_CLIENT_SECRET,
+                    http_client=self._msal_http_client,
+                    timeout=SSO_TIMEOUT_SECONDS,
+                    token_cache=_DiscardingTokenCache(),
+                )
+            return self._msal_app
+
+    def _exchange(self, code: str) -> Dict[str, Any]:
+        return self._app().acquire_token_by_authorization_code(code, scopes=SCOPES, redirect_uri=REDIRECT_URI)
+
+    async def acquire_token(self, code: str) -> Dict[str, Any]:
+        """MSAL's result for an authorization code: `access_token` on success, `error` otherwise"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(sso_executor, self._exchange, code)
+
+    async def get_profile(self, access_token: str) -> Optional[Dict[str, Any]]:
+        """Graph `/me` of the signed-in user, or None when Graph refuses"""
+        response = await self.graph.get("/me", headers={"Authorization": f"Bearer {access_token}"})
+        if response.status_code != 200:
+            return None
+        return response.json()
+
+    async def aclose(self) -> None:
+        await self.graph.aclose()
+        close = getattr(self._msal_http_client, "close", None)
+        if close is not None:
+            close()
+
+
+def _create_client() -> SSOClient:
+    if SSO_BACKEND == "stub":
+        if (ENVIRONMENT or "").lower() not in STUB_ENVIRONMENTS:
+            raise RuntimeError(
+                f"SSO_BACKEND=stub accepts any authorization code; set ENVIRONMENT to one of "
+                f"{', '.join(STUB_ENVIRONMENTS)} to use it (ENVIRONMENT is {ENVIRONMENT!r})"
+            )
+        from fastapi.testclient import TestClient
+
+        from src.auth.sso_stub import stub_app
+
+        # TestClient serves any URL from the app, so MSAL keeps its real https authority
+        return SSOClient(
+            msal_http_client=TestClient(stub_app),
+            graph_transport=httpx.ASGITransport(app=stub_app),
+        )
+    return SSOClient()
+
+
+_client: Optional[SSOClient] = None
+_client_lock = threading.Lock()
+
+
+def sso_client() -> SSOClient:
+    """The shared client, created on first use if the lifespan has not started it"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = _create_client()
+        return _client
+
+
+async def close_sso_client() -> None:
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    if client is not None:
+        await client.aclose()
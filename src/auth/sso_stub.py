@@ -0,0 +1,60 @@
+"""
+Local stand-in for the Azure AD token endpoint and Microsoft Graph `/me`.
+
+Used with SSO_BACKEND=stub: sso.py sends MSAL's and the Graph client's
+requests to this app in-process, whatever host the URLs name, so the whole
+sign-in path runs without a tenant or network access.
+
+Any authorization code signs in: `alice@example.com` as that address, or
+`alice@example.com|Alice Example` with a display name. The code `invalid`
+is rejected the way Azure AD rejects a used or expired code.
+"""
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+stub_app = FastAPI(title="SSO stand-in", docs_url=None, redoc_url=None, openapi_url=None)
+
+_TOKEN_PREFIX = "stub-token:"
+
+
+@stub_app.get("/{tenant}/v2.0/.well-known/openid-configuration")
+def openid_configuration(tenant: str, request: Request):
+    base = f"{request.url.scheme}://{request.url.netloc}/{tenant}"
+    return {
+        "issuer": f"{base}/v2.0",
+        "authorization_endpoint": f"{base}/oauth2/v2.0/authorize",
+        "token_endpoint": f"{base}/oauth2/v2.0/token",
+    }
+
+
+@stub_app.post("/{tenant}/oauth2/v2.0/token")
+async def token(tenant: str, request: Request):
+    form = await request.form()
+    code = str(form.get("code") or "")
+    if form.get("grant_type") != "authorization_code" or not code or code == "invalid":
+        return JSONResponse(status_code=400, content={
+            "error": "invalid_grant",
+            "error_description": "The provided authorization code is invalid or has expired.",
+        })
+    return {
+        "token_type": "Bearer",
+        "scope": "User.Read",
+        "expires_in": 3600,
+        "access_token": _TOKEN_PREFIX + code,
+    }
+
+
+@stub_app.get("/{version}/me")
+def me(version: str, request: Request):
+    token = request.headers.get("authorization", "").removeprefix("Bearer ")
+    if not token.startswith(_TOKEN_PREFIX):
+        return JSONResponse(status_code=401, content={"error": {"code": "InvalidAuthenticationToken"}})
+    email, _, name = token[len(_TOKEN_PREFIX):].partition("|")
+    return {
+        "id": str(uuid.uuid5(uuid.NAMESPACE_URL, email.lower())),
+        "displayName": name or email.split("@")[0],
+        "userPrincipalName": email,
+        "mail": email,
+    }
@@ -2,13 +2,14 @@ from fastapi import APIRouter, UploadFile, File, Body, Form
 from pydantic import BaseModel
 from uuid import uuid4
 import tempfile, os, json
-from typing import Optional
+from typing import List, Optional
 
 from dotenv import load_dotenv
 from src.utils import extract_candidates
 
 # from src.utils.embed_and_upsert import embed, upsert_row, load_snowflake_env
-from src.aws.service import embed
+from src.aws.service import embed, parse_resumes, remove_uploads
+from src.jobs.service import job_manager
 import snowflake.connector
 
 from fastapi import Depends, HTTPException, status
@@ -88,6 +89,56 @@ async def parse_resume(
         return {"success": False, "error": str(e)}
 
 
+# --------------------------
+# Batch Resume Parser (background job)
+# --------------------------
+RESUME_JOB_OWNER = "cortex-api"
+
+
+@router.post("/parse-resume/batch", status_code=202)
+async def parse_resume_batch(
+    files: List[UploadFile] = File(None),
+    texts: List[str] = Form(None),
+    authorized: bool = Depends(authenticate)
+):
+    """
+    Queue many resumes (files and/or raw texts) for parsing and return a job id.
+    Poll `/cortex/parse-resume/batch/{job_id}` for progress and results.
+    """
+    files, texts = files or [], texts or []
+    if not files and not texts:
+        return {"success": False, "error": "Missing files/texts"}
+
+    saved = []
+    for file in files:
+        temp_path = os.path.join(tempfile.gettempdir(), f"{uuid4()}_{os.path.basename(file.filename or 'resume')}")
+        with open(temp_path, "wb") as f:
+            f.write(await file.read())
+        saved.append((temp_path, file.filename))
+
+    job = job_manager.submit(
+        "resume-parse", RESUME_JOB_OWNER, parse_resumes, saved, texts,
+        on_finish=lambda: remove_uploads(saved)
+    )
+    return {"success": True, "job": job.info()}
+
+
+@router.get("/parse-resume/batch/{job_id}")
+async def parse_resume_batch_status(job_id: str, authorized: bool = Depends(authenticate)):
+    job = job_manager.get(job_id, owner=RESUME_JOB_OWNER)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"success": True, "job": job.info(), "results": job.result}
+
+
+@router.delete("/parse-resume/batch/{job_id}")
+async def cancel_parse_resume_batch(job_id: str, authorized: bool = Depends(authenticate)):
+    job = job_manager.get(job_id, owner=RESUME_JOB_OWNER)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"success": True, "job": job_manager.cancel(job).info()}
+
+
 # --------------------------
 # 2️⃣ Embedding Only
 # --------------------------
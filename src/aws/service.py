@@ -3,6 +3,8 @@ import os, json, csv, time, math
 import snowflake.connector
 from dotenv import load_dotenv
 
+from src.utils import extract_candidates
+
 
 # ================================
 # OTHER CONFIG
@@ -32,3 +34,40 @@ def embed(text: str):
     )
     payload = json.loads(resp["body"].read())
     return payload["embedding"]
+
+
+# ================================
+# BATCH RESUME PARSING (background job)
+# ================================
+def parse_resumes(job, files: list, texts: list):
+    """
+    Parse uploaded resume files (temp paths, each removed once parsed) and raw
+    texts. One result per input, in order; a failing resume does not stop the
+    batch. Submit with `on_finish=lambda: remove_uploads(files)` so the files
+    go even if the job is cancelled or fails before reaching them.
+    """
+    total = len(files) + len(texts)
+    results = []
+    for path, filename in files:
+        try:
+            results.append({"source": filename, "success": True, "data": extract_candidates.process_resume(path)})
+        except Exception as e:
+            results.append({"source": filename, "success": False, "error": str(e)})
+        os.remove(path)
+        job.report(len(results), total)
+
+    for i, text in enumerate(texts):
+        try:
+            parsed = extract_candidates.call_bedrock_claude(text)
+            results.append({"source": f"text[{i}]", "success": True, "data": extract_candidates.normalize_record(parsed)})
+        except Exception as e:
+            results.append({"source": f"text[{i}]", "success": False, "error": str(e)})
+        job.report(len(results), total)
+    return results
+
+
+def remove_uploads(files: list):
+    """Delete the uploaded resumes (PII) a parse job has not removed yet"""
+    for path, _ in files:
+        if os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,32 @@
+from datetime import date, datetime
+from enum import Enum
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class JobInfo(BaseModel):
+    job_id: str
+    kind: str
+    status: JobStatus
+    progress: float
+    message: Optional[str] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    has_result: bool = False
+
+
+class FailureReportJobRequest(BaseModel):
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    format: str = "csv"
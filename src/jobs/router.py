@@ -0,0 +1,120 @@
+import os
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse
+
+from src.auth.dependencies import authorize_token
+from src.auth.models import UserInfo
+from src.jobs.models import FailureReportJobRequest, JobInfo, JobStatus
+from src.jobs.service import (
+    Job,
+    check_rule_health,
+    detect_new_stockouts,
+    explain_stockouts,
+    export_failure_report,
+    job_manager,
+    reclassify_root_causes,
+    refresh_dashboard_rollups,
+)
+from src.snowflake.models import AIAnalysisBatchRequest
+from src.utils.export import ARROW_AVAILABLE, ARROW_FORMATS, EXPORT_FORMATS
+
+router = APIRouter()
+
+
+def _owned_job(job_id: str, user: UserInfo) -> Job:
+    job = job_manager.get(job_id, owner=user.email)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("", response_model=List[JobInfo])
+async def list_jobs(user: UserInfo = Depends(authorize_token())):
+    """Your jobs, newest first"""
+    return [job.info() for job in job_manager.list(owner=user.email)]
+
+
+@router.get("/{job_id}", response_model=JobInfo)
+async def get_job(job_id: str, user: UserInfo = Depends(authorize_token())):
+    """Status and progress of a job"""
+    return _owned_job(job_id, user).info()
+
+
+@router.get("/{job_id}/result")
+async def get_job_result(job_id: str, user: UserInfo = Depends(authorize_token())):
+    """Result of a finished job: JSON, or the exported file"""
+    job = _owned_job(job_id, user)
+    if job.status != JobStatus.SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status.value}")
+    if job.result_path:
+        return FileResponse(job.result_path, media_type=job.media_type, filename=os.path.basename(job.result_path))
+    return job.result
+
+
+@router.delete("/{job_id}", response_model=JobInfo)
+async def cancel_job(job_id: str, user: UserInfo = Depends(authorize_token())):
+    """Cancel a queued job, or stop a running one at its next step"""
+    return job_manager.cancel(_owned_job(job_id, user)).info()
+
+
+@router.post("/ai-analysis", response_model=JobInfo, status_code=202)
+async def submit_ai_analysis(
+    request: AIAnalysisBatchRequest,
+    user: UserInfo = Depends(authorize_token())
+):
+    """Background version of `POST /events/ai-analysis/batch`"""
+    job = job_manager.submit(
+        "ai-analysis", user.email, explain_stockouts,
+        request.item_ids, request.failure_category, request.root_cause,
+        request.latest_only, request.limit
+    )
+    return job.info()
+
+
+@router.post("/failure-report", response_model=JobInfo, status_code=202)
+async def submit_failure_report(
+    request: FailureReportJobRequest,
+    user: UserInfo = Depends(authorize_token())
+):
+    """Background version of `GET /events/export/failure-report`; download from `/jobs/{job_id}/result`"""
+    fmt = request.format.lower()
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=422, detail=f"Unknown format '{request.format}'")
+    if fmt in ARROW_FORMATS and not ARROW_AVAILABLE:
+        raise HTTPException(status_code=422, detail=f"{fmt} export needs pyarrow, which is not installed")
+
+    job = job_manager.submit(
+        "failure-report", user.email, export_failure_report,
+        fmt, request.start_date, request.end_date
+    )
+    return job.info()
+
+
+@router.post("/rule-health", response_model=JobInfo, status_code=202)
+async def submit_rule_health(user: UserInfo = Depends(authorize_token())):
+    """Background version of `GET /events/rules/health-check`"""
+    return job_manager.submit("rule-health", user.email, check_rule_health).info()
+
+
+@router.post("/stockout-detection", response_model=JobInfo, status_code=202)
+async def submit_stockout_detection(user: UserInfo = Depends(authorize_token("ADMIN"))):
+    """Scan snapshots newer than the detector watermark and append the stockouts they show"""
+    return job_manager.submit("stockout-detection", user.email, detect_new_stockouts).info()
+
+
+@router.post("/rollup-refresh", response_model=JobInfo, status_code=202)
+async def submit_rollup_refresh(user: UserInfo = Depends(authorize_token("ADMIN"))):
+    """Refresh the dashboard rollups; until then dashboard reads aggregate STOCKOUT_EVENTS directly"""
+    return job_manager.submit("rollup-refresh", user.email, refresh_dashboard_rollups).info()
+
+
+@router.post("/root-cause-reclassify", response_model=JobInfo, status_code=202)
+async def submit_root_cause_reclassify(
+    unanalyzed_only: bool = False,
+    limit: int = Query(100, ge=0, le=10000),
+    user: UserInfo = Depends(authorize_token("ADMIN"))
+):
+    """Background version of `POST /events/root-cause/reclassify?apply=true`: rewrites stored root causes"""
+    return job_manager.submit("root-cause-reclassify", user.email, reclassify_root_causes, unanalyzed_only, limit).info()
@@ -0,0 +1,347 @@
+"""
+In-process background jobs.
+
+Handlers submit work and return a job id straight away; a bounded pool of
+worker threads runs it. A job reports progress as it goes, checks for
+cancellation between steps, and keeps its result (in memory, or as a file
+for exports) until it has been finished for JOB_RETENTION_SECONDS.
+
+Jobs are known only to the process that queued them: serve /jobs from a
+single uvicorn worker, or route each client to the same one.
+"""
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from src.jobs.models import JobInfo, JobStatus
+from src.snowflake.detector import detect_stockouts
+from src.snowflake.rollups import refresh_rollups
+from src.snowflake.service import (
+    FAILURE_REPORT_COLUMNS,
+    analysis_results,
+    build_stockout_prompt,
+    count_failure_report,
+    get_rule_health,
+    get_stockouts_for_analysis,
+    iter_failure_report,
+    reclassify_stockouts,
+)
+from src.utils.config import (
+    CORTEX_BATCH_SIZE,
+    JOB_MAX_RETAINED,
+    JOB_RESULT_DIR,
+    JOB_RETENTION_SECONDS,
+    JOB_WORKERS,
+)
+from src.utils.cortex import CortexBusy, cached_completion, submit_many
+from src.utils.database import run_db, session_scope
+from src.utils.export import EXPORT_FORMATS, encode_batches, make_encoder
+from src.utils.metrics import query_label
+
+logger = logging.getLogger(__name__)
+
+# Seconds a job waits for a Cortex slot, doubling per refusal up to the cap
+_BUSY_BACKOFF_SECONDS = 1.0
+_BUSY_BACKOFF_MAX_SECONDS = 30.0
+# Seconds between cancellation checks while a batch runs on the Cortex pool
+_CANCEL_POLL_SECONDS = 1.0
+
+_FINISHED = (JobStatus.SUCCEEDED, JobStatus.FAILED, JobStatus.CANCELLED)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+@dataclass
+class Job:
+    job_id: str
+    kind: str
+    owner: Optional[str]
+    created_at: datetime = field(default_factory=_now)
+    status: JobStatus = JobStatus.QUEUED
+    progress: float = 0.0
+    message: Optional[str] = None
+    error: Optional[str] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Any = None
+    result_path: Optional[str] = None
+    media_type: Optional[str] = None
+    cancel_requested: threading.Event = field(default_factory=threading.Event)
+    future: Optional[Future] = None
+
+    def report(self, done: int, total: Optional[int] = None, message: Optional[str] = None) -> None:
+        """Record progress; raises JobCancelled once cancellation was requested"""
+        if total:
+            self.progress = min(done / total, 1.0)
+        if message is not None:
+            self.message = message
+        self.check_cancelled()
+
+    def check_cancelled(self) -> None:
+        if self.cancel_requested.is_set():
+            raise JobCancelled()
+
+    def info(self) -> JobInfo:
+        return JobInfo(
+            job_id=self.job_id,
+            kind=self.kind,
+            status=self.status,
+            progress=self.progress,
+            message=self.message,
+            error=self.error,
+            created_at=self.created_at,
+            started_at=self.started_at,
+            finished_at=self.finished_at,
+            has_result=self.status == JobStatus.SUCCEEDED,
+        )
+
+
+class JobManager:
+    def __init__(
+        self,
+        workers: int = JOB_WORKERS,
+        retention_seconds: float = JOB_RETENTION_SECONDS,
+        max_retained: int = JOB_MAX_RETAINED,
+        result_dir: Optional[str] = JOB_RESULT_DIR
+    ):
+        self.retention_seconds = retention_seconds
+        self.max_retained = max_retained
+        self.result_dir = result_dir or os.path.join(tempfile.gettempdir(), "retrace-jobs")
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        kind: str,
+        owner: Optional[str],
+        fn: Callable[..., Any],
+        *args,
+        on_finish: Optional[Callable[[], None]] = None,
+        **kwargs
+    ) -> Job:
+        """
+        Queue `fn(job, *args, **kwargs)`; its return value becomes the job result.
+        `on_finish` runs once the job is over however it ended, including when
+        it is cancelled before it starts (e.g. to remove its input files).
+        """
+        job = Job(job_id=uuid.uuid4().hex, kind=kind, owner=owner)
+        with self._lock:
+            self._prune()
+            self._jobs[job.job_id] = job
+        job.future = self._executor.submit(self._run, job, fn, args, kwargs)
+        if on_finish is not None:
+            job.future.add_done_callback(lambda _: self._finish(job, on_finish))
+        return job
+
+    def get(self, job_id: str, owner: Optional[str] = None) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if job is None or (owner is not None and job.owner != owner):
+            return None
+        return job
+
+    def list(self, owner: Optional[str] = None) -> List[Job]:
+        with self._lock:
+            self._prune()
+            jobs = [j for j in self._jobs.values() if owner is None or j.owner == owner]
+        return sorted(jobs, key=lambda j: j.created_at, reverse=True)
+
+    def cancel(self, job: Job) -> Job:
+        """Drop a queued job, or ask a running one to stop at its next step"""
+        job.cancel_requested.set()
+        if job.future is not None and job.future.cancel():
+            job.status = JobStatus.CANCELLED
+            job.finished_at = _now()
+        return job
+
+    def result_file(self, job: Job, extension: str) -> str:
+        """Path for a job that writes its result to disk"""
+        directory = os.path.join(self.result_dir, job.job_id)
+        os.makedirs(directory, exist_ok=True)
+        job.result_path = os.path.join(directory, f"{job.kind}.{extension}")
+        return job.result_path
+
+    def _run(self, job: Job, fn: Callable[..., Any], args, kwargs) -> None:
+        job.status = JobStatus.RUNNING
+        job.started_at = _now()
+        try:
+            job.check_cancelled()
+            with query_label(fn.__name__):
+                job.result = fn(job, *args, **kwargs)
+            job.progress = 1.0
+            job.status = JobStatus.SUCCEEDED
+        except JobCancelled:
+            job.status = JobStatus.CANCELLED
+            self._remove_files(job)
+        except Exception as e:
+            logger.exception("Job %s (%s) failed", job.job_id, job.kind)
+            job.error = str(e)
+            job.status = JobStatus.FAILED
+            self._remove_files(job)
+        finally:
+            job.finished_at = _now()
+
+    @staticmethod
+    def _finish(job: Job, on_finish: Callable[[], None]) -> None:
+        try:
+            on_finish()
+        except Exception:
+            logger.exception("Cleanup of job %s (%s) failed", job.job_id, job.kind)
+
+    def _remove_files(self, job: Job) -> None:
+        if job.result_path:
+            shutil.rmtree(os.path.dirname(job.result_path), ignore_errors=True)
+            job.result_path = None
+
+    def _prune(self) -> None:
+        """Forget finished jobs past retention, and the oldest finished ones beyond max_retained"""
+        cutoff = time.time() - self.retention_seconds
+        finished = sorted(
+            (j for j in self._jobs.values() if j.status in _FINISHED and j.finished_at),
+            key=lambda j: j.finished_at
+        )
+        excess = len(self._jobs) - self.max_retained
+        for job in finished:
+            if job.finished_at.timestamp() >= cutoff and excess <= 0:
+                break
+            self._remove_files(job)
+            del self._jobs[job.job_id]
+            excess -= 1
+
+
+job_manager = JobManager()
+
+
+# ========================================
+# JOBS
+# ========================================
+
+def _complete_when_free(job: Job, prompts: List[str]) -> List[Optional[str]]:
+    """
+    One batch on the Cortex pool, so jobs share its connections and slots with
+    the request path. Waits (cancellably) while every slot is taken.
+    """
+    delay = _BUSY_BACKOFF_SECONDS
+    while True:
+        try:
+            future = submit_many(prompts)
+            break
+        except CortexBusy:
+            job.message = f"Waiting {delay:.0f}s for a Cortex slot"
+            job.cancel_requested.wait(delay)
+            job.check_cancelled()
+            delay = min(delay * 2, _BUSY_BACKOFF_MAX_SECONDS)
+    while True:
+        try:
+            return future.result(timeout=_CANCEL_POLL_SECONDS)
+        except FutureTimeout:
+            if job.cancel_requested.is_set():
+                # Only a batch still queued can be dropped; a running statement finishes and is cached
+                future.cancel()
+                job.check_cancelled()
+
+
+def explain_stockouts(
+    job: Job,
+    item_ids: Optional[List[str]] = None,
+    failure_category: Optional[str] = None,
+    root_cause: Optional[str] = None,
+    latest_only: bool = False,
+    limit: int = 1000
+):
+    """Bulk AI analysis, one set-based Cortex statement per CORTEX_BATCH_SIZE uncached prompts"""
+    with session_scope() as db:
+        events = get_stockouts_for_analysis(db, item_ids, failure_category, root_cause, latest_only, limit)
+
+    prompts = list(dict.fromkeys(build_stockout_prompt(event) for event in events))
+    completions: Dict[str, Optional[str]] = {prompt: cached_completion(prompt) for prompt in prompts}
+    missing = [prompt for prompt, completion in completions.items() if completion is None]
+    done = len(prompts) - len(missing)
+    job.report(done, len(prompts), f"{len(events)} events, {len(prompts)} distinct prompts, {done} cached")
+    for start in range(0, len(missing), CORTEX_BATCH_SIZE):
+        chunk = missing[start:start + CORTEX_BATCH_SIZE]
+        completions.update(zip(chunk, _complete_when_free(job, chunk)))
+        done += len(chunk)
+        job.report(done, len(prompts), f"{done} of {len(prompts)} prompts answered")
+    return analysis_results(events, completions)
+
+
+def export_failure_report(job: Job, fmt: str, start_date=None, end_date=None):
+    """Failure report written to a result file, batch by batch"""
+    path = job_manager.result_file(job, fmt)
+    job.media_type = EXPORT_FORMATS[fmt]
+    written = rows_written = 0
+    with session_scope() as db, open(path, "wb") as f:
+        total = count_failure_report(db, start_date, end_date)
+
+        def batches():
+            nonlocal rows_written
+            for rows in iter_failure_report(db, start_date, end_date):
+                rows_written += len(rows)
+                yield rows
+
+        for chunk in encode_batches(make_encoder(fmt, FAILURE_REPORT_COLUMNS), batches()):
+            f.write(chunk)
+            written += len(chunk)
+            job.report(rows_written, total, f"{rows_written} of {total} rows, {written} bytes written")
+    return {"rows": rows_written, "bytes": written}
+
+
+def check_rule_health(job: Job):
+    with session_scope() as db:
+        return get_rule_health(db)
+
+
+def refresh_dashboard_rollups(job: Job):
+    """Catch the dashboard rollups up with STOCKOUT_EVENTS (e.g. after an external load)"""
+    with session_scope() as db:
+        return refresh_rollups(db)
+
+
+async def refresh_rollups_periodically(seconds: int) -> None:
+    """
+    Refresh the rollups every `seconds`, so events loaded from outside the app
+    reach them without waiting for an in-app write. Runs outside the job
+    manager to keep the job list for user work; a refresh with nothing to do
+    costs three small reads.
+    """
+    while True:
+        await asyncio.sleep(seconds)
+        try:
+            result = await run_db(refresh_rollups)
+            if result["mode"] != "none":
+                logger.info("Scheduled rollup refresh: %s", result["mode"])
+        except Exception:
+            logger.exception("Scheduled rollup refresh failed")
+
+
+def reclassify_root_causes(job: Job, unanalyzed_only: bool = False, limit: int = 100):
+    """Re-derive root causes from evidence and write the changes back"""
+    with session_scope() as db:
+        return reclassify_stockouts(db, apply=True, unanalyzed_only=unanalyzed_only, limit=limit)
+
+
+def detect_new_stockouts(job: Job):
+    """Stockouts in snapshots loaded since the last run, appended to STOCKOUT_EVENTS and classified"""
+    with session_scope() as db:
+        detected = detect_stockouts(db)
+        job.report(1, 2, f"{detected['events_added']} new events")
+        if detected["events_added"]:
+            classified = reclassify_stockouts(db, apply=True, unanalyzed_only=True, limit=0)
+            detected["classified"] = classified["updated"]
+        return detected
@@ -1,13 +1,38 @@
  
 
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
 from starlette.middleware.cors import CORSMiddleware
 
 from src.auth.router import router as auth_router
 from src.snowflake.router import router as snowflake_router
 from src.aws.router import router as aws_router
+from src.jobs.router import router as jobs_router
+from src.jobs.service import refresh_rollups_periodically
+from src.admin.router import router as admin_router
+from src.auth.sso import close_sso_client, sso_client
+from src.utils.config import ANALYTICS_BACKEND, ROLLUP_REFRESH_SECONDS
+from src.utils.metrics import render_metrics
+from src.utils.middleware import RequestMetricsMiddleware
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One MSAL app and Graph connection pool for every login
+    sso_client()
+    # Picks up events loaded from outside the app; the local backend has no rollups
+    refresher = None
+    if ROLLUP_REFRESH_SECONDS > 0 and ANALYTICS_BACKEND == "snowflake":
+        refresher = asyncio.create_task(refresh_rollups_periodically(ROLLUP_REFRESH_SECONDS))
+    yield
+    if refresher is not None:
+        refresher.cancel()
+    await close_sso_client()
 
-app = FastAPI(title="Smart Recruiter Backend")
+
+app = FastAPI(title="Smart Recruiter Backend", lifespan=lifespan)
 
 # CORS (Frontend access)
 app.add_middleware(
@@ -16,16 +41,27 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Middlewares
+app.add_middleware(RequestMetricsMiddleware)
 
 # Routers
 app.include_router(auth_router, prefix="/auth", tags=["Authentication"])
 app.include_router(snowflake_router, prefix="/events", tags=["Snowflake"])
 app.include_router(aws_router, prefix="/cortex", tags=["Cortex Services"])
+app.include_router(jobs_router, prefix="/jobs", tags=["Jobs"])
+app.include_router(admin_router, prefix="/admin", tags=["Admin"])
 
 # Root Health Check
 @app.get("/", tags=["Health"])
 def root():
     return {"status": "OK", "service": "Smart Recruiter Backend is running!"}
+
+
+# Prometheus scrape: statement latency, rows and errors per service function, pool waits and gauges
+@app.get("/metrics", tags=["Health"], include_in_schema=False)
+def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
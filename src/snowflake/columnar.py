@@ -0,0 +1,444 @@
+import csv
+import os
+import threading
+import time
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from src.utils.config import LOCAL_DATA_DIR
+
+
+# ========================================
+# TABLE LAYOUT
+# ========================================
+
+# Column types for the five analytics tables. Columns that are not listed
+# (e.g. extra columns in a synced extract) are kept as strings.
+TABLE_SCHEMAS: Dict[str, Dict[str, str]] = {
+    "STOCKOUT_EVENTS": {
+        "item_id": "str",
+        "warehouse_id": "str",
+        "stockout_date": "date",
+        "reorder_triggered": "bool",
+        "failure_category": "str",
+        "root_cause": "str",
+        "analysis_confidence": "float",
+        "analyzed_at": "datetime",
+    },
+    "INVENTORY_SNAPSHOT": {
+        "item_id": "str",
+        "warehouse_id": "str",
+        "stock_on_hand": "int",
+        "snapshot_time": "datetime",
+        "is_snapshot_stale": "bool",
+    },
+    "DEMAND_FORECAST": {
+        "item_id": "str",
+        "forecast_date": "date",
+        "daily_demand": "int",
+        "generated_at": "date",
+        "forecast_type": "str",
+        "forecast_confidence": "float",
+        "actual_demand": "int",
+        "forecast_created_date": "date",
+    },
+    "REORDER_RULES": {
+        "item_id": "str",
+        "warehouse_id": "str",
+        "safety_stock": "int",
+        "lead_time_days": "int",
+        "reorder_threshold": "int",
+        "last_updated": "date",
+        "rule_owner": "str",
+    },
+    "PURCHASE_ORDERS": {
+        "order_id": "str",
+        "item_id": "str",
+        "order_date": "date",
+        "expected_arrival_date": "date",
+        "actual_arrival_date": "date",
+        "quantity": "int",
+        "status": "str",
+        "delay_reason": "str",
+    },
+}
+
+# File names used by SampleData.py for the bundled CSV extract
+TABLE_FILES: Dict[str, str] = {
+    "STOCKOUT_EVENTS": "stockout_events.csv",
+    "INVENTORY_SNAPSHOT": "inventory_snapshot.csv",
+    "DEMAND_FORECAST": "demand_forecast.csv",
+    "REORDER_RULES": "reorder_rules.csv",
+    "PURCHASE_ORDERS": "purchase_orders.csv",
+}
+
+_TRUE_VALUES = {"true", "t", "1", "yes", "y"}
+
+
+def _is_missing(value: Any) -> bool:
+    return value is None or (isinstance(value, str) and value.strip() == "")
+
+
+def to_array(values: Sequence[Any], kind: str) -> np.ndarray:
+    """Convert raw CSV strings or DB values into a typed column"""
+    if kind == "float" or kind == "int":
+        arr = np.array([np.nan if _is_missing(v) else float(v) for v in values], dtype=np.float64)
+        if kind == "int" and not np.isnan(arr).any():
+            return arr.astype(np.int64)
+        return arr
+
+    if kind == "bool":
+        return np.array([
+            bool(v) if isinstance(v, (bool, np.bool_)) else str(v).strip().lower() in _TRUE_VALUES
+            for v in values
+        ], dtype=bool)
+
+    if kind == "date":
+        return np.array([
+            None if _is_missing(v) else (v[:10] if isinstance(v, str) else v)
+            for v in values
+        ], dtype="datetime64[D]")
+
+    if kind == "datetime":
+        return np.array([
+            None if _is_missing(v) else (v.replace(tzinfo=None) if isinstance(v, datetime) else v)
+            for v in values
+        ], dtype="datetime64[us]")
+
+    return np.array([None if _is_missing(v) else str(v) for v in values], dtype=object)
+
+
+def to_python(arr: np.ndarray) -> List[Any]:
+    """Materialize a column as plain Python values (NaN/NaT become None)"""
+    values = arr.tolist()
+    if arr.dtype.kind == "f":
+        return [None if v != v else v for v in values]
+    return values
+
+
+# ========================================
+# TABLE
+# ========================================
+
+class Table:
+    """Column-oriented table: one NumPy array per column, all the same length"""
+
+    def __init__(self, name: str, columns: Dict[str, np.ndarray]):
+        self.name = name
+        self.columns = columns
+        self._groups: Dict[str, Dict[Any, np.ndarray]] = {}
+        self._memo: Dict[Tuple, Any] = {}
+
+    @classmethod
+    def from_rows(cls, name: str, names: Sequence[str], rows: Iterable[Sequence[Any]]) -> "Table":
+        schema = TABLE_SCHEMAS.get(name, {})
+        names = [n.lower() for n in names]
+        values: List[List[Any]] = [[] for _ in names]
+        for row in rows:
+            for i, v in enumerate(row):
+                values[i].append(v)
+        columns = {n: to_array(values[i], schema.get(n, "str")) for i, n in enumerate(names)}
+        return cls(name, columns)
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.columns[column]
+
+    def __contains__(self, column: str) -> bool:
+        return column in self.columns
+
+    def group_index(self, key: str) -> Dict[Any, np.ndarray]:
+        """Row positions per distinct key value, in table order (built once)"""
+        if key not in self._groups:
+            values = self.columns[key]
+            order = np.argsort(values, kind="stable")
+            keys, starts = np.unique(values[order], return_index=True)
+            self._groups[key] = dict(zip(keys.tolist(), np.split(order, starts[1:])))
+        return self._groups[key]
+
+    def codes(self, column: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Sorted distinct values of a column and each row's position among them"""
+        memo_key = ("codes", column)
+        if memo_key not in self._memo:
+            self._memo[memo_key] = np.unique(self.columns[column], return_inverse=True)
+        return self._memo[memo_key]
+
+    def time_index(self, key_columns: Sequence[str], time_column: str) -> Tuple[np.ndarray, np.ndarray, int]:
+        """Rows sorted by (keys, time) as one int64 sort key, for as-of lookups"""
+        memo_key = ("time_index", tuple(key_columns), time_column)
+        if memo_key not in self._memo:
+            group = np.zeros(len(self), dtype=np.int64)
+            for column in key_columns:
+                uniques, inverse = self.codes(column)
+                group = group * len(uniques) + inverse
+            times, ranks = self.codes(time_column)
+            span = len(times) + 1
+            combined = group * span + ranks
+            order = np.argsort(combined, kind="stable")
+            self._memo[memo_key] = (order, combined[order], span)
+        return self._memo[memo_key]
+
+    def rows_for(self, key: str, value: Any) -> np.ndarray:
+        return self.group_index(key).get(value, np.empty(0, dtype=np.int64))
+
+    def records(
+        self,
+        index: Optional[np.ndarray] = None,
+        columns: Optional[Sequence[str]] = None,
+        rename: Optional[Dict[str, str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Materialize rows as dicts, like `dict(row._mapping)` on a DB result"""
+        columns = list(columns or self.columns.keys())
+        rename = rename or {}
+        data = [
+            to_python(self.columns[c] if index is None else self.columns[c][index])
+            for c in columns
+        ]
+        names = [rename.get(c, c) for c in columns]
+        return [dict(zip(names, row)) for row in zip(*data)]
+
+
+# ========================================
+# VECTORIZED JOINS
+# ========================================
+
+def _right_groups(table: Table, key_columns: Sequence[str], right_keys: Sequence[np.ndarray]) -> np.ndarray:
+    """Group codes of `right_keys` in `table`'s key space (-1 when not present)"""
+    group = np.zeros(len(right_keys[0]), dtype=np.int64)
+    valid = np.ones(len(right_keys[0]), dtype=bool)
+    for column, values in zip(key_columns, right_keys):
+        uniques, _ = table.codes(column)
+        if not len(uniques):
+            return np.full(len(group), -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(uniques, values), len(uniques) - 1)
+        valid &= uniques[pos] == values
+        group = group * len(uniques) + pos
+    return np.where(valid, group, -1)
+
+
+def _time_ranks(table: Table, time_column: str, right_time: np.ndarray) -> np.ndarray:
+    """Rank of the greatest `time_column` value <= each right time (-1 when none)"""
+    times, _ = table.codes(time_column)
+    return np.searchsorted(times, right_time.astype(times.dtype), side="right") - 1
+
+
+def asof_index(
+    table: Table,
+    key_columns: Sequence[str],
+    time_column: str,
+    right_keys: Sequence[np.ndarray],
+    right_time: np.ndarray
+) -> np.ndarray:
+    """
+    For every right row, the position of the `table` row with equal keys and
+    the latest time <= the right row's time, or -1 when there is none.
+    Ties go to the earliest row in table order.
+    """
+    if not len(table):
+        return np.full(len(right_time), -1, dtype=np.int64)
+    order, sorted_keys, span = table.time_index(key_columns, time_column)
+    group = _right_groups(table, key_columns, right_keys)
+    pos = np.searchsorted(sorted_keys, group * span + _time_ranks(table, time_column, right_time), side="right") - 1
+    match = sorted_keys[np.maximum(pos, 0)]
+    found = (group >= 0) & (pos >= 0) & (match // span == group)
+    # Among rows with the same key and time, take the first one
+    first = np.searchsorted(sorted_keys, match, side="left")
+    return np.where(found, order[first], -1)
+
+
+def join_index(table: Table, key_column: str, right_keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Left join of `right_keys` onto `table` on `key_column`: one (right, table)
+    position pair per match, in right order and then table order. Right rows
+    without a match appear once, with table position -1.
+    """
+    if not len(table):
+        return np.arange(len(right_keys)), np.full(len(right_keys), -1, dtype=np.int64)
+    uniques, inverse = table.codes(key_column)
+    order = np.argsort(inverse, kind="stable")
+    counts = np.bincount(inverse, minlength=len(uniques))
+    starts = np.cumsum(counts) - counts
+
+    group = _right_groups(table, [key_column], [right_keys])
+    matched = group >= 0
+    group = np.maximum(group, 0)
+    width = np.where(matched, counts[group], 1)
+
+    right = np.repeat(np.arange(len(right_keys)), width)
+    offset = np.arange(len(right)) - np.repeat(np.cumsum(width) - width, width)
+    left = order[np.minimum(starts[group][right] + offset, len(order) - 1)]
+    return right, np.where(matched[right], left, -1)
+
+
+def sum_after(
+    table: Table,
+    key_columns: Sequence[str],
+    time_column: str,
+    value_column: str,
+    right_keys: Sequence[np.ndarray],
+    right_time: np.ndarray
+) -> np.ndarray:
+    """For every right row, the sum of `value_column` over rows with equal keys and time > the right row's time"""
+    values = table[value_column] if len(table) else np.zeros(0, dtype=np.int64)
+    if not len(table):
+        return np.zeros(len(right_time), dtype=values.dtype)
+    order, sorted_keys, span = table.time_index(key_columns, time_column)
+    group = _right_groups(table, key_columns, right_keys)
+    totals = np.concatenate([[0], np.cumsum(values[order])])
+    start = np.searchsorted(sorted_keys, group * span + _time_ranks(table, time_column, right_time), side="right")
+    end = np.searchsorted(sorted_keys, (group + 1) * span, side="left")
+    return np.where(group >= 0, totals[end] - totals[np.minimum(start, end)], 0)
+
+
+def latest_per_group(keys: np.ndarray, times: np.ndarray) -> np.ndarray:
+    """Position of the row with the greatest time for each distinct key (first row on ties)"""
+    if not len(keys):
+        return np.empty(0, dtype=np.int64)
+    order = np.lexsort((-np.arange(len(keys)), times, keys))
+    sorted_keys = keys[order]
+    last = np.ones(len(order), dtype=bool)
+    last[:-1] = sorted_keys[1:] != sorted_keys[:-1]
+    return order[last]
+
+
+def factorize(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Sorted distinct values and each row's index among them.
+
+    Only the first value of every run of equal values is sorted, so a column
+    grouped by item (as extracts usually are) costs one pass.
+    """
+    if not len(values):
+        return np.empty(0, dtype=str), np.empty(0, dtype=np.int64)
+    heads = np.ones(len(values), dtype=bool)
+    heads[1:] = values[1:] != values[:-1]
+    uniques, run_codes = np.unique(values[heads].astype(str), return_inverse=True)
+    return uniques, run_codes[np.cumsum(heads) - 1]
+
+
+def sort_order(keys: np.ndarray) -> np.ndarray:
+    """Stable sort order of `keys`, skipping the sort when they already are (extracts usually come sorted)"""
+    if np.all(keys[1:] >= keys[:-1]):
+        return np.arange(len(keys))
+    return np.argsort(keys, kind="stable")
+
+
+# ========================================
+# STORE
+# ========================================
+
+class ColumnarStore:
+    """The five analytics tables held in memory as NumPy columns"""
+
+    def __init__(self, tables: Dict[str, Table], source: str):
+        self.tables = tables
+        self.source = source
+        self.loaded_at = time.time()
+        for name in TABLE_SCHEMAS:
+            self.tables.setdefault(name, Table(name, {}))
+        _add_derived_columns(self)
+
+    def __getitem__(self, name: str) -> Table:
+        return self.tables[name]
+
+    @classmethod
+    def from_csv_dir(cls, path: str) -> "ColumnarStore":
+        tables = {}
+        for name, file_name in TABLE_FILES.items():
+            file_path = os.path.join(path, file_name)
+            if not os.path.exists(file_path):
+                continue
+            with open(file_path, newline="", encoding="utf-8") as f:
+                reader = csv.reader(f)
+                header = next(reader)
+                tables[name] = Table.from_rows(name, header, reader)
+        return cls(tables, source=os.path.abspath(path))
+
+    @classmethod
+    def from_database(cls, db: Session) -> "ColumnarStore":
+        """Pull a full extract of the five tables from the warehouse"""
+        tables = {}
+        for name in TABLE_SCHEMAS:
+            result = db.execute(text(f"SELECT * FROM {name}"))
+            tables[name] = Table.from_rows(name, list(result.keys()), result.fetchall())
+        return cls(tables, source="database")
+
+    def write_csv_dir(self, path: str) -> None:
+        """Persist the store in the same layout as the bundled CSVs"""
+        os.makedirs(path, exist_ok=True)
+        for name, file_name in TABLE_FILES.items():
+            table = self.tables[name]
+            columns = [c for c in table.columns if c not in DERIVED_COLUMNS.get(name, ())]
+            with open(os.path.join(path, file_name), "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                for row in table.records(columns=columns):
+                    writer.writerow(["" if row[c] is None else row[c] for c in columns])
+
+
+# Columns the store fills in when an extract does not carry them
+DERIVED_COLUMNS: Dict[str, Sequence[str]] = {
+    "DEMAND_FORECAST": ("forecast_created_date",),
+}
+
+
+def _add_derived_columns(store: ColumnarStore) -> None:
+    forecast = store["DEMAND_FORECAST"]
+    # The warehouse queries order forecasts by forecast_created_date; the CSV
+    # extract only has forecast_date, which is what that ordering resolves to.
+    if len(forecast) and "forecast_created_date" not in forecast:
+        forecast.columns["forecast_created_date"] = forecast["forecast_date"]
+
+
+_store: Optional[ColumnarStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> ColumnarStore:
+    """Process-wide store, loaded from LOCAL_DATA_DIR on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ColumnarStore.from_csv_dir(LOCAL_DATA_DIR)
+    return _store
+
+
+def set_store(store: Optional[ColumnarStore]) -> None:
+    """Swap in a freshly synced store (or reset so the next call reloads)"""
+    global _store
+    with _store_lock:
+        _store = store
+
+
+def sync_store(db: Session, path: Optional[str] = None) -> ColumnarStore:
+    """Refresh the in-memory store from the warehouse, optionally saving the extract"""
+    store = ColumnarStore.from_database(db)
+    if path:
+        store.write_csv_dir(path)
+    set_store(store)
+    return store
+
+
+def today() -> np.datetime64:
+    return np.datetime64(date.today(), "D")
+
+
+if __name__ == "__main__":
+    # Save a fresh extract for the local backend: python -m src.snowflake.columnar [dir]
+    import sys
+    from src.utils.database import SessionLocal
+
+    target = sys.argv[1] if len(sys.argv) > 1 else LOCAL_DATA_DIR
+    session = SessionLocal()
+    try:
+        synced = sync_store(session, target)
+        print({name: len(table) for name, table in synced.tables.items()})
+    finally:
+        session.close()
@@ -0,0 +1,168 @@
+"""
+Forecast-quality engine.
+
+Scores DEMAND_FORECAST against the `actual_demand` it carries, for every item
+at once. Errors are actual minus forecast, so a positive error (and a
+positive bias or tracking signal) means demand ran above the forecast:
+
+- mape: mean absolute percentage error, over days with actual demand
+- bias_pct: net error as a share of total actual demand
+- tracking_signal: cumulative error divided by the mean absolute error; beyond
+  +/- TRACKING_SIGNAL_LIMIT the forecast is consistently off in one direction
+- recent_mape: MAPE over the last `window` days of each item
+
+Rows are first averaged per (item, day), since an extract may repeat a day's
+forecast per warehouse. Items are then contiguous runs of one sorted array,
+so per-item totals are `np.add.reduceat` calls and running or trailing
+values are differences of cumulative sums.
+"""
+from typing import Dict
+
+import numpy as np
+
+from src.snowflake.columnar import Table, factorize, sort_order
+
+# |tracking signal| above which a forecast counts as biased
+TRACKING_SIGNAL_LIMIT = 4.0
+# Days in the trailing error window
+DEFAULT_WINDOW_DAYS = 7
+
+QUALITY_METRICS = ("mape", "recent_mape", "bias_pct", "tracking_signal")
+
+
+def daily_pairs(forecasts: Table) -> Dict[str, np.ndarray]:
+    """Mean forecast and actual demand per (item, day), sorted by item then day"""
+    day = np.asarray(forecasts["forecast_date"]).astype("datetime64[D]") if len(forecasts) else np.empty(0, "datetime64[D]")
+    forecast = np.asarray(forecasts["daily_demand"], dtype=np.float64) if len(forecasts) else np.empty(0)
+    actual = np.asarray(forecasts["actual_demand"], dtype=np.float64) if len(forecasts) else np.empty(0)
+    usable = ~np.isnat(day) & ~np.isnan(forecast) & ~np.isnan(actual)
+    if not usable.any():
+        return {
+            "item_ids": np.empty(0, dtype=object),
+            "item": np.empty(0, dtype=np.int64),
+            "date": np.empty(0, dtype="datetime64[D]"),
+            "forecast": np.empty(0),
+            "actual": np.empty(0),
+        }
+
+    item_ids, item = factorize(forecasts["item_id"][usable])
+    day, forecast, actual = day[usable], forecast[usable], actual[usable]
+    day_number = day.astype(np.int64)
+    first_day = int(day_number.min())
+    span = int(day_number.max()) - first_day + 1
+
+    keys = item * span + (day_number - first_day)
+    order = sort_order(keys)
+    keys = keys[order]
+    starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+    counts = np.diff(np.append(starts, len(keys)))
+
+    return {
+        "item_ids": item_ids,
+        "item": keys[starts] // span,
+        "date": (keys[starts] % span + first_day).astype("datetime64[D]"),
+        "forecast": np.add.reduceat(forecast[order], starts) / counts,
+        "actual": np.add.reduceat(actual[order], starts) / counts,
+    }
+
+
+def _trailing(cumulative: np.ndarray, group_start: np.ndarray, window: int) -> np.ndarray:
+    """Sum of the last `window` values up to each row, within the row's item (cumulative has a leading 0)"""
+    end = np.arange(1, len(cumulative))
+    start = np.maximum(end - window, group_start)
+    return cumulative[end] - cumulative[start]
+
+
+def _error_columns(pairs: Dict[str, np.ndarray], window: int) -> Dict[str, np.ndarray]:
+    """Per-day errors with running and trailing aggregates, restarted at every item"""
+    forecast, actual, item = pairs["forecast"], pairs["actual"], pairs["item"]
+    n = len(item)
+    heads = np.ones(n, dtype=bool)
+    heads[1:] = item[1:] != item[:-1]
+    group_start = np.maximum.accumulate(np.where(heads, np.arange(n), 0))
+
+    error = actual - forecast
+    absolute = np.abs(error)
+    has_actual = actual > 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pct = np.where(has_actual, absolute / actual * 100.0, np.nan)
+
+    def cumulative(values):
+        return np.concatenate([[0.0], np.cumsum(values)])
+
+    c_error, c_abs = cumulative(error), cumulative(absolute)
+    c_pct, c_pct_n = cumulative(np.nan_to_num(pct)), cumulative(has_actual.astype(np.float64))
+    running_days = np.arange(1, n + 1) - group_start
+    running_error = c_error[1:] - c_error[group_start]
+    running_abs = c_abs[1:] - c_abs[group_start]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rolling_mape = _trailing(c_pct, group_start, window) / _trailing(c_pct_n, group_start, window)
+        tracking_signal = running_error / (running_abs / running_days)
+
+    return {
+        "error": error,
+        "abs_pct_error": pct,
+        "rolling_mape": rolling_mape,
+        "cumulative_error": running_error,
+        "tracking_signal": np.where(running_abs > 0, tracking_signal, 0.0),
+    }
+
+
+def quality_by_item(pairs: Dict[str, np.ndarray], window: int = DEFAULT_WINDOW_DAYS) -> Table:
+    """One row per item: days, mae, mape, bias_pct, tracking_signal, recent_mape and biased"""
+    item = pairs["item"]
+    if not len(item):
+        return Table("FORECAST_QUALITY", {
+            "item_id": np.empty(0, dtype=object),
+            "days": np.empty(0, dtype=np.int64),
+            **{name: np.empty(0) for name in ("mae", *QUALITY_METRICS)},
+            "biased": np.empty(0, dtype=bool),
+        })
+
+    columns = _error_columns(pairs, window)
+    starts = np.flatnonzero(np.concatenate([[True], item[1:] != item[:-1]]))
+    ends = np.append(starts[1:], len(item)) - 1
+    days = ends - starts + 1
+
+    def total(values):
+        return np.add.reduceat(values, starts)
+
+    pct = columns["abs_pct_error"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mape = total(np.nan_to_num(pct)) / total((~np.isnan(pct)).astype(np.float64))
+        actual = total(pairs["actual"])
+        # No actual demand in the window: bias has no share to be, and inf is not valid JSON
+        bias_pct = np.where(actual != 0, total(columns["error"]) / actual * 100.0, np.nan)
+
+    tracking_signal = columns["tracking_signal"][ends]
+    return Table("FORECAST_QUALITY", {
+        "item_id": pairs["item_ids"][item[starts]].astype(object),
+        "days": days,
+        "mae": total(np.abs(columns["error"])) / days,
+        "mape": mape,
+        "recent_mape": columns["rolling_mape"][ends],
+        "bias_pct": bias_pct,
+        "tracking_signal": tracking_signal,
+        "biased": np.abs(tracking_signal) > TRACKING_SIGNAL_LIMIT,
+    })
+
+
+def error_series(pairs: Dict[str, np.ndarray], window: int = DEFAULT_WINDOW_DAYS) -> Table:
+    """Day-by-day forecast, actual and error measures (for the items in `pairs`)"""
+    columns = _error_columns(pairs, window)
+    return Table("FORECAST_ERRORS", {
+        "forecast_date": pairs["date"],
+        "forecast": pairs["forecast"],
+        "actual": pairs["actual"],
+        **columns,
+    })
+
+
+def rank_items(quality: Table, metric: str = "mape", limit: int = 20) -> np.ndarray:
+    """Rows of `quality` from worst to best by `metric` (by magnitude for the signed ones)"""
+    values = np.asarray(quality[metric], dtype=np.float64)
+    if metric in ("bias_pct", "tracking_signal"):
+        values = np.abs(values)
+    values = np.where(np.isnan(values), -np.inf, values)
+    return np.argsort(-values, kind="stable")[:limit]
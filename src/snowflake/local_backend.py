@@ -0,0 +1,805 @@
+"""
+In-process implementation of the read functions in src/snowflake/service.py.
+
+Every function here mirrors the SQL of its namesake in service.py, but answers
+from the NumPy columns of the ColumnarStore instead of a Snowflake round trip.
+Select it with ANALYTICS_BACKEND=local.
+"""
+from collections import Counter
+from datetime import date, datetime
+from functools import wraps
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from src.snowflake.columnar import (
+    Table,
+    asof_index,
+    get_store,
+    latest_per_group,
+    sum_after,
+    to_python,
+    today,
+)
+from src.snowflake.replay import DEFAULT_ORDER_QTY, RULE_COLUMNS, ReplayInputs, daily_demand, warehouse_rules
+from src.utils.config import ANALYTICS_BACKEND
+
+
+def pluggable(func):
+    """Answer from the local backend instead of the DB when ANALYTICS_BACKEND=local"""
+    @wraps(func)
+    def wrapper(db, *args, **kwargs):
+        if ANALYTICS_BACKEND == "local":
+            return globals()[func.__name__](*args, **kwargs)
+        return func(db, *args, **kwargs)
+    return wrapper
+
+
+# ========================================
+# HELPERS
+# ========================================
+
+def _latest(table: Table, rows: np.ndarray, column: str) -> Optional[int]:
+    """Row with the greatest `column` value (ORDER BY column DESC LIMIT 1)"""
+    if not len(rows):
+        return None
+    return int(rows[np.argmax(table[column][rows])])
+
+
+def _rule_row(item_id: str, warehouse_id: Any) -> Optional[int]:
+    """Reorder rule for an item at a warehouse; the most recently updated one wins"""
+    rules = get_store()["REORDER_RULES"]
+    rows = rules.rows_for("item_id", item_id)
+    return _latest(rules, rows[rules["warehouse_id"][rows] == warehouse_id], "last_updated")
+
+
+def _scalar(value: Any) -> Any:
+    return to_python(np.asarray([value]))[0]
+
+
+def _sort_desc(values: np.ndarray) -> np.ndarray:
+    """Positions that order `values` descending (ORDER BY ... DESC)"""
+    return np.argsort(values, kind="stable")[::-1]
+
+
+# ========================================
+# EVENTS
+# ========================================
+
+def get_events(
+    limit: int = 100,
+    failure_category: Optional[str] = None,
+    root_cause: Optional[str] = None,
+    warehouse_id: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    sort: str = "newest",
+    after: Optional[Tuple[Any, str, str]] = None
+):
+    events = get_store()["STOCKOUT_EVENTS"]
+    dates, items, warehouses = events["stockout_date"], events["item_id"], events["warehouse_id"]
+    mask = np.ones(len(events), dtype=bool)
+
+    if failure_category:
+        mask &= events["failure_category"] == failure_category
+
+    if root_cause:
+        mask &= events["root_cause"] == root_cause
+
+    if warehouse_id:
+        mask &= warehouses == warehouse_id.upper()
+
+    if start_date:
+        mask &= dates >= np.datetime64(start_date, "D")
+
+    if end_date:
+        mask &= dates <= np.datetime64(end_date, "D")
+
+    descending = sort == "newest"
+    if after:
+        after_date, after_item, after_warehouse = np.datetime64(after[0], "D"), after[1], after[2]
+        if descending:
+            mask &= (dates < after_date) | ((dates == after_date) & (
+                (items < after_item) | ((items == after_item) & (warehouses < after_warehouse))
+            ))
+        else:
+            mask &= (dates > after_date) | ((dates == after_date) & (
+                (items > after_item) | ((items == after_item) & (warehouses > after_warehouse))
+            ))
+
+    rows = np.flatnonzero(mask)
+    order = np.lexsort((warehouses[rows], items[rows], dates[rows]))
+    rows = rows[order[::-1] if descending else order][:limit]
+    return events.records(rows)
+
+
+def get_stockouts_for_analysis(
+    item_ids: Optional[List[str]] = None,
+    failure_category: Optional[str] = None,
+    root_cause: Optional[str] = None,
+    latest_only: bool = False,
+    limit: int = 1000
+):
+    events = get_store()["STOCKOUT_EVENTS"]
+    dates, items, warehouses = events["stockout_date"], events["item_id"], events["warehouse_id"]
+    mask = np.ones(len(events), dtype=bool)
+
+    if item_ids is not None:
+        mask &= np.isin(items, np.array([i.upper() for i in item_ids], dtype=object))
+
+    if failure_category:
+        mask &= events["failure_category"] == failure_category
+
+    if root_cause:
+        mask &= events["root_cause"] == root_cause
+
+    rows = np.flatnonzero(mask)
+    # stockout_date DESC, then item_id and warehouse_id ascending
+    _, item_rank = np.unique(items[rows], return_inverse=True)
+    _, warehouse_rank = np.unique(warehouses[rows], return_inverse=True)
+    rows = rows[np.lexsort((warehouse_rank, item_rank, -dates[rows].astype(np.int64)))]
+
+    if latest_only:
+        # First row of each item in that order is its latest event
+        _, first = np.unique(items[rows], return_index=True)
+        rows = rows[np.sort(first)]
+    return events.records(rows[:limit])
+
+
+def get_event_details(item_id: str):
+    item_id = item_id.upper()
+    store = get_store()
+    events, snapshots = store["STOCKOUT_EVENTS"], store["INVENTORY_SNAPSHOT"]
+    forecasts, rules, orders = store["DEMAND_FORECAST"], store["REORDER_RULES"], store["PURCHASE_ORDERS"]
+
+    ev = _latest(events, events.rows_for("item_id", item_id), "stockout_date")
+    if ev is None:
+        return {}
+    stockout_date = events["stockout_date"][ev]
+
+    inv_rows = snapshots.rows_for("item_id", item_id)
+    inv_rows = inv_rows[
+        (snapshots["warehouse_id"][inv_rows] == events["warehouse_id"][ev])
+        & (snapshots["snapshot_time"][inv_rows] <= stockout_date)
+    ]
+    inv = _latest(snapshots, inv_rows, "snapshot_time")
+
+    fc_rows = forecasts.rows_for("item_id", item_id)
+    fc_rows = fc_rows[forecasts["forecast_created_date"][fc_rows] <= stockout_date]
+    fc = _latest(forecasts, fc_rows, "forecast_created_date")
+
+    rule = _rule_row(item_id, events["warehouse_id"][ev])
+    if inv is None or fc is None or rule is None:
+        return {}
+
+    po_rows = orders.rows_for("item_id", item_id)
+    incoming_qty = orders["quantity"][po_rows][orders["expected_arrival_date"][po_rows] > stockout_date].sum()
+
+    stock_on_hand = snapshots["stock_on_hand"][inv]
+    daily_demand = forecasts["daily_demand"][fc]
+    safety_stock = rules["safety_stock"][rule]
+    lead_time_days = rules["lead_time_days"][rule]
+    reorder_need_threshold = daily_demand * lead_time_days + safety_stock
+    projected_stock = stock_on_hand + incoming_qty
+
+    return {
+        "stock_on_hand": _scalar(stock_on_hand),
+        "incoming_qty": _scalar(incoming_qty),
+        "daily_demand": _scalar(daily_demand),
+        "safety_stock": _scalar(safety_stock),
+        "lead_time_days": _scalar(lead_time_days),
+        "reorder_need_threshold": _scalar(reorder_need_threshold),
+        "projected_stock": _scalar(projected_stock),
+        "explanation": (
+            "REORDER SHOULD HAVE TRIGGERED"
+            if projected_stock <= reorder_need_threshold
+            else "NO REORDER EXPECTED"
+        ),
+    }
+
+
+def get_event_details_batch(
+    item_ids: Optional[List[str]] = None,
+    failure_category: Optional[str] = None,
+    root_cause: Optional[str] = None
+) -> Dict[str, Dict[str, Any]]:
+    store = get_store()
+    events, snapshots = store["STOCKOUT_EVENTS"], store["INVENTORY_SNAPSHOT"]
+    forecasts, rules, orders = store["DEMAND_FORECAST"], store["REORDER_RULES"], store["PURCHASE_ORDERS"]
+
+    mask = np.ones(len(events), dtype=bool)
+    if item_ids is not None:
+        item_ids = [i.upper() for i in item_ids]
+        mask &= np.isin(events["item_id"], np.array(item_ids, dtype=object))
+    if failure_category:
+        mask &= events["failure_category"] == failure_category
+    if root_cause:
+        mask &= events["root_cause"] == root_cause
+
+    rows = np.flatnonzero(mask)
+    ev = rows[latest_per_group(events["item_id"][rows], events["stockout_date"][rows])]
+    ev_item, ev_wh, ev_date = events["item_id"][ev], events["warehouse_id"][ev], events["stockout_date"][ev]
+
+    inv = asof_index(
+        snapshots, ["item_id", "warehouse_id"], "snapshot_time",
+        [ev_item, ev_wh], ev_date
+    )
+    fc = asof_index(forecasts, ["item_id"], "forecast_created_date", [ev_item], ev_date)
+    rule = asof_index(
+        rules, ["item_id", "warehouse_id"], "last_updated",
+        [ev_item, ev_wh], np.full(len(ev), np.datetime64("9999-12-31"))
+    )
+    incoming_qty = sum_after(
+        orders, ["item_id"], "expected_arrival_date", "quantity",
+        [ev_item], ev_date
+    )
+
+    found = (inv >= 0) & (fc >= 0) & (rule >= 0)
+    stock_on_hand = snapshots["stock_on_hand"][inv[found]]
+    incoming_qty = incoming_qty[found]
+    daily_demand = forecasts["daily_demand"][fc[found]]
+    safety_stock = rules["safety_stock"][rule[found]]
+    lead_time_days = rules["lead_time_days"][rule[found]]
+    reorder_need_threshold = daily_demand * lead_time_days + safety_stock
+    projected_stock = stock_on_hand + incoming_qty
+    explanation = np.where(
+        projected_stock <= reorder_need_threshold,
+        "REORDER SHOULD HAVE TRIGGERED",
+        "NO REORDER EXPECTED"
+    )
+
+    results: Dict[str, Dict[str, Any]] = {item: {} for item in (item_ids or [])}
+    columns = zip(
+        to_python(ev_item[found]),
+        stock_on_hand.tolist(),
+        incoming_qty.tolist(),
+        daily_demand.tolist(),
+        safety_stock.tolist(),
+        lead_time_days.tolist(),
+        reorder_need_threshold.tolist(),
+        projected_stock.tolist(),
+        explanation.tolist(),
+    )
+    for item, soh, inc, demand, ss, lead, need, projected, why in columns:
+        results[item] = {
+            "stock_on_hand": soh,
+            "incoming_qty": inc,
+            "daily_demand": demand,
+            "safety_stock": ss,
+            "lead_time_days": lead,
+            "reorder_need_threshold": need,
+            "projected_stock": projected,
+            "explanation": why,
+        }
+    return results
+
+
+def simulate_event(item_id: str):
+    item_id = item_id.upper()
+    store = get_store()
+    snapshots, forecasts = store["INVENTORY_SNAPSHOT"], store["DEMAND_FORECAST"]
+    rules, orders = store["REORDER_RULES"], store["PURCHASE_ORDERS"]
+
+    # The rule of the warehouse with the latest snapshot
+    inv = _latest(snapshots, snapshots.rows_for("item_id", item_id), "snapshot_time")
+    fc = _latest(forecasts, forecasts.rows_for("item_id", item_id), "forecast_created_date")
+    rule = _rule_row(item_id, snapshots["warehouse_id"][inv]) if inv is not None else None
+    if rule is None or fc is None or inv is None:
+        return {}
+
+    incoming_qty = orders["quantity"][orders.rows_for("item_id", item_id)].sum()
+    new_safety_stock = rules["safety_stock"][rule] + 5
+    new_threshold = forecasts["daily_demand"][fc] * rules["lead_time_days"][rule] + new_safety_stock
+    projected_stock = snapshots["stock_on_hand"][inv] + incoming_qty
+
+    return {
+        "new_safety_stock": _scalar(new_safety_stock),
+        "new_threshold": _scalar(new_threshold),
+        "projected_stock_after_fix": _scalar(projected_stock),
+        "outcome": "STILL FAILS" if projected_stock <= new_threshold else "PREVENTS STOCKOUT",
+    }
+
+
+def _selected_items(
+    item_ids: Optional[List[str]],
+    failure_category: Optional[str],
+    root_cause: Optional[str]
+) -> np.ndarray:
+    """Items of REORDER_RULES matching the id list and/or recorded event filters"""
+    store = get_store()
+    items, _ = store["REORDER_RULES"].codes("item_id")
+
+    if item_ids is not None:
+        items = items[np.isin(items, np.array([i.upper() for i in item_ids], dtype=object))]
+
+    if failure_category or root_cause:
+        events = store["STOCKOUT_EVENTS"]
+        mask = np.ones(len(events), dtype=bool)
+        if failure_category:
+            mask &= events["failure_category"] == failure_category
+        if root_cause:
+            mask &= events["root_cause"] == root_cause
+        items = items[np.isin(items, events["item_id"][mask])]
+
+    return items
+
+
+def simulate_items(
+    item_ids: Optional[List[str]] = None,
+    failure_category: Optional[str] = None,
+    root_cause: Optional[str] = None,
+    safety_stock_delta: int = 0,
+    safety_stock_multiplier: float = 1.0,
+    lead_time_delta: int = 0,
+    lead_time_multiplier: float = 1.0,
+    reorder_threshold_delta: int = 0,
+    reorder_threshold_multiplier: float = 1.0
+):
+    store = get_store()
+    snapshots, forecasts = store["INVENTORY_SNAPSHOT"], store["DEMAND_FORECAST"]
+    rules, orders = store["REORDER_RULES"], store["PURCHASE_ORDERS"]
+
+    items = _selected_items(item_ids, failure_category, root_cause)
+    latest = np.full(len(items), np.datetime64("9999-12-31"))
+    # Per item: the latest snapshot and the rule of that snapshot's warehouse
+    inv = asof_index(snapshots, ["item_id"], "snapshot_time", [items], latest)
+    warehouses = np.where(inv >= 0, snapshots["warehouse_id"][np.maximum(inv, 0)], "").astype(object)
+    rule = asof_index(rules, ["item_id", "warehouse_id"], "last_updated", [items, warehouses], latest)
+    fc = asof_index(forecasts, ["item_id"], "forecast_created_date", [items], latest)
+    incoming_qty = sum_after(
+        orders, ["item_id"], "order_date", "quantity",
+        [items], np.full(len(items), np.datetime64("0001-01-01"))
+    )
+
+    found = (rule >= 0) & (fc >= 0) & (inv >= 0)
+    items, rule, fc, inv, incoming_qty = items[found], rule[found], fc[found], inv[found], incoming_qty[found]
+
+    safety_stock = rules["safety_stock"][rule]
+    lead_time_days = rules["lead_time_days"][rule]
+    reorder_threshold = rules["reorder_threshold"][rule]
+    daily_demand = forecasts["daily_demand"][fc]
+
+    def adjust(values, multiplier, delta):
+        # Snowflake ROUND goes half away from zero (np.round goes half to even); negatives clamp to 0 anyway
+        return np.maximum(np.floor(values * multiplier + delta + 0.5), 0).astype(np.int64)
+
+    new_safety_stock = adjust(safety_stock, safety_stock_multiplier, safety_stock_delta)
+    new_lead_time_days = adjust(lead_time_days, lead_time_multiplier, lead_time_delta)
+    new_reorder_threshold = adjust(reorder_threshold, reorder_threshold_multiplier, reorder_threshold_delta)
+    projected_stock = snapshots["stock_on_hand"][inv] + incoming_qty
+    new_threshold = daily_demand * new_lead_time_days + new_safety_stock
+    outcome = np.where(projected_stock <= new_threshold, "STILL FAILS", "PREVENTS STOCKOUT")
+    reorder_fires_in_time = new_reorder_threshold >= new_threshold
+
+    columns = {
+        "item_id": items,
+        "warehouse_id": rules["warehouse_id"][rule],
+        "safety_stock": safety_stock,
+        "lead_time_days": lead_time_days,
+        "reorder_threshold": reorder_threshold,
+        "daily_demand": daily_demand,
+        "new_safety_stock": new_safety_stock,
+        "new_lead_time_days": new_lead_time_days,
+        "new_reorder_threshold": new_reorder_threshold,
+        "projected_stock": projected_stock,
+        "new_threshold": new_threshold,
+        "outcome": outcome,
+        "reorder_fires_in_time": reorder_fires_in_time,
+    }
+    return Table("SIMULATION", columns).records()
+
+
+def get_replay_inputs(item_id: str, days: int = 365) -> Optional[ReplayInputs]:
+    item_id = item_id.upper()
+    store = get_store()
+    snapshots, forecasts = store["INVENTORY_SNAPSHOT"], store["DEMAND_FORECAST"]
+    events, orders = store["STOCKOUT_EVENTS"], store["PURCHASE_ORDERS"]
+    rules = store["REORDER_RULES"]
+
+    rule_rows = rules.rows_for("item_id", item_id)
+    inv_rows = snapshots.rows_for("item_id", item_id)
+    if not len(rule_rows) or not len(inv_rows):
+        return None
+
+    # First snapshot of every warehouse: the latest by negated time
+    first = latest_per_group(
+        snapshots["warehouse_id"][inv_rows],
+        -snapshots["snapshot_time"][inv_rows].astype(np.int64)
+    )
+    start_rows = inv_rows[first]
+    start_date = snapshots["snapshot_time"][start_rows].astype("datetime64[D]").min()
+    warehouse_ids = to_python(snapshots["warehouse_id"][start_rows])
+
+    # Latest rule per warehouse
+    latest = {}
+    for rule in rules.records(rule_rows, columns=["warehouse_id", "last_updated", *RULE_COLUMNS]):
+        current = latest.get(rule["warehouse_id"])
+        if current is None or (rule["last_updated"] or date.min) > (current["last_updated"] or date.min):
+            latest[rule["warehouse_id"]] = rule
+    safety_stock, reorder_threshold, lead_time_days = warehouse_rules(warehouse_ids, list(latest.values()))
+
+    fc_rows = forecasts.rows_for("item_id", item_id)
+    actual = forecasts["actual_demand"][fc_rows].astype(np.float64)
+    actual = np.where(np.isnan(actual), forecasts["daily_demand"][fc_rows], actual)
+
+    quantities = orders["quantity"][orders.rows_for("item_id", item_id)]
+
+    return ReplayInputs(
+        item_id=item_id,
+        start_date=start_date.item(),
+        warehouse_ids=warehouse_ids,
+        start_stock=np.nan_to_num(snapshots["stock_on_hand"][start_rows].astype(np.float64)),
+        demand=daily_demand(start_date, forecasts["forecast_date"][fc_rows], actual, days),
+        safety_stock=safety_stock,
+        reorder_threshold=reorder_threshold,
+        lead_time_days=lead_time_days,
+        order_qty=float(np.nanmean(quantities)) if len(quantities) else DEFAULT_ORDER_QTY,
+        recorded_stockouts=len(events.rows_for("item_id", item_id)),
+    )
+
+
+# ========================================
+# DASHBOARD
+# ========================================
+
+def get_dashboard_summary(days: int = 30):
+    events = get_store()["STOCKOUT_EVENTS"]
+    rows = np.flatnonzero(events["stockout_date"] >= today() - np.timedelta64(days, "D"))
+
+    if not len(rows):
+        return {
+            "total_stockouts": 0,
+            "execution_failures": None,
+            "decision_failures": None,
+            "avg_confidence": None,
+            "top_root_cause": None,
+        }
+
+    categories = events["failure_category"][rows]
+    causes, counts = np.unique(events["root_cause"][rows].astype(str), return_counts=True)
+
+    return {
+        "total_stockouts": len(rows),
+        "execution_failures": int((categories == "EXECUTION_FAILURE").sum()),
+        "decision_failures": int((categories == "DECISION_FAILURE").sum()),
+        "avg_confidence": _scalar(np.nanmean(events["analysis_confidence"][rows])),
+        "top_root_cause": str(causes[np.argmax(counts)]),
+    }
+
+
+def get_root_cause_distribution():
+    events = get_store()["STOCKOUT_EVENTS"]
+    causes, counts = np.unique(events["root_cause"].astype(str), return_counts=True)
+    order = _sort_desc(counts)
+    total = int(counts.sum())
+
+    return [
+        {
+            "root_cause": str(causes[i]),
+            "count": int(counts[i]),
+            "percentage": round(float(counts[i]) * 100.0 / total, 2),
+        }
+        for i in order
+    ]
+
+
+def get_trend_counts(days: int, granularity: str):
+    events = get_store()["STOCKOUT_EVENTS"]
+    rows = np.flatnonzero(events["stockout_date"] >= today() - np.timedelta64(days, "D"))
+
+    dates = events["stockout_date"][rows]
+    if granularity == "week":
+        # DATE_TRUNC('week') starts weeks on Monday; 1970-01-01 was a Thursday
+        dates = dates - ((dates.astype(np.int64) + 3) % 7).astype("timedelta64[D]")
+    elif granularity == "month":
+        dates = dates.astype("datetime64[M]").astype("datetime64[D]")
+    periods, inverse = np.unique(dates, return_inverse=True)
+
+    categories = events["failure_category"][rows]
+    counts = np.bincount(inverse, minlength=len(periods))
+    execution = np.bincount(inverse, weights=categories == "EXECUTION_FAILURE", minlength=len(periods))
+    decision = np.bincount(inverse, weights=categories == "DECISION_FAILURE", minlength=len(periods))
+
+    return [
+        {
+            "period": period,
+            "granularity": granularity,
+            "stockout_count": int(count),
+            "execution_failures": int(e),
+            "decision_failures": int(d),
+        }
+        for period, count, e, d in zip(to_python(periods), counts, execution, decision)
+    ]
+
+
+# ========================================
+# ITEM-SPECIFIC INTELLIGENCE
+# ========================================
+
+def get_inventory_points(item_id: str, days: int = 30, warehouse_id: Optional[str] = None):
+    store = get_store()
+    snapshots, rules = store["INVENTORY_SNAPSHOT"], store["REORDER_RULES"]
+
+    inv_rows = snapshots.rows_for("item_id", item_id)
+    rule_rows = rules.rows_for("item_id", item_id)
+    if not len(inv_rows) or not len(rule_rows):
+        return []
+
+    times = snapshots["snapshot_time"][inv_rows]
+    inv_rows = inv_rows[times >= times.max() - np.timedelta64(days, "D")]
+    if warehouse_id is not None:
+        inv_rows = inv_rows[snapshots["warehouse_id"][inv_rows] == warehouse_id]
+
+    # Latest rule per warehouse, joined on warehouse_id (snapshots without one drop out)
+    latest = rule_rows[latest_per_group(rules["warehouse_id"][rule_rows], rules["last_updated"][rule_rows])]
+    rule_for = dict(zip(rules["warehouse_id"][latest].tolist(), latest.tolist()))
+    rule_idx = np.array([rule_for.get(w, -1) for w in snapshots["warehouse_id"][inv_rows].tolist()], dtype=np.int64)
+    inv_rows, rule_idx = inv_rows[rule_idx >= 0], rule_idx[rule_idx >= 0]
+
+    order = np.lexsort((snapshots["snapshot_time"][inv_rows], snapshots["warehouse_id"][inv_rows].astype(str)))
+    inv_idx, rule_idx = inv_rows[order], rule_idx[order]
+
+    stock = snapshots["stock_on_hand"][inv_idx]
+    threshold = rules["reorder_threshold"][rule_idx]
+    safety = rules["safety_stock"][rule_idx]
+    status = np.select(
+        [stock <= threshold, stock <= safety],
+        ["BELOW_THRESHOLD", "CRITICAL"],
+        default="HEALTHY"
+    )
+
+    return [
+        {
+            "snapshot_time": t,
+            "warehouse_id": w,
+            "stock_on_hand": s,
+            "reorder_threshold": r,
+            "safety_stock": ss,
+            "status": st,
+        }
+        for t, w, s, r, ss, st in zip(
+            to_python(snapshots["snapshot_time"][inv_idx]),
+            snapshots["warehouse_id"][inv_idx].tolist(),
+            stock.tolist(),
+            threshold.tolist(),
+            safety.tolist(),
+            status.tolist(),
+        )
+    ]
+
+
+def get_forecast_accuracy(item_id: str):
+    item_id = item_id.upper()
+    forecasts = get_store()["DEMAND_FORECAST"]
+
+    rows = forecasts.rows_for("item_id", item_id)
+    rows = rows[_sort_desc(forecasts["forecast_date"][rows])][:30]
+    confidence = forecasts["forecast_confidence"][rows]
+    level = np.select(
+        [confidence < 0.6, confidence < 0.8],
+        ["LOW_CONFIDENCE", "MEDIUM_CONFIDENCE"],
+        default="HIGH_CONFIDENCE"
+    )
+
+    records = forecasts.records(
+        rows,
+        columns=["forecast_date", "daily_demand", "forecast_confidence"],
+        rename={"daily_demand": "forecasted"}
+    )
+    for record, confidence_level in zip(records, level.tolist()):
+        record["confidence_level"] = confidence_level
+    return records
+
+
+def get_forecast_pairs(
+    item_id: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+) -> Table:
+    forecasts = get_store()["DEMAND_FORECAST"]
+    mask = ~np.isnan(forecasts["actual_demand"].astype(np.float64))
+    if item_id is not None:
+        mask &= forecasts["item_id"] == item_id
+    if start_date:
+        mask &= forecasts["forecast_date"] >= np.datetime64(start_date, "D")
+    if end_date:
+        mask &= forecasts["forecast_date"] <= np.datetime64(end_date, "D")
+    rows = np.flatnonzero(mask)
+    columns = ("item_id", "forecast_date", "daily_demand", "actual_demand")
+    return Table(forecasts.name, {c: forecasts[c][rows] for c in columns})
+
+
+def get_supplier_performance():
+    orders = get_store()["PURCHASE_ORDERS"]
+    rows = np.flatnonzero(orders["delay_reason"] != None)  # noqa: E711 (elementwise)
+    if not len(rows):
+        return []
+
+    reasons, inverse, counts = np.unique(
+        orders["delay_reason"][rows].astype(str), return_inverse=True, return_counts=True
+    )
+    delay = (orders["actual_arrival_date"][rows] - orders["expected_arrival_date"][rows]).astype("float64")
+    has_delay = ~np.isnat(orders["actual_arrival_date"][rows]) & ~np.isnat(orders["expected_arrival_date"][rows])
+    delay_sum = np.bincount(inverse, weights=np.where(has_delay, delay, 0.0), minlength=len(reasons))
+    delay_n = np.bincount(inverse, weights=has_delay.astype(float), minlength=len(reasons))
+    delayed = np.bincount(inverse, weights=(orders["status"][rows] == "DELAYED").astype(float), minlength=len(reasons))
+
+    return [
+        {
+            "delay_reason": str(reasons[i]),
+            "total_delays": int(counts[i]),
+            "avg_delay_days": float(delay_sum[i] / delay_n[i]) if delay_n[i] else None,
+            "delay_rate_pct": float(delayed[i] * 100.0 / counts[i]),
+        }
+        for i in _sort_desc(counts)
+    ]
+
+
+def get_event_watermark() -> Tuple[Optional[datetime], int]:
+    analyzed = get_store()["STOCKOUT_EVENTS"]["analyzed_at"]
+    analyzed = analyzed[~np.isnat(analyzed)]
+    latest = analyzed.max().astype(datetime) if len(analyzed) else None
+    return latest, len(get_store()["STOCKOUT_EVENTS"])
+
+
+def get_reorder_triggers(item_id: Optional[str] = None, days: int = 30):
+    orders = get_store()["PURCHASE_ORDERS"]
+
+    rows = orders.rows_for("item_id", item_id.upper()) if item_id else np.arange(len(orders))
+    rows = rows[orders["order_date"][rows] >= today() - np.timedelta64(days, "D")]
+    rows = rows[_sort_desc(orders["order_date"][rows])]
+
+    return [
+        {
+            "order_id": order_id,
+            "item_id": item,
+            "trigger_date": trigger_date,
+            "event_type": "REORDER_TRIGGERED",
+            "status": status,
+        }
+        for order_id, item, trigger_date, status in zip(
+            to_python(orders["order_id"][rows]),
+            to_python(orders["item_id"][rows]),
+            to_python(orders["order_date"][rows]),
+            to_python(orders["status"][rows]),
+        )
+    ]
+
+
+def get_rule_health():
+    store = get_store()
+    rules, events = store["REORDER_RULES"], store["STOCKOUT_EVENTS"]
+
+    # DECISION_FAILURE events per item and warehouse, counted against every rule of that pair
+    decision = np.flatnonzero(events["failure_category"] == "DECISION_FAILURE")
+    failures = Counter(zip(events["item_id"][decision].tolist(), events["warehouse_id"][decision].tolist()))
+    stockouts = np.array([
+        failures.get(key, 0) if None not in key else 0
+        for key in zip(rules["item_id"].tolist(), rules["warehouse_id"].tolist())
+    ], dtype=np.int64)
+
+    updated = rules["last_updated"]
+    days = np.where(np.isnat(updated), np.nan, (today() - updated).astype("float64"))
+    status = np.select(
+        [days > 180, stockouts > 2, rules["safety_stock"] < 20],
+        ["STALE_RULE", "INEFFECTIVE_RULE", "SAFETY_STOCK_TOO_LOW"],
+        default="HEALTHY"
+    )
+
+    rows = np.flatnonzero(status != "HEALTHY")
+    # ORDER BY stockout_count DESC, days_since_update DESC (NULLs first, as Snowflake sorts them descending)
+    rows = rows[np.lexsort((-np.nan_to_num(days[rows], nan=np.inf), -stockouts[rows]))]
+
+    records = rules.records(rows, columns=["item_id", "warehouse_id", "safety_stock", "reorder_threshold"])
+    for record, days_since, count, health in zip(
+        records, to_python(days[rows]), stockouts[rows].tolist(), status[rows].tolist()
+    ):
+        record["days_since_update"] = None if days_since is None else int(days_since)
+        record["stockout_count"] = count
+        record["health_status"] = health
+    return records
+
+
+# ========================================
+# ROOT CAUSE ANALYSIS
+# ========================================
+
+def get_fingerprint_versions() -> Tuple[Optional[str], ...]:
+    # Forecasts, orders and rules are loaded once and never change in memory
+    return ()
+
+
+def get_root_cause_inputs(
+    unanalyzed_only: bool = False,
+    analyzed_since: Optional[datetime] = None
+) -> Tuple[Table, Table, Table, Table]:
+    store = get_store()
+    events = store["STOCKOUT_EVENTS"]
+    keep = np.ones(len(events), dtype=bool)
+    if unanalyzed_only:
+        keep &= np.isnan(events["analysis_confidence"])
+    if analyzed_since is not None:
+        keep &= events["analyzed_at"] >= np.datetime64(analyzed_since, "us")
+    if not keep.all():
+        rows = np.flatnonzero(keep)
+        events = Table(events.name, {c: v[rows] for c, v in events.columns.items()})
+    return events, store["DEMAND_FORECAST"], store["PURCHASE_ORDERS"], store["REORDER_RULES"]
+
+
+def update_root_causes(updates: List[Dict[str, Any]]) -> int:
+    """Apply reclassifications to the in-memory events (the CSV extract is left as is)"""
+    events = get_store()["STOCKOUT_EVENTS"]
+    position = {
+        key: i for i, key in enumerate(zip(
+            events["item_id"].tolist(), events["warehouse_id"].tolist(), events["stockout_date"].tolist()
+        ))
+    }
+    rows = [position[(u["item_id"], u["warehouse_id"], u["stockout_date"])] for u in updates]
+    if rows:
+        events["root_cause"][rows] = [u["root_cause"] for u in updates]
+        events["analysis_confidence"][rows] = [u["analysis_confidence"] for u in updates]
+        events["analyzed_at"][rows] = np.datetime64(datetime.now(), "us")
+        # Groupings memoized over the old values are stale now
+        events._groups.clear()
+        events._memo.clear()
+    return len(rows)
+
+
+# ========================================
+# EXPORT & REPORTING
+# ========================================
+
+def _failure_report_rows(start_date: Optional[date], end_date: Optional[date]) -> np.ndarray:
+    events = get_store()["STOCKOUT_EVENTS"]
+    mask = np.ones(len(events), dtype=bool)
+    if start_date:
+        mask &= events["stockout_date"] >= np.datetime64(start_date, "D")
+    if end_date:
+        mask &= events["stockout_date"] <= np.datetime64(end_date, "D")
+    return np.flatnonzero(mask)
+
+
+def count_failure_report(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+) -> int:
+    return len(_failure_report_rows(start_date, end_date))
+
+
+def iter_failure_report(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    batch_size: int = 5000
+) -> Iterator[List[Dict[str, Any]]]:
+    store = get_store()
+    events, rules = store["STOCKOUT_EVENTS"], store["REORDER_RULES"]
+
+    rows = _failure_report_rows(start_date, end_date)
+    rows = rows[_sort_desc(events["stockout_date"][rows])]
+
+    # Only the current batch is joined and materialized
+    for offset in range(0, len(rows), batch_size):
+        event_idx = rows[offset:offset + batch_size]
+        # Latest rule of the event's item and warehouse
+        rule_idx = asof_index(
+            rules, ["item_id", "warehouse_id"], "last_updated",
+            [events["item_id"][event_idx], events["warehouse_id"][event_idx]],
+            np.full(len(event_idx), np.datetime64("9999-12-31"))
+        )
+
+        owner = np.where(rule_idx >= 0, rules["rule_owner"][np.maximum(rule_idx, 0)], None)
+        root_cause = events["root_cause"][event_idx]
+        assigned = np.select(
+            [root_cause == "SUPPLIER_DELAY", root_cause == "FORECAST_UNDERESTIMATED", root_cause == "THRESHOLD_TOO_LOW"],
+            ["Operations Team", "Planning Team", owner],
+            default="System Admin"
+        )
+
+        records = events.records(
+            event_idx,
+            columns=["item_id", "warehouse_id", "stockout_date", "failure_category", "root_cause"]
+        )
+        for record, responsible, assigned_to in zip(records, owner.tolist(), assigned.tolist()):
+            record["responsible_person"] = responsible
+            record["assigned_to"] = assigned_to
+        yield records
@@ -1,6 +1,6 @@
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 class Job(BaseModel):
     job_id: str
@@ -19,3 +19,29 @@ class MatchedCandidate(BaseModel):
     years_total: Optional[float]
     match_score: Optional[float]
     candidate_updated_on: Optional[datetime]
+
+
+class EventBatchRequest(BaseModel):
+    item_ids: Optional[List[str]] = None
+    failure_category: Optional[str] = None
+    root_cause: Optional[str] = None
+
+
+class SimulationRequest(BaseModel):
+    item_ids: Optional[List[str]] = None
+    failure_category: Optional[str] = None
+    root_cause: Optional[str] = None
+    safety_stock_delta: int = 0
+    safety_stock_multiplier: float = 1.0
+    lead_time_delta: int = 0
+    lead_time_multiplier: float = 1.0
+    reorder_threshold_delta: int = 0
+    reorder_threshold_multiplier: float = 1.0
+
+
+class AIAnalysisBatchRequest(BaseModel):
+    item_ids: Optional[List[str]] = None
+    failure_category: Optional[str] = None
+    root_cause: Optional[str] = None
+    latest_only: bool = False
+    limit: int = Field(1000, ge=1, le=10000)
@@ -0,0 +1,143 @@
+"""
+Read-through cache for the analytics functions in service.py.
+
+Keys are the function name, its bound parameters, the current date (several
+queries are relative to CURRENT_DATE()) and the data version of every table
+the query reads. A table's version is its LAST_ALTERED time, so entries stop
+matching as soon as a load touches one of their tables.
+"""
+import inspect
+import logging
+import threading
+import time
+from datetime import date
+from functools import wraps
+from typing import Dict, Tuple
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import Session
+
+from src.utils.cache import LRUCache, SQLiteCache, TieredCache, digest
+from src.utils.config import (
+    ANALYTICS_BACKEND,
+    DATA_VERSION_CHECK_SECONDS,
+    READ_CACHE_DIR,
+    READ_CACHE_MAX_ENTRIES,
+    READ_CACHE_TTL,
+)
+
+logger = logging.getLogger(__name__)
+
+read_cache = TieredCache(
+    LRUCache(max_entries=READ_CACHE_MAX_ENTRIES, ttl=READ_CACHE_TTL),
+    SQLiteCache(f"{READ_CACHE_DIR}/read_cache.sqlite", ttl=READ_CACHE_TTL) if READ_CACHE_DIR else None,
+)
+
+_MISSING = object()
+
+ANALYTICS_TABLES = (
+    "STOCKOUT_EVENTS",
+    "INVENTORY_SNAPSHOT",
+    "DEMAND_FORECAST",
+    "REORDER_RULES",
+    "PURCHASE_ORDERS",
+)
+
+_versions: Dict[str, str] = {}
+_versions_checked_at = 0.0
+# Bumped by invalidate_versions; a fetch started before a bump cannot satisfy a read after it
+_versions_generation = 0
+_fetched_generation = -1
+_versions_fetching = False
+_versions_changed = threading.Condition()
+
+
+def _fetch_table_versions(db: Session) -> Dict[str, str]:
+    query = text("""
+        SELECT table_name, last_altered
+        FROM INFORMATION_SCHEMA.TABLES
+        WHERE table_schema = CURRENT_SCHEMA()
+          AND table_name IN :tables
+    """).bindparams(bindparam("tables", expanding=True))
+    result = db.execute(query, {"tables": list(ANALYTICS_TABLES)})
+    return {row[0].upper(): str(row[1]) for row in result.fetchall()}
+
+
+def get_table_versions(db: Session) -> Dict[str, str]:
+    """
+    LAST_ALTERED per analytics table, re-checked at most every
+    DATA_VERSION_CHECK_SECONDS. One caller at a time runs the metadata query,
+    outside the lock; while it does, the others keep the previous versions
+    (or wait for it, on first use and after invalidate_versions). Each caller
+    gets its own copy.
+    """
+    global _versions, _versions_checked_at, _fetched_generation, _versions_fetching
+    with _versions_changed:
+        while True:
+            current = _fetched_generation == _versions_generation
+            if current and time.time() - _versions_checked_at < DATA_VERSION_CHECK_SECONDS:
+                return dict(_versions)
+            if not _versions_fetching:
+                _versions_fetching = True
+                generation = _versions_generation
+                break
+            if current:
+                # Expired, not invalidated: the previous versions do until the refresh lands
+                return dict(_versions)
+            _versions_changed.wait()
+
+    versions: Dict[str, str] = {}
+    try:
+        versions = _fetch_table_versions(db)
+    except Exception:
+        # Without versions the TTL still bounds staleness
+        logger.exception("Could not read table versions")
+        db.rollback()
+    finally:
+        with _versions_changed:
+            _versions = versions
+            _versions_checked_at = time.time()
+            _fetched_generation = generation
+            _versions_fetching = False
+            _versions_changed.notify_all()
+    return dict(versions)
+
+
+def invalidate_versions() -> None:
+    """Force the next read to re-check table versions (e.g. after a load)"""
+    global _versions_generation
+    with _versions_changed:
+        _versions_generation += 1
+
+
+def cached(*tables: str):
+    """
+    Cache a `fn(db, ...)` read keyed on its parameters and the versions of `tables`.
+    Memory hits hand every caller the same object: treat results as read-only.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @wraps(func)
+        def wrapper(db, *args, **kwargs):
+            if ANALYTICS_BACKEND == "local":
+                return func(db, *args, **kwargs)
+
+            bound = signature.bind(db, *args, **kwargs)
+            bound.apply_defaults()
+            params: Tuple = tuple((k, v) for k, v in bound.arguments.items() if k != "db")
+            versions = get_table_versions(db)
+            key = digest(
+                func.__module__, func.__qualname__, params, date.today(),
+                tuple(versions.get(t) for t in tables)
+            )
+
+            value = read_cache.get(key, _MISSING)
+            if value is _MISSING:
+                value = func(db, *args, **kwargs)
+                read_cache.set(key, value)
+            return value
+
+        wrapper.uncached = func
+        return wrapper
+    return decorator
@@ -0,0 +1,214 @@
+"""
+Inventory replay engine.
+
+Replays actual demand day by day from a starting snapshot under a reorder
+policy: when end-of-day stock is at or below the reorder threshold and no
+order is outstanding, an order is placed that lands `lead_time_days` later
+(before that day's demand). Unmet demand is lost, so stock never goes below
+zero. A stockout is a day on which stock drops to zero from a positive level.
+
+Warehouses are replayed together, each under its own reorder rule, and the
+days between two events (a threshold crossing or an arrival) are resolved
+at once from cumulative demand, so the loop runs once per order rather than
+once per day.
+"""
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+# Order size when an item has no purchase order history
+DEFAULT_ORDER_QTY = 150.0
+
+
+@dataclass
+class ReplayInputs:
+    item_id: str
+    start_date: date
+    warehouse_ids: List[str]
+    start_stock: np.ndarray           # [W] stock at the end of start_date
+    demand: np.ndarray                # [D] or [W, D] demand for the days after start_date
+    safety_stock: np.ndarray          # [W] of each warehouse's rule
+    reorder_threshold: np.ndarray     # [W]
+    lead_time_days: np.ndarray        # [W]
+    order_qty: float                  # typical purchase order size
+    recorded_stockouts: int = 0
+
+
+@dataclass
+class ReplayResult:
+    stockout_days: List[np.ndarray]   # per warehouse, day offsets after start_date
+    orders_placed: np.ndarray         # [W]
+    final_stock: np.ndarray           # [W]
+    stockouts: int = field(init=False)
+
+    def __post_init__(self):
+        self.stockouts = int(sum(len(d) for d in self.stockout_days))
+
+
+def daily_demand(start_date, dates: np.ndarray, values: np.ndarray, days: int) -> np.ndarray:
+    """
+    Mean demand per day for the `days` days after `start_date`, as a dense array.
+
+    Days without a value count as zero demand; the series ends at the last
+    day that has one.
+    """
+    offsets = (np.asarray(dates, dtype="datetime64[D]") - np.datetime64(start_date, "D")).astype(np.int64) - 1
+    values = np.asarray(values, dtype=np.float64)
+    keep = (offsets >= 0) & (offsets < days) & ~np.isnan(values)
+    offsets, values = offsets[keep], values[keep]
+    if not len(offsets):
+        return np.zeros(0)
+    length = int(offsets.max()) + 1
+    totals = np.bincount(offsets, weights=values, minlength=length)
+    counts = np.bincount(offsets, minlength=length)
+    return np.divide(totals, counts, out=np.zeros(length), where=counts > 0)
+
+
+RULE_COLUMNS = ("safety_stock", "reorder_threshold", "lead_time_days")
+
+
+def warehouse_rules(warehouse_ids: List[str], rules: List[Dict[str, Any]]) -> Tuple[np.ndarray, ...]:
+    """
+    Safety stock, reorder threshold and lead time ([W] each) for the replayed
+    warehouses, from the latest rule per warehouse in `rules` (dicts with
+    warehouse_id, last_updated and RULE_COLUMNS). A warehouse without a rule
+    of its own takes the item's most recently updated rule.
+    """
+    by_warehouse = {rule["warehouse_id"]: rule for rule in rules}
+    latest = max(rules, key=lambda rule: (rule["last_updated"] is not None, rule["last_updated"] or 0))
+    picked = [by_warehouse.get(warehouse, latest) for warehouse in warehouse_ids]
+    return tuple(
+        np.array([rule[column] for rule in picked], dtype=np.float64) for column in RULE_COLUMNS
+    )
+
+
+def replay_inventory(
+    start_stock: np.ndarray,
+    demand: np.ndarray,
+    reorder_threshold,
+    safety_stock,
+    lead_time_days,
+    order_qty: float
+) -> ReplayResult:
+    """
+    Replay `demand` ([D] shared or [W, D] per warehouse) from `start_stock` ([W]).
+    The rule parameters are scalars or [W] arrays.
+
+    Orders top stock up to reorder_threshold + safety_stock, and are never
+    smaller than `order_qty`. Day offsets in the result are 1-based: day 1 is
+    the first day of `demand`.
+    """
+    stock = np.asarray(start_stock, dtype=np.float64).copy()
+    n_wh = len(stock)
+    demand = np.broadcast_to(np.asarray(demand, dtype=np.float64), (n_wh, np.shape(demand)[-1]))
+    # Column 0 is the starting day, so offsets line up with day numbers
+    demand = np.concatenate([np.zeros((n_wh, 1)), demand], axis=1)
+    horizon = demand.shape[1]
+    cumulative = np.cumsum(demand, axis=1)
+    days = np.arange(horizon)
+
+    threshold = np.broadcast_to(np.asarray(reorder_threshold, dtype=np.float64), n_wh)
+    order_up_to = threshold + np.broadcast_to(np.asarray(safety_stock, dtype=np.float64), n_wh)
+    lead = np.maximum(np.broadcast_to(np.asarray(lead_time_days, dtype=np.float64), n_wh).astype(np.int64), 1)
+
+    t = np.zeros(n_wh, dtype=np.int64)
+    pending_day = np.full(n_wh, -1, dtype=np.int64)
+    pending_qty = np.zeros(n_wh)
+    orders_placed = np.zeros(n_wh, dtype=np.int64)
+    stockout_wh: List[np.ndarray] = []
+    stockout_day: List[np.ndarray] = []
+
+    def place_orders(rows: np.ndarray) -> None:
+        rows = rows[(stock[rows] <= threshold[rows]) & (pending_day[rows] < 0)]
+        pending_day[rows] = t[rows] + lead[rows]
+        pending_qty[rows] = np.maximum(order_qty, order_up_to[rows] - stock[rows])
+        orders_placed[rows] += 1
+
+    place_orders(np.arange(n_wh))
+    active = np.flatnonzero(t < horizon - 1)
+
+    while len(active):
+        w = active
+        idx = np.arange(len(w))
+        # Stock on each later day if nothing arrives (before clamping at zero)
+        remaining = stock[w, None] - (cumulative[w] - cumulative[w, t[w]][:, None])
+        later = days[None, :] > t[w, None]
+
+        has_order = pending_day[w] >= 0
+        crossing = later & (remaining <= threshold[w, None]) & ~has_order[:, None]
+        cross_day = np.where(crossing.any(axis=1), crossing.argmax(axis=1), horizon)
+        arrival_day = np.where(has_order, pending_day[w], horizon)
+        event = np.minimum(np.minimum(cross_day, arrival_day), horizon - 1)
+        arrives = arrival_day == event
+
+        # Stock runs out between now and the event (monotone without arrivals)
+        empty = later & (remaining <= 0) & (stock[w, None] > 0)
+        empty_day = np.where(empty.any(axis=1), empty.argmax(axis=1), horizon)
+        before_event = (empty_day < event) | ((empty_day == event) & ~arrives)
+
+        prev_stock = np.maximum(remaining[idx, event - 1], 0)
+        arrival_stock = np.maximum(prev_stock + pending_qty[w] - demand[w, event], 0)
+        new_stock = np.where(arrives, arrival_stock, np.maximum(remaining[idx, event], 0))
+        on_arrival = arrives & (arrival_stock <= 0) & (prev_stock > 0)
+
+        hit = before_event | on_arrival
+        stockout_wh.append(w[hit])
+        stockout_day.append(np.where(before_event, empty_day, event)[hit])
+
+        landed = w[arrives]
+        pending_day[landed] = -1
+        pending_qty[landed] = 0
+        t[w] = event
+        stock[w] = new_stock
+        place_orders(w)
+        active = w[t[w] < horizon - 1]
+
+    all_wh = np.concatenate(stockout_wh) if stockout_wh else np.empty(0, dtype=np.int64)
+    all_day = np.concatenate(stockout_day) if stockout_day else np.empty(0, dtype=np.int64)
+    return ReplayResult(
+        stockout_days=[np.sort(all_day[all_wh == i]) for i in range(n_wh)],
+        orders_placed=orders_placed,
+        final_stock=stock,
+    )
+
+
+def compare_replay(inputs: ReplayInputs, new_safety_stock: int, new_threshold: int) -> Dict[str, Any]:
+    """Replay the current and the proposed rule over the same demand history"""
+    current = replay_inventory(
+        inputs.start_stock, inputs.demand, inputs.reorder_threshold,
+        inputs.safety_stock, inputs.lead_time_days, inputs.order_qty
+    )
+    proposed = replay_inventory(
+        inputs.start_stock, inputs.demand, new_threshold,
+        new_safety_stock, inputs.lead_time_days, inputs.order_qty
+    )
+
+    def to_dates(offsets: np.ndarray) -> List[date]:
+        return [inputs.start_date + timedelta(days=int(d)) for d in offsets]
+
+    return {
+        "item_id": inputs.item_id,
+        "current_stockouts": inputs.recorded_stockouts,
+        "proposed_safety_stock": new_safety_stock,
+        "proposed_threshold": new_threshold,
+        "estimated_stockouts": proposed.stockouts,
+        "simulated_current_stockouts": current.stockouts,
+        "replay_start": inputs.start_date,
+        "replay_days": int(np.shape(inputs.demand)[-1]),
+        "warehouses": [
+            {
+                "warehouse_id": wh,
+                "current_safety_stock": int(inputs.safety_stock[i]),
+                "current_threshold": int(inputs.reorder_threshold[i]),
+                "lead_time_days": int(inputs.lead_time_days[i]),
+                "current_stockout_dates": to_dates(current.stockout_days[i]),
+                "proposed_stockout_dates": to_dates(proposed.stockout_days[i]),
+                "current_orders": int(current.orders_placed[i]),
+                "proposed_orders": int(proposed.orders_placed[i]),
+            }
+            for i, wh in enumerate(inputs.warehouse_ids)
+        ],
+    }
+
@@ -0,0 +1,276 @@
+"""
+Summary tables behind the dashboard aggregations.
+
+STOCKOUT_DAILY_ROLLUP holds event counts (and confidence sums) per
+stockout_date, failure_category and root_cause; ITEM_FAILURE_ROLLUP holds
+event counts per item, warehouse and failure_category. Reads aggregate these small
+tables instead of rescanning STOCKOUT_EVENTS.
+
+Reads never write. `rollup_sources` hands a read the rollup tables only
+while ROLLUP_WATERMARK shows they were built from the current state of
+STOCKOUT_EVENTS (its LAST_ALTERED version, event count and latest
+`analyzed_at`); otherwise the read aggregates STOCKOUT_EVENTS directly, with
+the same columns, until the next refresh.
+
+Refreshes run from the paths that write events (root-cause updates, the
+stockout detector), from the rollup-refresh job and, when
+ROLLUP_REFRESH_SECONDS is set, on a timer that picks up rows loaded from
+outside the app, so the read role needs no write grants. Concurrent
+refreshes, in this process or another worker, take turns on a lock held in
+ROLLUP_WATERMARK. A refresh is incremental from the `analyzed_at` watermark
+when that explains every change: the dates and items of events analyzed
+since the last refresh are recomputed from scratch, so re-analyzed events
+move between buckets instead of being counted twice. When the table changed
+in a way the watermark cannot see (events deleted, or loaded with an older
+or no `analyzed_at`, so the count moved without a newer `analyzed_at`, or
+LAST_ALTERED moved with nothing newer at all) the rollups are rebuilt.
+"""
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from src.snowflake.read_cache import get_table_versions, invalidate_versions
+
+DAILY_ROLLUP = "STOCKOUT_DAILY_ROLLUP"
+ITEM_ROLLUP = "ITEM_FAILURE_ROLLUP"
+WATERMARK_TABLE = "ROLLUP_WATERMARK"
+
+_DDL = (
+    f"""
+    CREATE TABLE IF NOT EXISTS {DAILY_ROLLUP} (
+        stockout_date DATE,
+        failure_category STRING,
+        root_cause STRING,
+        event_count NUMBER,
+        confidence_sum FLOAT,
+        confidence_count NUMBER,
+        refreshed_at TIMESTAMP_NTZ
+    )
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS {ITEM_ROLLUP} (
+        item_id STRING,
+        warehouse_id STRING,
+        failure_category STRING,
+        event_count NUMBER,
+        refreshed_at TIMESTAMP_NTZ
+    )
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE} (
+        rollup_name STRING,
+        analyzed_at TIMESTAMP_NTZ,
+        refreshed_at TIMESTAMP_NTZ
+    )
+    """,
+    f"ALTER TABLE {WATERMARK_TABLE} ADD COLUMN IF NOT EXISTS event_count NUMBER",
+    f"ALTER TABLE {WATERMARK_TABLE} ADD COLUMN IF NOT EXISTS source_version STRING",
+    f"ALTER TABLE {ITEM_ROLLUP} ADD COLUMN IF NOT EXISTS warehouse_id STRING",
+)
+
+_DAILY_SELECT = """
+    SELECT
+        stockout_date,
+        failure_category,
+        root_cause,
+        COUNT(*) AS event_count,
+        SUM(analysis_confidence) AS confidence_sum,
+        COUNT(analysis_confidence) AS confidence_count
+    FROM STOCKOUT_EVENTS
+    {where}
+    GROUP BY stockout_date, failure_category, root_cause
+"""
+
+_ITEM_SELECT = """
+    SELECT item_id, warehouse_id, failure_category, COUNT(*) AS event_count
+    FROM STOCKOUT_EVENTS
+    {where}
+    GROUP BY item_id, warehouse_id, failure_category
+"""
+
+# What reads aggregate while the rollups are behind: the rollup columns, straight from the events
+DAILY_FROM_EVENTS = f"({_DAILY_SELECT.format(where='')})"
+ITEM_FROM_EVENTS = f"({_ITEM_SELECT.format(where='')})"
+
+# Events analyzed after the watermark
+_CHANGED = """
+    SELECT DISTINCT {key} FROM STOCKOUT_EVENTS
+    WHERE analyzed_at > :since AND analyzed_at <= :until
+"""
+
+_INCREMENTAL = (
+    f"DELETE FROM {DAILY_ROLLUP} WHERE stockout_date IN ({_CHANGED.format(key='stockout_date')})",
+    f"""
+    INSERT INTO {DAILY_ROLLUP}
+        (stockout_date, failure_category, root_cause, event_count, confidence_sum, confidence_count, refreshed_at)
+    SELECT *, CURRENT_TIMESTAMP() FROM ({_DAILY_SELECT.format(
+        where=f"WHERE stockout_date IN ({_CHANGED.format(key='stockout_date')})"
+    )})
+    """,
+    f"DELETE FROM {ITEM_ROLLUP} WHERE item_id IN ({_CHANGED.format(key='item_id')})",
+    f"""
+    INSERT INTO {ITEM_ROLLUP} (item_id, warehouse_id, failure_category, event_count, refreshed_at)
+    SELECT *, CURRENT_TIMESTAMP() FROM ({_ITEM_SELECT.format(
+        where=f"WHERE item_id IN ({_CHANGED.format(key='item_id')})"
+    )})
+    """,
+)
+
+_REBUILD = (
+    f"DELETE FROM {DAILY_ROLLUP}",
+    f"""
+    INSERT INTO {DAILY_ROLLUP}
+        (stockout_date, failure_category, root_cause, event_count, confidence_sum, confidence_count, refreshed_at)
+    SELECT *, CURRENT_TIMESTAMP() FROM ({_DAILY_SELECT.format(where='')})
+    """,
+    f"DELETE FROM {ITEM_ROLLUP}",
+    f"""
+    INSERT INTO {ITEM_ROLLUP} (item_id, warehouse_id, failure_category, event_count, refreshed_at)
+    SELECT *, CURRENT_TIMESTAMP() FROM ({_ITEM_SELECT.format(where='')})
+    """,
+)
+
+# Renamed whenever the rollup columns change, so existing rollups are rebuilt once
+_ROLLUP_NAME = "stockout_rollups_v2"
+
+# Keeps this process's threads from queueing on the database lock with a connection each
+_refresh_lock = threading.Lock()
+_tables_ready = False
+# STOCKOUT_EVENTS version the rollups were last seen to match, so reads skip the check
+_current_version: Optional[str] = None
+
+
+def _watermark(db: Session) -> Optional[Tuple[Any, Optional[int], Optional[str]]]:
+    """(analyzed_at, event_count, source_version) of the last refresh, or None before the first"""
+    row = db.execute(
+        text(f"""
+            SELECT analyzed_at, event_count, source_version
+            FROM {WATERMARK_TABLE} WHERE rollup_name = :name
+        """),
+        {"name": _ROLLUP_NAME}
+    ).fetchone()
+    return tuple(row) if row else None
+
+
+def _source_state(db: Session) -> Tuple[Any, int]:
+    row = db.execute(text("SELECT MAX(analyzed_at), COUNT(*) FROM STOCKOUT_EVENTS")).fetchone()
+    return row[0], int(row[1])
+
+
+def _refresh_plan(db: Session) -> Tuple[Dict[str, Any], int, Optional[str]]:
+    """What a refresh would do now ("none", "incremental" or "rebuild"), with the event count and version it targets"""
+    # Version first: a write landing after this read leaves the stored version stale, never ahead
+    invalidate_versions()
+    version = get_table_versions(db).get("STOCKOUT_EVENTS")
+    until, count = _source_state(db)
+    watermark = _watermark(db)
+    since, counted, built_version = watermark if watermark else (None, None, None)
+
+    if watermark is not None and count == counted and until == since and (
+        version is None or version == built_version
+    ):
+        return {"since": since, "until": since, "mode": "none"}, count, version
+
+    mode = "rebuild"
+    if since is not None and until is not None and until > since and counted is not None:
+        analyzed = db.execute(
+            text("SELECT COUNT(*) FROM STOCKOUT_EVENTS WHERE analyzed_at > :since AND analyzed_at <= :until"),
+            {"since": since, "until": until}
+        ).scalar()
+        # Newly analyzed events are either new rows or re-analyzed ones: the count can grow by at most that many
+        if counted <= count <= counted + analyzed:
+            mode = "incremental"
+    return {"since": since, "until": until, "mode": mode}, count, version
+
+
+def _create_tables(db: Session) -> None:
+    for ddl in _DDL:
+        db.execute(text(ddl))
+    # The row every refresh locks; an empty watermark reads as "never built"
+    db.execute(text(f"""
+        MERGE INTO {WATERMARK_TABLE} w
+        USING (SELECT :name AS rollup_name) s
+        ON w.rollup_name = s.rollup_name
+        WHEN NOT MATCHED THEN INSERT (rollup_name) VALUES (s.rollup_name)
+    """), {"name": _ROLLUP_NAME})
+    db.commit()
+
+
+def refresh_rollups(db: Session) -> Dict[str, Any]:
+    """
+    Bring the rollups up to date with STOCKOUT_EVENTS, in one transaction (call
+    from write paths and jobs).
+
+    Workers serialise on the watermark row: the UPDATE that claims it holds its
+    lock until the commit, so a refresh running in another process waits, then
+    plans again against what the first one wrote.
+    """
+    global _tables_ready, _current_version
+    with _refresh_lock:
+        if not _tables_ready:
+            _create_tables(db)
+            _tables_ready = True
+
+        plan, _, version = _refresh_plan(db)
+        if plan["mode"] == "none":
+            db.rollback()
+            _current_version = version
+            return plan
+
+        try:
+            db.execute(
+                text(f"UPDATE {WATERMARK_TABLE} SET refreshed_at = CURRENT_TIMESTAMP() WHERE rollup_name = :name"),
+                {"name": _ROLLUP_NAME}
+            )
+            plan, count, version = _refresh_plan(db)
+            since, until = plan["since"], plan["until"]
+            if plan["mode"] != "none":
+                for statement in (_INCREMENTAL if plan["mode"] == "incremental" else _REBUILD):
+                    db.execute(text(statement), {"since": since, "until": until})
+                db.execute(text(f"""
+                    UPDATE {WATERMARK_TABLE} SET
+                        analyzed_at = :until,
+                        event_count = :event_count,
+                        source_version = :source_version,
+                        refreshed_at = CURRENT_TIMESTAMP()
+                    WHERE rollup_name = :name
+                """), {"name": _ROLLUP_NAME, "until": until, "event_count": count, "source_version": version})
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        _current_version = version
+        return plan
+
+
+def _rollups_current(db: Session, version: Optional[str]) -> bool:
+    try:
+        watermark = _watermark(db)
+    except SQLAlchemyError:
+        # Not built yet
+        db.rollback()
+        return False
+    if watermark is None:
+        return False
+    since, counted, built_version = watermark
+    if version is not None:
+        return built_version == version
+    return (since, counted) == _source_state(db)
+
+
+def rollup_sources(db: Session) -> Tuple[str, str]:
+    """
+    Daily and per-item relations for a dashboard read: the rollup tables when
+    they match STOCKOUT_EVENTS, else equivalent aggregates of the events
+    """
+    global _current_version
+    version = get_table_versions(db).get("STOCKOUT_EVENTS")
+    if version is not None and version == _current_version:
+        return DAILY_ROLLUP, ITEM_ROLLUP
+    if _rollups_current(db, version):
+        _current_version = version
+        return DAILY_ROLLUP, ITEM_ROLLUP
+    return DAILY_FROM_EVENTS, ITEM_FROM_EVENTS
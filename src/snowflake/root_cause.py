@@ -0,0 +1,296 @@
+"""
+Root-cause classification engine.
+
+Derives each stockout's root cause from evidence in the other tables,
+for every event at once:
+
+- SUPPLIER_DELAY: the item's latest purchase order placed on or before the
+  stockout arrived (or is still missing) past its expected date
+- FORECAST_UNDERESTIMATED: actual demand exceeded the forecast over the
+  lead-time window before the stockout
+- STALE_FORECAST: the forecasts covering that window were generated long
+  before the days they forecast
+- THRESHOLD_TOO_LOW: the reorder threshold, above safety stock, does not
+  cover lead-time demand
+- SAFETY_STOCK_INSUFFICIENT: safety stock covers fewer than
+  SAFETY_COVER_DAYS of demand
+
+Each measure is mapped onto a score in [0, 1]; the highest score wins
+(earlier causes first on ties), and an event where no score reaches
+MIN_SCORE is UNKNOWN. The confidence is the winning score weighted by its
+share of all scores, so one clear cause scores high and several competing
+ones score low; for UNKNOWN it is 1 minus the best score.
+
+Window sums come from prefix sums over forecasts sorted by (item, date) and
+order lookups from a binary search over orders sorted by (item, date), so
+the cost is a sort of each table plus O(log n) per event.
+"""
+from typing import Dict, Tuple
+
+import numpy as np
+
+from src.snowflake.columnar import Table, factorize, latest_per_group, sort_order
+
+ROOT_CAUSES = (
+    "SUPPLIER_DELAY",
+    "FORECAST_UNDERESTIMATED",
+    "STALE_FORECAST",
+    "THRESHOLD_TOO_LOW",
+    "SAFETY_STOCK_INSUFFICIENT",
+)
+UNKNOWN = "UNKNOWN"
+
+# Days of demand before the stockout examined on top of the lead time
+WINDOW_PAD_DAYS = 7
+# Lead time assumed for items without a reorder rule
+DEFAULT_LEAD_TIME_DAYS = 7
+# Demand safety stock is expected to cover
+SAFETY_COVER_DAYS = 2.0
+# Best score below which an event is UNKNOWN
+MIN_SCORE = 0.25
+
+# Measure at which each cause's score reaches 1 (scores grow linearly from 0)
+FULL_SCORE = {
+    "SUPPLIER_DELAY": 5.0,              # days late
+    "FORECAST_UNDERESTIMATED": 0.2,     # share of actual demand not forecast
+    "STALE_FORECAST": 14.0,             # days of forecast age beyond a day
+    "THRESHOLD_TOO_LOW": 0.5,           # share of lead-time demand not covered
+    "SAFETY_STOCK_INSUFFICIENT": 0.5,   # share of the safety cover missing
+}
+
+EVIDENCE_COLUMNS = (
+    "supplier_delay_days",
+    "forecast_underestimate",
+    "forecast_age_days",
+    "threshold_shortfall",
+    "safety_shortfall",
+)
+# Rule and demand figures the measures were derived from
+CONTEXT_COLUMNS = (
+    "lead_time_days",
+    "safety_stock",
+    "reorder_threshold",
+    "mean_daily_demand",
+)
+
+
+def _days(values: np.ndarray) -> np.ndarray:
+    """Dates as float day numbers, NaN for NaT"""
+    values = np.asarray(values).astype("datetime64[D]")
+    days = values.astype(np.int64).astype(np.float64)
+    days[np.isnat(values)] = np.nan
+    return days
+
+
+def _item_codes(*tables: Table) -> Tuple[np.ndarray, ...]:
+    """One shared integer code per item id across several tables"""
+    factors = [factorize(table["item_id"] if len(table) else np.empty(0, dtype=object)) for table in tables]
+    union = np.unique(np.concatenate([uniques for uniques, _ in factors]))
+    return tuple(np.searchsorted(union, uniques)[codes].astype(np.int64) for uniques, codes in factors)
+
+
+def _window_sums(
+    keys: np.ndarray,
+    prefix: Dict[str, np.ndarray],
+    item: np.ndarray,
+    start: np.ndarray,
+    end: np.ndarray,
+    first_day: int,
+    span: int
+) -> Dict[str, np.ndarray]:
+    """Sums of each prefix-summed column over days [start, end] of `item`"""
+    # A window starting past the last day clips to `span`, i.e. the next item's first key
+    lo_day = np.clip(start - first_day, 0, span).astype(np.int64)
+    hi_day = np.clip(end - first_day, -1, span - 1).astype(np.int64)
+    lo = np.searchsorted(keys, item * span + lo_day, side="left")
+    hi = np.searchsorted(keys, item * span + hi_day, side="right")
+    hi = np.maximum(hi, lo)
+    return {name: values[hi] - values[lo] for name, values in prefix.items()}
+
+
+def compute_evidence(events: Table, forecasts: Table, orders: Table, rules: Table) -> Dict[str, np.ndarray]:
+    """
+    Evidence measures for every row of `events` (one array per EVIDENCE_COLUMNS
+    and CONTEXT_COLUMNS entry).
+
+    `rules` may hold several rules per item; an event uses the most recently
+    updated rule of its item at its warehouse, or the item's most recently
+    updated rule when its warehouse has none (or `rules` has no warehouse_id).
+    Measures without data are NaN.
+    """
+    n = len(events)
+    if n == 0:
+        return {name: np.empty(0) for name in EVIDENCE_COLUMNS + CONTEXT_COLUMNS}
+
+    ev_item, fc_item, po_item, rule_item = _item_codes(events, forecasts, orders, rules)
+    n_items = int(max(ev_item.max(initial=-1), fc_item.max(initial=-1), po_item.max(initial=-1), rule_item.max(initial=-1))) + 1
+    stockout_day = _days(events["stockout_date"])
+
+    ev_safety, ev_threshold, ev_lead = _event_rules(events, rules, ev_item, rule_item, n_items)
+    ev_lead = np.where(np.isnan(ev_lead), DEFAULT_LEAD_TIME_DAYS, ev_lead)
+
+    # Forecast window [stockout - lead time - pad, stockout]
+    actual_sum = forecast_sum = age_sum = counted = rows = np.zeros(n)
+    if len(forecasts):
+        fc_day = _days(forecasts["forecast_date"])
+        actual = np.asarray(forecasts["actual_demand"], dtype=np.float64)
+        forecast = np.asarray(forecasts["daily_demand"], dtype=np.float64)
+        age = fc_day - _days(forecasts["generated_at"])
+        usable = ~np.isnan(fc_day) & ~np.isnan(actual) & ~np.isnan(forecast)
+        if usable.any():
+            first_day = int(np.nanmin(fc_day[usable]))
+            span = int(np.nanmax(fc_day[usable])) - first_day + 1
+            keys = fc_item[usable] * span + (fc_day[usable].astype(np.int64) - first_day)
+            order = sort_order(keys)
+            age_known = ~np.isnan(age[usable])
+            prefix = {
+                name: np.concatenate([[0.0], np.cumsum(values[order])])
+                for name, values in (
+                    ("rows", np.ones(int(usable.sum()))),
+                    ("actual", actual[usable]),
+                    ("forecast", forecast[usable]),
+                    ("age", np.where(age_known, age[usable], 0.0)),
+                    ("aged", age_known.astype(np.float64)),
+                )
+            }
+            valid = ~np.isnan(stockout_day)
+            day = np.where(valid, stockout_day, 0).astype(np.int64)
+            sums = _window_sums(
+                keys[order], prefix, ev_item, day - ev_lead.astype(np.int64) - WINDOW_PAD_DAYS, day, first_day, span
+            )
+            actual_sum = np.where(valid, sums["actual"], 0.0)
+            forecast_sum = np.where(valid, sums["forecast"], 0.0)
+            age_sum = np.where(valid, sums["age"], 0.0)
+            counted = np.where(valid, sums["aged"], 0.0)
+            rows = np.where(valid, sums["rows"], 0.0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        has_demand = actual_sum > 0
+        # Per forecast row: an extract may repeat a day's forecast per warehouse
+        mean_demand = np.where(has_demand, actual_sum / rows, np.nan)
+        forecast_underestimate = np.where(has_demand, (actual_sum - forecast_sum) / actual_sum, np.nan)
+        forecast_age = np.where(counted > 0, age_sum / counted, np.nan)
+        threshold_shortfall = 1.0 - (ev_threshold - ev_safety) / (mean_demand * ev_lead)
+        safety_shortfall = 1.0 - ev_safety / (mean_demand * SAFETY_COVER_DAYS)
+
+    return {
+        "supplier_delay_days": _supplier_delay(orders, po_item, ev_item, stockout_day),
+        "forecast_underestimate": forecast_underestimate,
+        "forecast_age_days": forecast_age,
+        "threshold_shortfall": threshold_shortfall,
+        "safety_shortfall": safety_shortfall,
+        "lead_time_days": ev_lead,
+        "safety_stock": ev_safety,
+        "reorder_threshold": ev_threshold,
+        "mean_daily_demand": mean_demand,
+    }
+
+
+def _event_rules(
+    events: Table,
+    rules: Table,
+    ev_item: np.ndarray,
+    rule_item: np.ndarray,
+    n_items: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Safety stock, reorder threshold and lead time of each event's rule (NaN without one)"""
+    n = len(ev_item)
+    if not len(rules):
+        return np.full(n, np.nan), np.full(n, np.nan), np.full(n, np.nan)
+    values = [
+        np.asarray(rules[column], dtype=np.float64)
+        for column in ("safety_stock", "reorder_threshold", "lead_time_days")
+    ]
+    updated = np.nan_to_num(_days(rules["last_updated"]), nan=-np.inf)
+
+    # Latest rule per item, looked up by item code
+    latest = latest_per_group(rule_item, updated)
+    by_item = []
+    for column in values:
+        per_item = np.full(n_items, np.nan)
+        per_item[rule_item[latest]] = column[latest]
+        by_item.append(per_item[ev_item])
+    if "warehouse_id" not in rules or "warehouse_id" not in events:
+        return tuple(by_item)
+
+    # Latest rule per (item, warehouse), looked up by a combined code
+    rule_wh = np.asarray(rules["warehouse_id"], dtype=object)
+    ev_wh = np.asarray(events["warehouse_id"], dtype=object)
+    keyed = np.flatnonzero([isinstance(w, str) for w in rule_wh.tolist()])
+    ev_keyed = np.array([isinstance(w, str) for w in ev_wh.tolist()], dtype=bool)
+    if not len(keyed) or not ev_keyed.any():
+        return tuple(by_item)
+    warehouses = np.unique(np.concatenate([rule_wh[keyed], ev_wh[ev_keyed]]).astype(str))
+    rule_pair = rule_item[keyed] * len(warehouses) + np.searchsorted(warehouses, rule_wh[keyed].astype(str))
+    latest = latest_per_group(rule_pair, updated[keyed])
+    order = np.argsort(rule_pair[latest], kind="stable")
+    pairs, latest = rule_pair[latest][order], keyed[latest][order]
+
+    ev_pair = np.full(n, -1, dtype=np.int64)
+    ev_pair[ev_keyed] = ev_item[ev_keyed] * len(warehouses) + np.searchsorted(warehouses, ev_wh[ev_keyed].astype(str))
+    pos = np.minimum(np.searchsorted(pairs, ev_pair), len(pairs) - 1)
+    found = ev_keyed & (pairs[pos] == ev_pair)
+    return tuple(np.where(found, column[latest[pos]], fallback) for column, fallback in zip(values, by_item))
+
+
+def _supplier_delay(orders: Table, po_item: np.ndarray, ev_item: np.ndarray, stockout_day: np.ndarray) -> np.ndarray:
+    """Days late of each item's latest order placed on or before the stockout"""
+    delay = np.full(len(ev_item), np.nan)
+    if not len(orders):
+        return delay
+    order_day = _days(orders["order_date"])
+    expected = _days(orders["expected_arrival_date"])
+    arrived = _days(orders["actual_arrival_date"])
+    usable = ~np.isnan(order_day) & ~np.isnan(expected)
+    if not usable.any():
+        return delay
+
+    first_day = int(np.nanmin(order_day[usable]))
+    span = int(np.nanmax(order_day[usable])) - first_day + 1
+    keys = po_item[usable] * span + (order_day[usable].astype(np.int64) - first_day)
+    order = sort_order(keys)
+    sorted_keys = keys[order]
+
+    valid = ~np.isnan(stockout_day)
+    day = np.clip(np.where(valid, stockout_day, first_day - 1) - first_day, -1, span - 1).astype(np.int64)
+    pos = np.searchsorted(sorted_keys, ev_item * span + day, side="right") - 1
+    found = valid & (day >= 0) & (pos >= 0)
+    found[found] = sorted_keys[pos[found]] // span == ev_item[found]
+
+    rows = np.flatnonzero(usable)[order[pos[found]]]
+    # Not yet arrived: late by however long it was overdue at the stockout
+    arrival = np.where(np.isnan(arrived[rows]), np.maximum(stockout_day[found], expected[rows]), arrived[rows])
+    delay[found] = np.maximum(arrival - expected[rows], 0.0)
+    return delay
+
+
+def score_evidence(evidence: Dict[str, np.ndarray]) -> np.ndarray:
+    """[N, len(ROOT_CAUSES)] scores in [0, 1]; missing evidence scores 0"""
+    measures = {
+        "SUPPLIER_DELAY": evidence["supplier_delay_days"],
+        "FORECAST_UNDERESTIMATED": evidence["forecast_underestimate"],
+        "STALE_FORECAST": evidence["forecast_age_days"] - 1.0,
+        "THRESHOLD_TOO_LOW": evidence["threshold_shortfall"],
+        "SAFETY_STOCK_INSUFFICIENT": evidence["safety_shortfall"],
+    }
+    return np.column_stack([
+        np.clip(np.nan_to_num(measures[cause] / FULL_SCORE[cause], nan=0.0), 0.0, 1.0)
+        for cause in ROOT_CAUSES
+    ])
+
+
+def classify(evidence: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """Root cause and confidence per event"""
+    scores = score_evidence(evidence)
+    if not len(scores):
+        return np.empty(0, dtype=object), np.empty(0)
+
+    best = np.argmax(scores, axis=1)
+    best_score = scores[np.arange(len(scores)), best]
+    total = scores.sum(axis=1)
+    known = best_score >= MIN_SCORE
+
+    causes = np.where(known, np.asarray(ROOT_CAUSES, dtype=object)[best], UNKNOWN)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        confidence = np.where(known, best_score * best_score / total, 1.0 - best_score)
+    return causes, np.round(confidence, 4)
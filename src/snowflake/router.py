@@ -1,75 +1,176 @@
-from fastapi import APIRouter, Depends, HTTPException, Body, Query
-from typing import Optional
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Body, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import Literal, Optional
 from datetime import date
 from src.auth.dependencies import authorize_token
 from src.auth.models import UserInfo
+from src.snowflake.models import AIAnalysisBatchRequest, EventBatchRequest, SimulationRequest
 from src.snowflake.service import (
     save_user_info, 
     update_user_role, 
     get_events, 
     get_event_details, 
+    get_event_details_batch,
     simulate_event,
+    simulate_scenario,
     get_dashboard_summary,
     get_root_cause_distribution,
     get_inventory_timeline,
     get_forecast_accuracy,
+    get_forecast_quality,
+    get_worst_forecast_items,
     get_supplier_performance,
-    analyze_stockout_with_ai,
+    get_latest_stockout,
+    get_stockouts_for_analysis,
+    analysis_results,
+    build_stockout_prompt,
     get_reorder_triggers,
-    get_similar_failures
+    get_similar_failures,
+    get_stockout_trends,
+    get_rule_health,
+    reclassify_stockouts,
+    get_recommendations,
+    compare_configurations,
+    stream_failure_report,
+    get_user_by_email,
+    create_users as create_users_in_db
 )
-from sqlalchemy.orm import Session
-from sqlalchemy import text
-from src.utils.database import get_db
+from src.jobs.service import job_manager, reclassify_root_causes as reclassify_root_causes_job
+from src.utils.cortex import CortexBusy, run_cortex, run_cortex_many
+from src.utils.database import run_db, stream_db
+from src.utils.export import (
+    ARROW_AVAILABLE,
+    ARROW_FORMATS,
+    EXPORT_FORMATS,
+    UnsupportedFormat,
+    negotiate_format,
+    prepend,
+)
+from src.utils.pagination import decode_cursor, encode_cursor
 
 router = APIRouter() 
 
-@router.get("/cortex_test")
-def cortex_test(
-    prompt: str = Query(..., description="User input prompt"),
-    db: Session = Depends(get_db)
-):
-    ctx = db.connection().connection
-    cs = ctx.cursor()
+
+async def _cortex(prompt: str):
+    """Cortex completion with pool saturation and timeouts mapped to HTTP errors"""
     try:
-        cs.execute(
-            """
-            SELECT SNOWFLAKE.CORTEX.COMPLETE(
-                'mistral-large',
-                %s
-            )
-            """,
-            (prompt,)
-        )
+        return await run_cortex(prompt)
+    except CortexBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="SNOWFLAKE.CORTEX.COMPLETE timed out")
 
-        row = cs.fetchone()
-        if not row:
-            raise HTTPException(
-                status_code=500,
-                detail="No response from SNOWFLAKE.CORTEX.COMPLETE"
-            )
 
-        return {
-            "input": prompt,
-            "output": row[0]
-        }
+@router.get("/cortex_test")
+async def cortex_test(
+    prompt: str = Query(..., description="User input prompt")
+):
+    output = await _cortex(prompt)
+    if output is None:
+        raise HTTPException(
+            status_code=500,
+            detail="No response from SNOWFLAKE.CORTEX.COMPLETE"
+        )
 
-    finally:
-        cs.close()
-        ctx.close()
+    return {
+        "input": prompt,
+        "output": output
+    }
 
 @router.get("/all")
-def list_events(_=Depends(authorize_token()),db:Session=Depends(get_db)):
-    return get_events(db)
+async def list_events(
+    response: Response,
+    _=Depends(authorize_token()),
+    limit: int = Query(100, ge=1, le=1000),
+    warehouse_id: Optional[str] = Query(None),
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    failure_category: Optional[str] = Query(None),
+    root_cause: Optional[str] = Query(None),
+    sort: Literal["newest", "oldest"] = Query("newest"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page")
+):
+    """
+    **Stockout events, one page at a time**
+
+    Ordered by (stockout_date, item_id, warehouse_id). When more events match,
+    the response carries an `X-Next-Cursor` header; pass it back as `cursor`
+    with the same filters and sort to get the next page.
+    """
+    try:
+        after = decode_cursor(cursor, sort) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # One extra row tells whether there is a next page
+    events = await run_db(
+        get_events, limit + 1, failure_category, root_cause,
+        warehouse_id, start_date, end_date, sort, after
+    )
+    if len(events) > limit:
+        events = events[:limit]
+        last = events[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(
+            sort, (last["stockout_date"], last["item_id"], last["warehouse_id"])
+        )
+    return events
 
 @router.get("/analysis/{itemId}")
-def reconstruct_event(itemId: str, _=Depends(authorize_token()), db: Session = Depends(get_db)):
-    return get_event_details(db, itemId)
+async def reconstruct_event(itemId: str, _=Depends(authorize_token())):
+    return await run_db(get_event_details, itemId)
+
+
+@router.post("/analysis/batch")
+async def reconstruct_events_batch(
+    request: EventBatchRequest,
+    _=Depends(authorize_token())
+):
+    """
+    **Reconstruct many events in one query**
+
+    Pass `item_ids`, or leave them out and filter by `failure_category` /
+    `root_cause` (no filters = every item). Returns the same fields as
+    `/analysis/{itemId}`, keyed by item_id.
+    """
+    return await run_db(
+        get_event_details_batch,
+        request.item_ids,
+        request.failure_category,
+        request.root_cause
+    )
 
 
 @router.get("/{itemId}/simulate")
-def simulate_item(itemId: str, _=Depends(authorize_token()), db: Session = Depends(get_db)):
-    return simulate_event(db, itemId)
+async def simulate_item(itemId: str, _=Depends(authorize_token())):
+    return await run_db(simulate_event, itemId)
+
+
+@router.post("/simulate/bulk")
+async def simulate_bulk(
+    request: SimulationRequest,
+    _=Depends(authorize_token())
+):
+    """
+    **What-if simulation across the catalog**
+
+    Applies `value * multiplier + delta` to safety_stock, lead_time_days and
+    reorder_threshold for every item (or the `item_ids` / event-filtered
+    subset) and returns per-item outcomes with STILL FAILS /
+    PREVENTS STOCKOUT counts.
+    """
+    return await run_db(
+        simulate_scenario,
+        item_ids=request.item_ids,
+        failure_category=request.failure_category,
+        root_cause=request.root_cause,
+        safety_stock_delta=request.safety_stock_delta,
+        safety_stock_multiplier=request.safety_stock_multiplier,
+        lead_time_delta=request.lead_time_delta,
+        lead_time_multiplier=request.lead_time_multiplier,
+        reorder_threshold_delta=request.reorder_threshold_delta,
+        reorder_threshold_multiplier=request.reorder_threshold_multiplier
+    )
 
 
 
@@ -80,9 +181,8 @@ def simulate_item(itemId: str, _=Depends(authorize_token()), db: Session = Depen
 # ========================================
 
 @router.get("/dashboard/summary")
-def dashboard_summary(
+async def dashboard_summary(
     _=Depends(authorize_token()),
-    db: Session = Depends(get_db),
     days: int = Query(6000, description="Look back period in days")
 ):
     """
@@ -95,13 +195,12 @@ def dashboard_summary(
     - Top 3 root causes
     - Items at risk
     """
-    return get_dashboard_summary(db, days)
+    return await run_db(get_dashboard_summary, days)
 
 
 @router.get("/dashboard/root-causes")
-def root_cause_distribution(
-    _=Depends(authorize_token()),
-    db: Session = Depends(get_db)
+async def root_cause_distribution(
+    _=Depends(authorize_token())
 ):
     """
     **Root cause breakdown for visualization**
@@ -111,33 +210,23 @@ def root_cause_distribution(
     - FORECAST_UNDERESTIMATED: 20%
     - etc.
     """
-    return get_root_cause_distribution(db)
+    return await run_db(get_root_cause_distribution)
 
 
 @router.get("/dashboard/trends")
-def stockout_trends(
+async def stockout_trends(
     _=Depends(authorize_token()),
-    db: Session = Depends(get_db),
-    days: int = Query(6000, description="Trend period in days")
+    days: int = Query(6000, description="Trend period in days"),
+    granularity: Optional[Literal["day", "week", "month"]] = Query(
+        None, description="Bucket size; by default the finest that keeps the series within 120 points"
+    )
 ):
     """
     **Time-series data for trend charts**
     
-    Returns daily/weekly stockout counts over time
-    """
-    query = text(f"""
-        SELECT 
-            DATE_TRUNC('week', stockout_date) AS week,
-            COUNT(*) AS stockout_count,
-            SUM(CASE WHEN failure_category = 'EXECUTION_FAILURE' THEN 1 ELSE 0 END) AS execution_failures,
-            SUM(CASE WHEN failure_category = 'DECISION_FAILURE' THEN 1 ELSE 0 END) AS decision_failures
-        FROM STOCKOUT_EVENTS
-        WHERE stockout_date >= DATEADD(day, -{days}, CURRENT_DATE())
-        GROUP BY week
-        ORDER BY week;
-    """)
-    result = db.execute(query)
-    return [dict(row._mapping) for row in result.fetchall()]
+    Returns daily/weekly/monthly stockout counts over time
+    """
+    return await run_db(get_stockout_trends, days, granularity)
 
 
 # ========================================
@@ -145,54 +234,93 @@ def stockout_trends(
 # ========================================
 
 @router.get("/items/{itemId}/timeline")
-def inventory_timeline(
+async def inventory_timeline(
     itemId: str,
     _=Depends(authorize_token()),
-    db: Session = Depends(get_db),
-    days: int = Query(6000, description="Days to show")
+    days: int = Query(6000, description="Days to show"),
+    max_points: int = Query(500, ge=0, description="Points kept per series (LTTB downsampling); 0 returns every point"),
+    warehouse_id: Optional[str] = Query(None, description="Only this warehouse's series")
 ):
     """
     **Full inventory history for an item**
     
-    Shows:
+    One series per warehouse:
     - Daily stock levels
-    - Reorder threshold line
+    - Reorder threshold line of that warehouse's rule
     - When reorders were triggered
     - When stockout occurred
     """
-    return get_inventory_timeline(db, itemId, days)
+    return await run_db(get_inventory_timeline, itemId, days, max_points, warehouse_id)
 
 
 @router.get("/items/{itemId}/forecast-accuracy")
-def forecast_accuracy(
+async def forecast_accuracy(
     itemId: str,
-    _=Depends(authorize_token()),
-    db: Session = Depends(get_db)
+    _=Depends(authorize_token())
 ):
     """
     **Compare forecasted vs actual demand**
     
     Helps identify if forecast was the root cause
     """
-    return get_forecast_accuracy(db, itemId)
+    return await run_db(get_forecast_accuracy, itemId)
+
+
+@router.get("/items/{itemId}/forecast-quality")
+async def forecast_quality(
+    itemId: str,
+    _=Depends(authorize_token()),
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    window: int = Query(7, ge=1, le=365, description="Days in the rolling error window")
+):
+    """
+    **Forecast error of one item against actual demand**
+
+    MAPE, bias, tracking signal and the day-by-day series with rolling MAPE
+    """
+    return await run_db(get_forecast_quality, itemId, start_date, end_date, window)
+
+
+@router.get("/forecast/worst-items")
+async def worst_forecast_items(
+    _=Depends(authorize_token()),
+    metric: Literal["mape", "recent_mape", "bias_pct", "tracking_signal"] = Query("mape"),
+    limit: int = Query(20, ge=1, le=1000),
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    window: int = Query(7, ge=1, le=365, description="Days in the rolling error window")
+):
+    """
+    **Items whose forecasts miss actual demand the most**
+
+    Ranks the whole catalog in one pass; bias and tracking signal rank by
+    magnitude. `biased` marks a tracking signal beyond +/-4.
+    """
+    return await run_db(get_worst_forecast_items, metric, limit, start_date, end_date, window)
 
 
 @router.get("/items/{itemId}/similar-failures")
-def similar_failures(
+async def similar_failures(
     itemId: str,
     _=Depends(authorize_token()),
-    db: Session = Depends(get_db),
-    limit: int = Query(5, description="Number of similar cases")
+    limit: int = Query(5, ge=1, le=100, description="Number of similar cases"),
+    warehouse_id: Optional[str] = Query(None, description="Compare the item's latest stockout at this warehouse")
 ):
     """
     **Find other items with similar failure patterns**
     
-    Uses:
-    - Same root cause
-    - Similar failure category
-    - Same warehouse
+    Compares the item's latest stockout with every other stockout on:
+    - Lead time and safety stock ratio
+    - Supplier delay days
+    - Forecast error
+    - Days of cover
+    - Warehouse
+
+    Returns the closest stockout of each of up to `limit` other items with its
+    `distance` (0 is identical) and fingerprint.
     """
-    return get_similar_failures(db, itemId, limit)
+    return await run_db(get_similar_failures, itemId, limit, warehouse_id)
 
 
 # ========================================
@@ -200,9 +328,8 @@ def similar_failures(
 # ========================================
 
 @router.get("/suppliers/performance")
-def supplier_performance(
-    _=Depends(authorize_token()),
-    db: Session = Depends(get_db)
+async def supplier_performance(
+    _=Depends(authorize_token())
 ):
     """
     **Supplier reliability metrics**
@@ -212,13 +339,12 @@ def supplier_performance(
     - Average delay days
     - Number of delayed orders
     """
-    return get_supplier_performance(db)
+    return await run_db(get_supplier_performance)
 
 
 @router.get("/reorder-triggers/history")
-def reorder_trigger_history(
+async def reorder_trigger_history(
     _=Depends(authorize_token()),
-    db: Session = Depends(get_db),
     item_id: Optional[str] = Query(None),
     days: int = Query(6000)
 ):
@@ -230,13 +356,12 @@ def reorder_trigger_history(
     - Were ignored
     - Failed to trigger
     """
-    return get_reorder_triggers(db, item_id, days)
+    return await run_db(get_reorder_triggers, item_id, days)
 
 
 @router.get("/rules/health-check")
-def rule_health_check(
-    _=Depends(authorize_token()),
-    db: Session = Depends(get_db)
+async def rule_health_check(
+    _=Depends(authorize_token())
 ):
     """
     **Identify misconfigured reorder rules**
@@ -246,39 +371,35 @@ def rule_health_check(
     - Have caused stockouts
     - Have safety stock < demand variability
     """
-    query = text("""
-        WITH rule_failures AS (
-            SELECT 
-                r.item_id,
-                r.safety_stock,
-                r.reorder_threshold,
-                r.last_updated,
-                DATEDIFF(day, r.last_updated, CURRENT_DATE()) AS days_since_update,
-                COUNT(s.item_id) AS stockout_count
-            FROM REORDER_RULES r
-            LEFT JOIN STOCKOUT_EVENTS s 
-                ON r.item_id = s.item_id 
-                AND s.failure_category = 'DECISION_FAILURE'
-            GROUP BY r.item_id, r.safety_stock, r.reorder_threshold, r.last_updated
-        )
-        SELECT 
-            item_id,
-            safety_stock,
-            reorder_threshold,
-            days_since_update,
-            stockout_count,
-            CASE 
-                WHEN days_since_update > 180 THEN 'STALE_RULE'
-                WHEN stockout_count > 2 THEN 'INEFFECTIVE_RULE'
-                WHEN safety_stock < 20 THEN 'SAFETY_STOCK_TOO_LOW'
-                ELSE 'HEALTHY'
-            END AS health_status
-        FROM rule_failures
-        WHERE health_status != 'HEALTHY'
-        ORDER BY stockout_count DESC, days_since_update DESC;
-    """)
-    result = db.execute(query)
-    return [dict(row._mapping) for row in result.fetchall()]
+    return await run_db(get_rule_health)
+
+
+@router.post("/root-cause/reclassify")
+async def reclassify_root_causes(
+    response: Response,
+    apply: bool = Query(False, description="Queue a job that writes the new root causes back (ADMIN only); false previews them"),
+    unanalyzed_only: bool = Query(False, description="Only events without an analysis confidence yet"),
+    limit: int = Query(100, ge=0, le=10000, description="Changed events returned in the preview or job result"),
+    user: UserInfo = Depends(authorize_token())
+):
+    """
+    **Re-derive root causes from evidence**
+
+    Classifies every stockout at once from supplier delays, forecast error,
+    forecast age and reorder rule shortfalls. By default only previews the
+    changes; with `apply=true` (ADMIN) a background job replaces the stored
+    root cause and analysis confidence, and this returns the job to poll at
+    `/jobs/{job_id}`.
+    """
+    if not apply:
+        return await run_db(reclassify_stockouts, False, unanalyzed_only, limit)
+    if user.roles != "ADMIN":
+        raise HTTPException(status_code=403, detail="Access denied: insufficient role")
+    job = job_manager.submit(
+        "root-cause-reclassify", user.email, reclassify_root_causes_job, unanalyzed_only, limit
+    )
+    response.status_code = 202
+    return job.info()
 
 
 # ========================================
@@ -286,10 +407,9 @@ def rule_health_check(
 # ========================================
 
 @router.post("/{itemId}/ai-analysis")
-def ai_powered_analysis(
+async def ai_powered_analysis(
     itemId: str,
-    _=Depends(authorize_token()),
-    db: Session = Depends(get_db)
+    _=Depends(authorize_token())
 ):
     """
     **Use Snowflake Cortex to generate natural language explanation**
@@ -300,13 +420,54 @@ def ai_powered_analysis(
     run out before delivery. Recommendation: Switch to backup supplier or 
     increase safety stock by 30 units."
     """
-    return analyze_stockout_with_ai(db, itemId)
+    # The event read releases its analytics connection before the LLM call starts
+    event = await run_db(get_latest_stockout, itemId)
+    if not event:
+        return {"error": "No stockout found for this item"}
+
+    explanation = await _cortex(build_stockout_prompt(event))
+    return {
+        "item_id": itemId.upper(),
+        "ai_explanation": explanation or "Analysis unavailable"
+    }
+
+
+@router.post("/ai-analysis/batch")
+async def ai_powered_analysis_batch(
+    request: AIAnalysisBatchRequest,
+    _=Depends(authorize_token())
+):
+    """
+    **Explain many stockouts with one set-based Cortex statement**
+
+    Select events by `item_ids` and/or `failure_category` / `root_cause`;
+    `latest_only` keeps one event per item, the one `/{itemId}/ai-analysis`
+    explains. Explanations already cached are reused, the rest are generated
+    in a single COMPLETE over the prompt set and cached, so this also
+    pre-warms the per-item endpoint. For large selections, `POST /jobs/ai-analysis`
+    runs the same work in the background.
+    """
+    events = await run_db(
+        get_stockouts_for_analysis,
+        request.item_ids,
+        request.failure_category,
+        request.root_cause,
+        request.latest_only,
+        request.limit
+    )
+    try:
+        completions = await run_cortex_many([build_stockout_prompt(event) for event in events])
+    except CortexBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="SNOWFLAKE.CORTEX.COMPLETE timed out")
+
+    return analysis_results(events, completions)
 
 
 @router.post("/recommendations/generate")
-def generate_recommendations(
+async def generate_recommendations(
     _=Depends(authorize_token()),
-    db: Session = Depends(get_db),
     item_id: Optional[str] = Body(None),
     root_cause: Optional[str] = Body(None)
 ):
@@ -318,38 +479,7 @@ def generate_recommendations(
     2. Update lead time for supplier SUP_003 from 7 to 10 days
     3. Retrain forecast model (accuracy dropped to 65%)
     """
-    query = text("""
-        WITH failure_patterns AS (
-            SELECT 
-                item_id,
-                root_cause,
-                COUNT(*) AS failure_count
-            FROM STOCKOUT_EVENTS
-            WHERE (:item_id IS NULL OR item_id = :item_id)
-              AND (:root_cause IS NULL OR root_cause = :root_cause)
-            GROUP BY item_id, root_cause
-            ORDER BY failure_count DESC
-            LIMIT 10
-        )
-        SELECT 
-            fp.item_id,
-            fp.root_cause,
-            fp.failure_count,
-            r.safety_stock AS current_safety_stock,
-            r.reorder_threshold AS current_threshold,
-            CASE fp.root_cause
-                WHEN 'SAFETY_STOCK_INSUFFICIENT' THEN 'Increase safety_stock by 50%'
-                WHEN 'THRESHOLD_TOO_LOW' THEN 'Raise reorder_threshold by 30%'
-                WHEN 'SUPPLIER_DELAY' THEN 'Switch supplier or increase lead_time'
-                WHEN 'FORECAST_UNDERESTIMATED' THEN 'Retrain forecast model'
-                WHEN 'STALE_FORECAST' THEN 'Reduce forecast refresh interval to 7 days'
-                ELSE 'Review rule configuration'
-            END AS recommendation
-        FROM failure_patterns fp
-        LEFT JOIN REORDER_RULES r ON fp.item_id = r.item_id;
-    """)
-    result = db.execute(query, {'item_id': item_id, 'root_cause': root_cause})
-    return [dict(row._mapping) for row in result.fetchall()]
+    return await run_db(get_recommendations, item_id, root_cause)
 
 
 # ========================================
@@ -357,49 +487,23 @@ def generate_recommendations(
 # ========================================
 
 @router.get("/compare/before-after")
-def compare_scenarios(
+async def compare_scenarios(
     _=Depends(authorize_token()),
-    db: Session = Depends(get_db),
     item_id: str = Query(...),
     new_safety_stock: int = Query(...),
-    new_threshold: int = Query(...)
+    new_threshold: int = Query(...),
+    days: int = Query(365, ge=1, le=3650, description="Days of demand to replay")
 ):
     """
     **Compare current vs proposed configuration**
     
-    Shows side-by-side:
+    Replays recorded demand day by day from the first inventory snapshot,
+    per warehouse, under each warehouse's current rule and under the proposed
+    one. Shows side-by-side:
     - Current: 50 safety stock → 3 stockouts
     - Proposed: 80 safety stock → 0 stockouts (simulated)
     """
-    query = text("""
-        WITH current_config AS (
-            SELECT 
-                item_id,
-                safety_stock AS current_safety_stock,
-                reorder_threshold AS current_threshold,
-                (SELECT COUNT(*) FROM STOCKOUT_EVENTS WHERE item_id = :item_id) AS current_stockouts
-            FROM REORDER_RULES
-            WHERE item_id = :item_id
-        ),
-        proposed_config AS (
-            SELECT 
-                :new_safety_stock AS proposed_safety_stock,
-                :new_threshold AS proposed_threshold,
-                CASE 
-                    WHEN :new_safety_stock > (SELECT AVG(daily_demand) * 2 FROM DEMAND_FORECAST WHERE item_id = :item_id)
-                    THEN 0
-                    ELSE 1
-                END AS estimated_stockouts
-        )
-        SELECT * FROM current_config, proposed_config;
-    """)
-    result = db.execute(query, {
-        'item_id': item_id,
-        'new_safety_stock': new_safety_stock,
-        'new_threshold': new_threshold
-    })
-    row = result.fetchone()
-    return dict(row._mapping) if row else {}
+    return await run_db(compare_configurations, item_id, new_safety_stock, new_threshold, days)
 
 
 # ========================================
@@ -407,11 +511,12 @@ def compare_scenarios(
 # ========================================
 
 @router.get("/export/failure-report")
-def export_failure_report(
+async def export_failure_report(
+    request: Request,
     _=Depends(authorize_token()),
-    db: Session = Depends(get_db),
     start_date: Optional[date] = Query(None),
-    end_date: Optional[date] = Query(None)
+    end_date: Optional[date] = Query(None),
+    format: Optional[str] = Query(None, description="json, ndjson, csv, arrow or parquet; overrides Accept")
 ):
     """
     **Generate comprehensive failure report (CSV-ready)**
@@ -421,29 +526,25 @@ def export_failure_report(
     - Root causes
     - Recommendations
     - Responsible parties
+
+    Streamed in batches from the cursor as JSON (default), NDJSON, CSV, Arrow IPC
+    or Parquet, picked by `format` or the Accept header.
     """
-    query = text("""
-        SELECT 
-            s.item_id,
-            s.warehouse_id,
-            s.stockout_date,
-            s.failure_category,
-            s.root_cause,
-            r.rule_owner AS responsible_person,
-            CASE s.root_cause
-                WHEN 'SUPPLIER_DELAY' THEN 'Operations Team'
-                WHEN 'FORECAST_UNDERESTIMATED' THEN 'Planning Team'
-                WHEN 'THRESHOLD_TOO_LOW' THEN r.rule_owner
-                ELSE 'System Admin'
-            END AS assigned_to
-        FROM STOCKOUT_EVENTS s
-        LEFT JOIN REORDER_RULES r ON s.item_id = r.item_id
-        WHERE (:start_date IS NULL OR s.stockout_date >= :start_date)
-          AND (:end_date IS NULL OR s.stockout_date <= :end_date)
-        ORDER BY s.stockout_date DESC;
-    """)
-    result = db.execute(query, {'start_date': start_date, 'end_date': end_date})
-    return [dict(row._mapping) for row in result.fetchall()]
+    try:
+        fmt = negotiate_format(format, request.headers.get("accept"))
+        if fmt in ARROW_FORMATS and not ARROW_AVAILABLE:
+            raise UnsupportedFormat(f"{fmt} export needs pyarrow, which is not installed")
+    except UnsupportedFormat as e:
+        raise HTTPException(status_code=406, detail=str(e))
+
+    chunks = stream_db(stream_failure_report, fmt, start_date, end_date)
+    # Runs the query before the status line goes out, so DB errors still become a 500
+    first = await chunks.__anext__()
+
+    headers = {}
+    if fmt != "json":
+        headers["Content-Disposition"] = f'attachment; filename="failure-report.{fmt}"'
+    return StreamingResponse(prepend(first, chunks), media_type=EXPORT_FORMATS[fmt], headers=headers)
 
 
 
@@ -454,17 +555,12 @@ def export_failure_report(
 
 
 @router.post("/userinfo")
-def store_user_info(
-    user: UserInfo = Depends(authorize_token()), 
-    db: Session = Depends(get_db)
+async def store_user_info(
+    user: UserInfo = Depends(authorize_token())
 ):
     """Store user info in DB only if user is new"""
     try:
-        result = db.execute(
-            text("SELECT EMAIL, ROLES FROM RETRACE_USER WHERE EMAIL = :email"),
-            {"email": user.email}
-        )
-        existing_user = result.fetchone()
+        existing_user = await run_db(get_user_by_email, user.email)
         print("existing_user", existing_user)
         if existing_user:
             return {
@@ -476,7 +572,7 @@ def store_user_info(
                 }
             }
 
-        save_user_info(db, user)
+        await run_db(save_user_info, user)
 
         return {
             "status": "success",
@@ -492,23 +588,21 @@ def store_user_info(
 
 
 @router.put("/userinfo")
-def edit_user_role(
+async def edit_user_role(
     email: str = Body(...),
     role: str = Body(...),
-    _: UserInfo = Depends(authorize_token()),  # No ADMIN role required
-    db: Session = Depends(get_db)
+    _: UserInfo = Depends(authorize_token())  # No ADMIN role required
 ):
     """Edit user role (Temporarily open to any authenticated user)"""
     try:
-        update_user_role(db, email, role)
+        await run_db(update_user_role, email, role)
         return {"status": "success", "message": f"Role updated for {email} {role}"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/userinfo/create")
-def create_users(
-    payload: dict,
-    db: Session = Depends(get_db)
+async def create_users(
+    payload: dict
 ):
     """
     Creates one or multiple users.
@@ -551,39 +645,8 @@ def create_users(
     else:
         raise HTTPException(status_code=400, detail="Provide 'email' or 'users'.")
 
-    created = []
-    skipped = []
-
     try:
-        for user in users:
-
-            email = user.get("email")
-            name = user.get("name", None)
-
-            if not email:
-                raise HTTPException(status_code=400, detail="Email is required for each user.")
-
-            # Check if exists
-            result = db.execute(
-                text("SELECT EMAIL FROM RETRACE_USER WHERE EMAIL = :email"),
-                {"email": email}
-            )
-            if result.fetchone():
-                skipped.append(email)
-                continue
-
-            # Insert with NAME + EMAIL + ROLE + UUID
-            db.execute(
-                text("""
-                    INSERT INTO RETRACE_USER (ID, NAME, EMAIL, ROLES)
-                    SELECT UUID_STRING(), :name, :email, :role
-                """),
-                {"name": name, "email": email, "role": role}
-            )
-
-            created.append(email)
-
-        db.commit()
+        created, skipped = await run_db(create_users_in_db, users, role)
 
         return {
             "status": "success",
@@ -593,5 +656,4 @@ def create_users(
         }
 
     except Exception as e:
-        db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
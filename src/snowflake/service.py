@@ -1,12 +1,43 @@
 import snowflake.connector
 from src.utils.config import SF_USER, SF_PASSWORD, SF_ACCOUNT, SF_WAREHOUSE, SF_DATABASE, SF_SCHEMA
 from typing import Union
+from datetime import date, datetime
 import os
 import math
-from typing import List, Dict, Any, Optional
+import numpy as np
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import text
-
+from sqlalchemy import bindparam, text
+
+from src.snowflake.local_backend import pluggable
+from src.snowflake.columnar import Table, to_array
+from src.snowflake.forecast_quality import (
+    DEFAULT_WINDOW_DAYS,
+    daily_pairs,
+    error_series,
+    quality_by_item,
+    rank_items,
+)
+from src.snowflake.read_cache import cached, get_table_versions, invalidate_versions
+from src.snowflake.rollups import refresh_rollups, rollup_sources
+from src.snowflake.root_cause import (
+    DEFAULT_LEAD_TIME_DAYS,
+    EVIDENCE_COLUMNS,
+    WINDOW_PAD_DAYS,
+    classify,
+    compute_evidence,
+)
+from src.snowflake.similarity import FailureIndex
+from src.snowflake.replay import (
+    DEFAULT_ORDER_QTY,
+    ReplayInputs,
+    compare_replay,
+    daily_demand,
+    warehouse_rules,
+)
+from src.utils.downsample import downsample_records
+from src.utils.export import encode_batches, make_encoder
+from src.utils.results import first_row, iter_dict_batches, rows_to_dicts
 
 
 import requests
@@ -23,12 +54,27 @@ from fastapi import APIRouter, Depends, HTTPException
 #     return [dict(row._mapping) for row in rows]
 
 
+# Sort options of the event listing; each orders by (stockout_date, item_id, warehouse_id)
+EVENT_SORTS = {"newest": "DESC", "oldest": "ASC"}
+
+
+@cached("STOCKOUT_EVENTS")
+@pluggable
 def get_events(
     db: Session,
     limit: int = 100,
     failure_category: Optional[str] = None,
-    root_cause: Optional[str] = None
+    root_cause: Optional[str] = None,
+    warehouse_id: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    sort: str = "newest",
+    after: Optional[Tuple[Any, str, str]] = None
 ):
+    """
+    One page of stockout events. `after` is the (stockout_date, item_id,
+    warehouse_id) of the previous page's last row; the page starts right after it.
+    """
     params: Dict[str, Any] = {"limit": limit}
     filters = []
 
@@ -40,19 +86,45 @@ def get_events(
         filters.append("root_cause = :root_cause")
         params["root_cause"] = root_cause
 
+    if warehouse_id:
+        filters.append("warehouse_id = :warehouse_id")
+        params["warehouse_id"] = warehouse_id.upper()
+
+    if start_date:
+        filters.append("stockout_date >= :start_date")
+        params["start_date"] = start_date
+
+    if end_date:
+        filters.append("stockout_date <= :end_date")
+        params["end_date"] = end_date
+
+    direction = EVENT_SORTS[sort]
+    if after:
+        op = "<" if direction == "DESC" else ">"
+        filters.append(f"""(
+            stockout_date {op} :after_date
+            OR (stockout_date = :after_date AND (
+                item_id {op} :after_item
+                OR (item_id = :after_item AND warehouse_id {op} :after_warehouse)
+            ))
+        )""")
+        params["after_date"], params["after_item"], params["after_warehouse"] = after
+
     where_clause = f"WHERE {' AND '.join(filters)}" if filters else ""
 
     query = text(f"""
         SELECT *
         FROM STOCKOUT_EVENTS
         {where_clause}
-        ORDER BY stockout_date DESC
+        ORDER BY stockout_date {direction}, item_id {direction}, warehouse_id {direction}
         LIMIT :limit
     """)
 
     result = db.execute(query, params)
-    return [dict(row._mapping) for row in result.fetchall()]
+    return rows_to_dicts(result)
     
+@cached("STOCKOUT_EVENTS", "INVENTORY_SNAPSHOT", "DEMAND_FORECAST", "REORDER_RULES", "PURCHASE_ORDERS")
+@pluggable
 def get_event_details(db: Session, item_id: str):
     item_id = item_id.upper()
 
@@ -61,7 +133,7 @@ def get_event_details(db: Session, item_id: str):
             SELECT *
             FROM STOCKOUT_EVENTS
             WHERE item_id = :item_id
-            ORDER BY stockout_date DESC
+            ORDER BY stockout_date DESC, warehouse_id
             LIMIT 1
         ),
         inv AS (
@@ -85,6 +157,9 @@ def get_event_details(db: Session, item_id: str):
             SELECT *
             FROM REORDER_RULES
             WHERE item_id = :item_id
+              AND warehouse_id = (SELECT warehouse_id FROM ev)
+            ORDER BY last_updated DESC
+            LIMIT 1
         ),
         incoming AS (
             SELECT COALESCE(SUM(quantity), 0) AS incoming_qty
@@ -110,17 +185,127 @@ def get_event_details(db: Session, item_id: str):
     """)
 
     result = db.execute(query, {"item_id": item_id})
-    row = result.fetchone()
-    return dict(row._mapping) if row else {}
+    return first_row(result) or {}
+
+@cached("STOCKOUT_EVENTS", "INVENTORY_SNAPSHOT", "DEMAND_FORECAST", "REORDER_RULES", "PURCHASE_ORDERS")
+@pluggable
+def get_event_details_batch(
+    db: Session,
+    item_ids: Optional[List[str]] = None,
+    failure_category: Optional[str] = None,
+    root_cause: Optional[str] = None
+) -> Dict[str, Dict[str, Any]]:
+    """Reconstruct the latest event of many items in one set-based statement"""
+    params: Dict[str, Any] = {}
+    filters = []
+
+    if item_ids is not None:
+        item_ids = [i.upper() for i in item_ids]
+        if not item_ids:
+            return {}
+        filters.append("item_id IN :item_ids")
+        params["item_ids"] = item_ids
+
+    if failure_category:
+        filters.append("failure_category = :failure_category")
+        params["failure_category"] = failure_category
+
+    if root_cause:
+        filters.append("root_cause = :root_cause")
+        params["root_cause"] = root_cause
+
+    where_clause = f"WHERE {' AND '.join(filters)}" if filters else ""
+
+    query = text(f"""
+        WITH ev AS (
+            SELECT item_id, warehouse_id, stockout_date
+            FROM STOCKOUT_EVENTS
+            {where_clause}
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY item_id ORDER BY stockout_date DESC, warehouse_id) = 1
+        ),
+        inv AS (
+            SELECT ev.item_id, i.stock_on_hand
+            FROM ev
+            JOIN INVENTORY_SNAPSHOT i
+              ON i.item_id = ev.item_id
+             AND i.warehouse_id = ev.warehouse_id
+             AND i.snapshot_time <= ev.stockout_date
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY ev.item_id ORDER BY i.snapshot_time DESC) = 1
+        ),
+        fc AS (
+            SELECT ev.item_id, f.daily_demand
+            FROM ev
+            JOIN DEMAND_FORECAST f
+              ON f.item_id = ev.item_id
+             AND f.forecast_created_date <= ev.stockout_date
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY ev.item_id ORDER BY f.forecast_created_date DESC) = 1
+        ),
+        rules AS (
+            SELECT r.item_id, r.safety_stock, r.lead_time_days
+            FROM REORDER_RULES r
+            JOIN ev ON r.item_id = ev.item_id AND r.warehouse_id = ev.warehouse_id
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY r.item_id ORDER BY r.last_updated DESC) = 1
+        ),
+        incoming AS (
+            SELECT ev.item_id, COALESCE(SUM(p.quantity), 0) AS incoming_qty
+            FROM ev
+            LEFT JOIN PURCHASE_ORDERS p
+              ON p.item_id = ev.item_id
+             AND p.expected_arrival_date > ev.stockout_date
+            GROUP BY ev.item_id
+        )
+        SELECT
+            ev.item_id,
+            inv.stock_on_hand,
+            incoming.incoming_qty,
+            fc.daily_demand,
+            rules.safety_stock,
+            rules.lead_time_days,
+            (fc.daily_demand * rules.lead_time_days + rules.safety_stock) AS reorder_need_threshold,
+            (inv.stock_on_hand + incoming.incoming_qty) AS projected_stock,
+            CASE
+              WHEN (inv.stock_on_hand + incoming.incoming_qty)
+                   <= (fc.daily_demand * rules.lead_time_days + rules.safety_stock)
+              THEN 'REORDER SHOULD HAVE TRIGGERED'
+              ELSE 'NO REORDER EXPECTED'
+            END AS explanation
+        FROM ev
+        JOIN inv ON inv.item_id = ev.item_id
+        JOIN fc ON fc.item_id = ev.item_id
+        JOIN rules ON rules.item_id = ev.item_id
+        JOIN incoming ON incoming.item_id = ev.item_id;
+    """)
+    if "item_ids" in params:
+        query = query.bindparams(bindparam("item_ids", expanding=True))
 
+    result = db.execute(query, params)
+    results: Dict[str, Dict[str, Any]] = {item: {} for item in (item_ids or [])}
+    for details in rows_to_dicts(result):
+        results[details.pop("item_id")] = details
+    return results
+
+
+@cached("INVENTORY_SNAPSHOT", "DEMAND_FORECAST", "REORDER_RULES", "PURCHASE_ORDERS")
+@pluggable
 def simulate_event(db: Session, item_id: str):
     item_id = item_id.upper()
 
+    # The rule of the warehouse with the latest snapshot
     query = text("""
-        WITH rules AS (
+        WITH inv AS (
+            SELECT warehouse_id, stock_on_hand
+            FROM INVENTORY_SNAPSHOT
+            WHERE item_id = :item_id
+            ORDER BY snapshot_time DESC, warehouse_id
+            LIMIT 1
+        ),
+        rules AS (
             SELECT *
             FROM REORDER_RULES
             WHERE item_id = :item_id
+              AND warehouse_id = (SELECT warehouse_id FROM inv)
+            ORDER BY last_updated DESC
+            LIMIT 1
         ),
         fc AS (
             SELECT daily_demand
@@ -129,13 +314,6 @@ def simulate_event(db: Session, item_id: str):
             ORDER BY forecast_created_date DESC
             LIMIT 1
         ),
-        inv AS (
-            SELECT stock_on_hand
-            FROM INVENTORY_SNAPSHOT
-            WHERE item_id = :item_id
-            ORDER BY snapshot_time DESC
-            LIMIT 1
-        ),
         incoming AS (
             SELECT COALESCE(SUM(quantity), 0) AS incoming_qty
             FROM PURCHASE_ORDERS
@@ -155,8 +333,158 @@ def simulate_event(db: Session, item_id: str):
     """)
 
     result = db.execute(query, {"item_id": item_id})
-    row = result.fetchone()
-    return dict(row._mapping) if row else {}
+    return first_row(result) or {}
+
+
+def _item_filters(
+    item_ids: Optional[List[str]],
+    failure_category: Optional[str],
+    root_cause: Optional[str],
+    params: Dict[str, Any]
+) -> List[str]:
+    """WHERE conditions selecting items by id or by the events recorded for them"""
+    filters = []
+
+    if item_ids is not None:
+        filters.append("item_id IN :item_ids")
+        params["item_ids"] = [i.upper() for i in item_ids]
+
+    event_filters = []
+    if failure_category:
+        event_filters.append("failure_category = :failure_category")
+        params["failure_category"] = failure_category
+    if root_cause:
+        event_filters.append("root_cause = :root_cause")
+        params["root_cause"] = root_cause
+    if event_filters:
+        filters.append(
+            f"item_id IN (SELECT item_id FROM STOCKOUT_EVENTS WHERE {' AND '.join(event_filters)})"
+        )
+
+    return filters
+
+
+@cached("STOCKOUT_EVENTS", "INVENTORY_SNAPSHOT", "DEMAND_FORECAST", "REORDER_RULES", "PURCHASE_ORDERS")
+@pluggable
+def simulate_items(
+    db: Session,
+    item_ids: Optional[List[str]] = None,
+    failure_category: Optional[str] = None,
+    root_cause: Optional[str] = None,
+    safety_stock_delta: int = 0,
+    safety_stock_multiplier: float = 1.0,
+    lead_time_delta: int = 0,
+    lead_time_multiplier: float = 1.0,
+    reorder_threshold_delta: int = 0,
+    reorder_threshold_multiplier: float = 1.0
+):
+    """
+    What-if outcome per item for adjusted rule parameters.
+
+    Each parameter becomes ROUND(value * multiplier + delta). Inputs and the
+    outcome test are the ones simulate_event uses, so a safety_stock_delta of 5
+    reproduces it; reorder_fires_in_time tells whether the adjusted reorder
+    threshold still covers lead-time demand plus safety stock.
+    """
+    if item_ids is not None and not item_ids:
+        return []
+
+    params: Dict[str, Any] = {
+        "ss_delta": safety_stock_delta,
+        "ss_mult": safety_stock_multiplier,
+        "lt_delta": lead_time_delta,
+        "lt_mult": lead_time_multiplier,
+        "rt_delta": reorder_threshold_delta,
+        "rt_mult": reorder_threshold_multiplier,
+    }
+    filters = _item_filters(item_ids, failure_category, root_cause, params)
+    where_clause = f"WHERE {' AND '.join(filters)}" if filters else ""
+
+    # Per item: the latest snapshot and the rule of that snapshot's warehouse
+    query = text(f"""
+        WITH inv AS (
+            SELECT item_id, warehouse_id, stock_on_hand
+            FROM INVENTORY_SNAPSHOT
+            WHERE item_id IN (SELECT item_id FROM REORDER_RULES {where_clause})
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY item_id ORDER BY snapshot_time DESC, warehouse_id) = 1
+        ),
+        rules AS (
+            SELECT r.item_id, r.warehouse_id, r.safety_stock, r.lead_time_days, r.reorder_threshold
+            FROM REORDER_RULES r
+            JOIN inv ON inv.item_id = r.item_id AND inv.warehouse_id = r.warehouse_id
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY r.item_id ORDER BY r.last_updated DESC) = 1
+        ),
+        fc AS (
+            SELECT item_id, daily_demand
+            FROM DEMAND_FORECAST
+            WHERE item_id IN (SELECT item_id FROM rules)
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY item_id ORDER BY forecast_created_date DESC) = 1
+        ),
+        incoming AS (
+            SELECT item_id, SUM(quantity) AS incoming_qty
+            FROM PURCHASE_ORDERS
+            WHERE item_id IN (SELECT item_id FROM rules)
+            GROUP BY item_id
+        ),
+        scenario AS (
+            SELECT
+                rules.item_id,
+                rules.warehouse_id,
+                rules.safety_stock,
+                rules.lead_time_days,
+                rules.reorder_threshold,
+                fc.daily_demand,
+                GREATEST(ROUND(rules.safety_stock * :ss_mult + :ss_delta), 0) AS new_safety_stock,
+                GREATEST(ROUND(rules.lead_time_days * :lt_mult + :lt_delta), 0) AS new_lead_time_days,
+                GREATEST(ROUND(rules.reorder_threshold * :rt_mult + :rt_delta), 0) AS new_reorder_threshold,
+                (inv.stock_on_hand + COALESCE(incoming.incoming_qty, 0)) AS projected_stock
+            FROM rules
+            JOIN fc ON fc.item_id = rules.item_id
+            JOIN inv ON inv.item_id = rules.item_id
+            LEFT JOIN incoming ON incoming.item_id = rules.item_id
+        )
+        SELECT
+            *,
+            (daily_demand * new_lead_time_days + new_safety_stock) AS new_threshold,
+            CASE
+              WHEN projected_stock <= (daily_demand * new_lead_time_days + new_safety_stock)
+              THEN 'STILL FAILS'
+              ELSE 'PREVENTS STOCKOUT'
+            END AS outcome,
+            new_reorder_threshold >= (daily_demand * new_lead_time_days + new_safety_stock) AS reorder_fires_in_time
+        FROM scenario
+        ORDER BY item_id;
+    """)
+    if "item_ids" in params:
+        query = query.bindparams(bindparam("item_ids", expanding=True))
+
+    result = db.execute(query, params)
+    return rows_to_dicts(result)
+
+
+def simulate_scenario(db: Session, **scenario):
+    """Per-item outcomes of a what-if scenario plus aggregate counts"""
+    items = simulate_items(db, **scenario)
+    still_fails = sum(1 for item in items if item["outcome"] == "STILL FAILS")
+    return {
+        "scenario": scenario,
+        "summary": {
+            "items": len(items),
+            "still_fails": still_fails,
+            "prevents_stockout": len(items) - still_fails,
+            "reorder_fires_in_time": sum(1 for item in items if item["reorder_fires_in_time"]),
+        },
+        "items": items,
+    }
+
+
+def get_user_by_email(db, email: str):
+    """EMAIL and ROLES of an existing user, or None"""
+    result = db.execute(
+        text("SELECT EMAIL, ROLES FROM RETRACE_USER WHERE EMAIL = :email"),
+        {"email": email}
+    )
+    return result.fetchone()
 
 
 def save_user_info(db, user):
@@ -199,39 +527,86 @@ def save_user_info(db, user):
 
 
 
+@cached("STOCKOUT_EVENTS")
+@pluggable
 def get_dashboard_summary(db: Session, days: int = 30):
     """High-level metrics for dashboard"""
+    daily, _ = rollup_sources(db)
     query = text(f"""
         WITH recent_events AS (
-            SELECT * FROM STOCKOUT_EVENTS
+            SELECT * FROM {daily}
             WHERE stockout_date >= DATEADD(day, -{days}, CURRENT_DATE())
         )
         SELECT 
-            COUNT(*) AS total_stockouts,
-            SUM(CASE WHEN failure_category = 'EXECUTION_FAILURE' THEN 1 ELSE 0 END) AS execution_failures,
-            SUM(CASE WHEN failure_category = 'DECISION_FAILURE' THEN 1 ELSE 0 END) AS decision_failures,
-            AVG(analysis_confidence) AS avg_confidence,
-            (SELECT root_cause FROM recent_events GROUP BY root_cause ORDER BY COUNT(*) DESC LIMIT 1) AS top_root_cause
+            COALESCE(SUM(event_count), 0) AS total_stockouts,
+            SUM(CASE WHEN failure_category = 'EXECUTION_FAILURE' THEN event_count ELSE 0 END) AS execution_failures,
+            SUM(CASE WHEN failure_category = 'DECISION_FAILURE' THEN event_count ELSE 0 END) AS decision_failures,
+            SUM(confidence_sum) / NULLIF(SUM(confidence_count), 0) AS avg_confidence,
+            (SELECT root_cause FROM recent_events GROUP BY root_cause ORDER BY SUM(event_count) DESC LIMIT 1) AS top_root_cause
         FROM recent_events;
     """)
     result = db.execute(query)
-    row = result.fetchone()
-    return dict(row._mapping) if row else {}
+    return first_row(result) or {}
 
 
+@cached("STOCKOUT_EVENTS")
+@pluggable
 def get_root_cause_distribution(db: Session):
     """Root cause breakdown for charts"""
-    query = text("""
+    daily, _ = rollup_sources(db)
+    query = text(f"""
         SELECT 
             root_cause,
-            COUNT(*) AS count,
-            ROUND(COUNT(*) * 100.0 / SUM(COUNT(*)) OVER(), 2) AS percentage
-        FROM STOCKOUT_EVENTS
+            SUM(event_count) AS count,
+            ROUND(SUM(event_count) * 100.0 / SUM(SUM(event_count)) OVER(), 2) AS percentage
+        FROM {daily}
         GROUP BY root_cause
         ORDER BY count DESC;
     """)
     result = db.execute(query)
-    return [dict(row._mapping) for row in result.fetchall()]
+    return rows_to_dicts(result)
+
+
+# Trend bucket sizes, and the most buckets the automatic choice aims for
+TREND_GRANULARITIES = {"day": 1, "week": 7, "month": 30}
+TREND_MAX_BUCKETS = 120
+
+
+def trend_granularity(days: int) -> str:
+    """Finest bucket that keeps `days` within TREND_MAX_BUCKETS points"""
+    for granularity, size in TREND_GRANULARITIES.items():
+        if days / size <= TREND_MAX_BUCKETS:
+            return granularity
+    return "month"
+
+
+@pluggable
+def get_trend_counts(db: Session, days: int, granularity: str):
+    """Stockout counts per `granularity` bucket over the last `days` days"""
+    daily, _ = rollup_sources(db)
+    query = text(f"""
+        SELECT 
+            DATE_TRUNC('{granularity}', stockout_date) AS period,
+            '{granularity}' AS granularity,
+            SUM(event_count) AS stockout_count,
+            SUM(CASE WHEN failure_category = 'EXECUTION_FAILURE' THEN event_count ELSE 0 END) AS execution_failures,
+            SUM(CASE WHEN failure_category = 'DECISION_FAILURE' THEN event_count ELSE 0 END) AS decision_failures
+        FROM {daily}
+        WHERE stockout_date >= DATEADD(day, -{days}, CURRENT_DATE())
+        GROUP BY period
+        ORDER BY period;
+    """)
+    result = db.execute(query)
+    return rows_to_dicts(result)
+
+
+@cached("STOCKOUT_EVENTS")
+def get_stockout_trends(db: Session, days: int = 30, granularity: Optional[str] = None):
+    """Stockout counts per day, week or month for trend charts (chosen from `days` when not given)"""
+    granularity = granularity or trend_granularity(days)
+    if granularity not in TREND_GRANULARITIES:
+        raise ValueError(f"Unknown granularity '{granularity}'")
+    return get_trend_counts(db, days, granularity)
 
 
 # def get_inventory_timeline(db: Session, item_id: str, days: int = 30):
@@ -257,17 +632,25 @@ def get_root_cause_distribution(db: Session):
 #     result = db.execute(query, {'item_id': item_id})
 #     return [dict(row._mapping) for row in result.fetchall()]
 
-def get_inventory_timeline(db: Session, item_id: str, days: int = 30):
-    item_id = item_id.upper()
-
+@cached("INVENTORY_SNAPSHOT", "REORDER_RULES")
+@pluggable
+def get_inventory_points(db: Session, item_id: str, days: int = 30, warehouse_id: Optional[str] = None):
+    """Snapshots of an item against its warehouse's latest reorder rule, by warehouse then time"""
     query = text("""
         WITH latest AS (
             SELECT MAX(snapshot_time) AS max_time
             FROM INVENTORY_SNAPSHOT
             WHERE item_id = :item_id
+        ),
+        rules AS (
+            SELECT warehouse_id, reorder_threshold, safety_stock
+            FROM REORDER_RULES
+            WHERE item_id = :item_id
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY warehouse_id ORDER BY last_updated DESC) = 1
         )
         SELECT 
             i.snapshot_time,
+            i.warehouse_id,
             i.stock_on_hand,
             r.reorder_threshold,
             r.safety_stock,
@@ -277,22 +660,54 @@ def get_inventory_timeline(db: Session, item_id: str, days: int = 30):
                 ELSE 'HEALTHY'
             END AS status
         FROM INVENTORY_SNAPSHOT i
-        JOIN REORDER_RULES r 
-          ON i.item_id = r.item_id
+        JOIN rules r 
+          ON i.warehouse_id = r.warehouse_id
         JOIN latest l
           ON i.snapshot_time >= DATEADD(day, -:days, l.max_time)
         WHERE i.item_id = :item_id
-        ORDER BY i.snapshot_time;
+          AND (:warehouse_id IS NULL OR i.warehouse_id = :warehouse_id)
+        ORDER BY i.warehouse_id, i.snapshot_time;
     """)
 
     result = db.execute(query, {
         "item_id": item_id,
-        "days": days
+        "days": days,
+        "warehouse_id": warehouse_id
     })
 
-    return [dict(row._mapping) for row in result.fetchall()]
+    return rows_to_dicts(result)
 
 
+def get_inventory_timeline(
+    db: Session,
+    item_id: str,
+    days: int = 30,
+    max_points: int = 0,
+    warehouse_id: Optional[str] = None
+):
+    """One stock series per warehouse against its rule; at most `max_points` points each when set"""
+    rows = get_inventory_points(db, item_id.upper(), days, warehouse_id.upper() if warehouse_id else None)
+    rows = downsample_records(rows, "snapshot_time", "stock_on_hand", max_points, ("warehouse_id",))
+
+    series: List[Dict[str, Any]] = []
+    for row in rows:
+        if not series or series[-1]["warehouse_id"] != row["warehouse_id"]:
+            series.append({
+                "warehouse_id": row["warehouse_id"],
+                "reorder_threshold": row["reorder_threshold"],
+                "safety_stock": row["safety_stock"],
+                "points": [],
+            })
+        series[-1]["points"].append({
+            "snapshot_time": row["snapshot_time"],
+            "stock_on_hand": row["stock_on_hand"],
+            "status": row["status"],
+        })
+    return series
+
+
+@cached("DEMAND_FORECAST")
+@pluggable
 def get_forecast_accuracy(db: Session, item_id: str):
     """Compare forecast vs reality"""
     item_id = item_id.upper()
@@ -314,9 +729,80 @@ def get_forecast_accuracy(db: Session, item_id: str):
         LIMIT 30;
     """)
     result = db.execute(query, {'item_id': item_id})
-    return [dict(row._mapping) for row in result.fetchall()]
+    return rows_to_dicts(result)
+
+
+# Per-day forecast and actual demand, with the kinds used by columnar.to_array
+FORECAST_PAIR_COLUMNS = {
+    "item_id": "str",
+    "forecast_date": "date",
+    "daily_demand": "float",
+    "actual_demand": "float",
+}
+
+
+@pluggable
+def get_forecast_pairs(
+    db: Session,
+    item_id: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+) -> Table:
+    """Forecast and actual demand per item and day, ordered by item and day"""
+    query = text("""
+        SELECT
+            item_id,
+            forecast_date,
+            AVG(daily_demand) AS daily_demand,
+            AVG(actual_demand) AS actual_demand
+        FROM DEMAND_FORECAST
+        WHERE actual_demand IS NOT NULL
+          AND (:item_id IS NULL OR item_id = :item_id)
+          AND (:start_date IS NULL OR forecast_date >= :start_date)
+          AND (:end_date IS NULL OR forecast_date <= :end_date)
+        GROUP BY item_id, forecast_date
+        ORDER BY item_id, forecast_date
+    """)
+    result = db.execute(query, {"item_id": item_id, "start_date": start_date, "end_date": end_date})
+    rows = result.fetchall()
+    return Table("DEMAND_FORECAST", {
+        name: to_array([row[i] for row in rows], kind)
+        for i, (name, kind) in enumerate(FORECAST_PAIR_COLUMNS.items())
+    })
+
+
+@cached("DEMAND_FORECAST")
+def get_worst_forecast_items(
+    db: Session,
+    metric: str = "mape",
+    limit: int = 20,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    window: int = DEFAULT_WINDOW_DAYS
+):
+    """Forecast quality of every item, worst first by `metric`"""
+    quality = quality_by_item(daily_pairs(get_forecast_pairs(db, None, start_date, end_date)), window)
+    return quality.records(rank_items(quality, metric, limit))
+
+
+@cached("DEMAND_FORECAST")
+def get_forecast_quality(
+    db: Session,
+    item_id: str,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    window: int = DEFAULT_WINDOW_DAYS
+):
+    """Forecast quality of one item, with its day-by-day error series"""
+    pairs = daily_pairs(get_forecast_pairs(db, item_id.upper(), start_date, end_date))
+    quality = quality_by_item(pairs, window)
+    if not len(quality):
+        return {}
+    return {**quality.records()[0], "series": error_series(pairs, window).records()}
 
 
+@cached("PURCHASE_ORDERS")
+@pluggable
 def get_supplier_performance(db: Session):
     """Supplier delay analysis"""
     query = text("""
@@ -331,82 +817,136 @@ def get_supplier_performance(db: Session):
         ORDER BY total_delays DESC;
     """)
     result = db.execute(query)
-    return [dict(row._mapping) for row in result.fetchall()]
+    return rows_to_dicts(result)
 
 
-def get_similar_failures(db: Session, item_id: str, limit: int = 5):
-    """Find similar failure patterns"""
-    item_id = item_id.upper()
-    query = text("""
-        WITH target_event AS (
-            SELECT root_cause, failure_category, warehouse_id
-            FROM STOCKOUT_EVENTS
-            WHERE item_id = :item_id
-            LIMIT 1
-        )
-        SELECT 
-            s.item_id,
-            s.stockout_date,
-            s.root_cause,
-            s.failure_category
-        FROM STOCKOUT_EVENTS s, target_event t
-        WHERE s.item_id != :item_id
-          AND s.root_cause = t.root_cause
-          AND s.failure_category = t.failure_category
-        ORDER BY s.stockout_date DESC
-        LIMIT :limit;
-    """)
-    result = db.execute(query, {'item_id': item_id, 'limit': limit})
-    return [dict(row._mapping) for row in result.fetchall()]
+# Fingerprints of every stockout, kept current by get_similar_failures
+failure_index = FailureIndex()
 
 
-def analyze_stockout_with_ai(db: Session, item_id: str):
-    """Use Cortex AI to explain failure in natural language"""
-    item_id = item_id.upper()
-    
-    # Get event data
+@cached("STOCKOUT_EVENTS")
+@pluggable
+def get_event_watermark(db: Session) -> Tuple[Optional[datetime], int]:
+    """Newest analyzed_at in STOCKOUT_EVENTS and the number of events"""
+    row = db.execute(text("SELECT MAX(analyzed_at), COUNT(*) FROM STOCKOUT_EVENTS")).fetchone()
+    return row[0], int(row[1])
+
+
+# Tables besides STOCKOUT_EVENTS that failure fingerprints are derived from
+FINGERPRINT_SOURCES = ("DEMAND_FORECAST", "PURCHASE_ORDERS", "REORDER_RULES")
+
+
+@pluggable
+def get_fingerprint_versions(db: Session) -> Tuple[Optional[str], ...]:
+    """Data versions of FINGERPRINT_SOURCES"""
+    versions = get_table_versions(db)
+    return tuple(versions.get(table) for table in FINGERPRINT_SOURCES)
+
+
+def get_similar_failures(db: Session, item_id: str, limit: int = 5, warehouse_id: Optional[str] = None):
+    """
+    Items whose stockouts look most like this item's latest one, by distance
+    between failure fingerprints (see similarity.py); the nearest event per
+    item, closest first.
+    """
+    latest, total = get_event_watermark(db)
+    failure_index.refresh(
+        latest, total,
+        lambda since: get_root_cause_inputs(db, analyzed_since=since),
+        get_fingerprint_versions(db)
+    )
+    return failure_index.nearest(item_id.upper(), limit, warehouse_id.upper() if warehouse_id else None)
+
+
+def get_latest_stockout(db: Session, item_id: str) -> Optional[Dict[str, Any]]:
+    """Most recent stockout event of an item"""
     event_query = text("""
         SELECT * FROM STOCKOUT_EVENTS
         WHERE item_id = :item_id
-        ORDER BY stockout_date DESC
+        ORDER BY stockout_date DESC, warehouse_id
         LIMIT 1;
     """)
-    event = db.execute(event_query, {'item_id': item_id}).fetchone()
-    
-    if not event:
-        return {"error": "No stockout found for this item"}
-    
-    # Build context for AI
-    prompt = f"""
+    return first_row(db.execute(event_query, {'item_id': item_id.upper()}))
+
+
+def analysis_results(events: List[Dict[str, Any]], completions: Dict[str, Optional[str]]) -> List[Dict[str, Any]]:
+    """Explanation per event, given the completions of their prompts"""
+    return [
+        {
+            "item_id": event["item_id"],
+            "warehouse_id": event["warehouse_id"],
+            "stockout_date": event["stockout_date"],
+            "ai_explanation": completions.get(build_stockout_prompt(event)) or "Analysis unavailable",
+        }
+        for event in events
+    ]
+
+
+@pluggable
+def get_stockouts_for_analysis(
+    db: Session,
+    item_ids: Optional[List[str]] = None,
+    failure_category: Optional[str] = None,
+    root_cause: Optional[str] = None,
+    latest_only: bool = False,
+    limit: int = 1000
+) -> List[Dict[str, Any]]:
+    """
+    Stockout events to explain in bulk. With `latest_only`, one per item: the
+    event `/{itemId}/ai-analysis` explains.
+    """
+    params: Dict[str, Any] = {"limit": limit}
+    filters = []
+
+    if item_ids is not None:
+        filters.append("item_id IN :item_ids")
+        params["item_ids"] = [i.upper() for i in item_ids] or [""]
+
+    if failure_category:
+        filters.append("failure_category = :failure_category")
+        params["failure_category"] = failure_category
+
+    if root_cause:
+        filters.append("root_cause = :root_cause")
+        params["root_cause"] = root_cause
+
+    where_clause = f"WHERE {' AND '.join(filters)}" if filters else ""
+    qualify_clause = (
+        "QUALIFY ROW_NUMBER() OVER (PARTITION BY item_id ORDER BY stockout_date DESC, warehouse_id) = 1"
+        if latest_only else ""
+    )
+
+    query = text(f"""
+        SELECT *
+        FROM STOCKOUT_EVENTS
+        {where_clause}
+        {qualify_clause}
+        ORDER BY stockout_date DESC, item_id, warehouse_id
+        LIMIT :limit
+    """)
+    if "item_ids" in params:
+        query = query.bindparams(bindparam("item_ids", expanding=True))
+
+    return rows_to_dicts(db.execute(query, params))
+
+
+def build_stockout_prompt(event: Dict[str, Any]) -> str:
+    """Prompt asking Cortex to explain one stockout event"""
+    return f"""
     Explain this stockout in 2-3 sentences for a supply chain manager:
     
-    Item: {event.item_id}
-    Date: {event.stockout_date}
-    Failure Type: {event.failure_category}
-    Root Cause: {event.root_cause}
-    Reorder Triggered: {event.reorder_triggered}
+    Item: {event['item_id']}
+    Date: {event['stockout_date']}
+    Failure Type: {event['failure_category']}
+    Root Cause: {event['root_cause']}
+    Reorder Triggered: {event['reorder_triggered']}
     
     Be specific and actionable.
     """
-    
-    # Call Cortex
-    ctx = db.connection().connection
-    cs = ctx.cursor()
-    try:
-        cs.execute(
-            "SELECT SNOWFLAKE.CORTEX.COMPLETE('mistral-large', %s)",
-            (prompt,)
-        )
-        row = cs.fetchone()
-        return {
-            "item_id": item_id,
-            "ai_explanation": row[0] if row else "Analysis unavailable"
-        }
-    finally:
-        cs.close()
-        ctx.close()
 
 
+@cached("PURCHASE_ORDERS")
+@pluggable
 def get_reorder_triggers(
     db: Session,
     item_id: Optional[str] = None,
@@ -436,7 +976,413 @@ def get_reorder_triggers(
     """)
 
     result = db.execute(query, params)
-    return [dict(row._mapping) for row in result.fetchall()]
+    return rows_to_dicts(result)
+
+@cached("REORDER_RULES", "STOCKOUT_EVENTS")
+@pluggable
+def get_rule_health(db: Session):
+    """Reorder rules that are stale, ineffective or under-stocked"""
+    _, items = rollup_sources(db)
+    query = text(f"""
+        WITH rule_failures AS (
+            SELECT 
+                r.item_id,
+                r.warehouse_id,
+                r.safety_stock,
+                r.reorder_threshold,
+                r.last_updated,
+                DATEDIFF(day, r.last_updated, CURRENT_DATE()) AS days_since_update,
+                COALESCE(SUM(f.event_count), 0) AS stockout_count
+            FROM REORDER_RULES r
+            LEFT JOIN {items} f 
+                ON r.item_id = f.item_id 
+                AND r.warehouse_id = f.warehouse_id
+                AND f.failure_category = 'DECISION_FAILURE'
+            GROUP BY r.item_id, r.warehouse_id, r.safety_stock, r.reorder_threshold, r.last_updated
+        )
+        SELECT 
+            item_id,
+            warehouse_id,
+            safety_stock,
+            reorder_threshold,
+            days_since_update,
+            stockout_count,
+            CASE 
+                WHEN days_since_update > 180 THEN 'STALE_RULE'
+                WHEN stockout_count > 2 THEN 'INEFFECTIVE_RULE'
+                WHEN safety_stock < 20 THEN 'SAFETY_STOCK_TOO_LOW'
+                ELSE 'HEALTHY'
+            END AS health_status
+        FROM rule_failures
+        WHERE health_status != 'HEALTHY'
+        ORDER BY stockout_count DESC, days_since_update DESC;
+    """)
+    result = db.execute(query)
+    return rows_to_dicts(result)
+
+
+@cached("STOCKOUT_EVENTS", "REORDER_RULES")
+def get_recommendations(
+    db: Session,
+    item_id: Optional[str] = None,
+    root_cause: Optional[str] = None
+):
+    """Rule-based action items for the most frequent failure patterns"""
+    query = text("""
+        WITH failure_patterns AS (
+            SELECT 
+                item_id,
+                warehouse_id,
+                root_cause,
+                COUNT(*) AS failure_count
+            FROM STOCKOUT_EVENTS
+            WHERE (:item_id IS NULL OR item_id = :item_id)
+              AND (:root_cause IS NULL OR root_cause = :root_cause)
+            GROUP BY item_id, warehouse_id, root_cause
+            ORDER BY failure_count DESC, item_id, warehouse_id, root_cause
+            LIMIT 10
+        ),
+        rules AS (
+            SELECT item_id, warehouse_id, safety_stock, reorder_threshold
+            FROM REORDER_RULES
+            WHERE item_id IN (SELECT item_id FROM failure_patterns)
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY item_id, warehouse_id ORDER BY last_updated DESC) = 1
+        )
+        SELECT 
+            fp.item_id,
+            fp.warehouse_id,
+            fp.root_cause,
+            fp.failure_count,
+            r.safety_stock AS current_safety_stock,
+            r.reorder_threshold AS current_threshold,
+            CASE fp.root_cause
+                WHEN 'SAFETY_STOCK_INSUFFICIENT' THEN 'Increase safety_stock by 50%'
+                WHEN 'THRESHOLD_TOO_LOW' THEN 'Raise reorder_threshold by 30%'
+                WHEN 'SUPPLIER_DELAY' THEN 'Switch supplier or increase lead_time'
+                WHEN 'FORECAST_UNDERESTIMATED' THEN 'Retrain forecast model'
+                WHEN 'STALE_FORECAST' THEN 'Reduce forecast refresh interval to 7 days'
+                ELSE 'Review rule configuration'
+            END AS recommendation
+        FROM failure_patterns fp
+        LEFT JOIN rules r ON fp.item_id = r.item_id AND fp.warehouse_id = r.warehouse_id
+        ORDER BY fp.failure_count DESC, fp.item_id, fp.warehouse_id, fp.root_cause;
+    """)
+    result = db.execute(query, {'item_id': item_id, 'root_cause': root_cause})
+    return rows_to_dicts(result)
+
+
+@cached("REORDER_RULES", "STOCKOUT_EVENTS", "DEMAND_FORECAST", "INVENTORY_SNAPSHOT", "PURCHASE_ORDERS")
+@pluggable
+def get_replay_inputs(
+    db: Session,
+    item_id: str,
+    days: int = 365
+) -> Optional[ReplayInputs]:
+    """Starting stock, daily actual demand and each warehouse's current rule for replaying an item"""
+    item_id = item_id.upper()
+    rule_query = text("""
+        SELECT warehouse_id, safety_stock, reorder_threshold, lead_time_days, last_updated
+        FROM REORDER_RULES
+        WHERE item_id = :item_id
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY warehouse_id ORDER BY last_updated DESC) = 1;
+    """)
+    rules = rows_to_dicts(db.execute(rule_query, {'item_id': item_id}))
+    if not rules:
+        return None
+    history_query = text("""
+        SELECT
+            (SELECT COUNT(*) FROM STOCKOUT_EVENTS WHERE item_id = :item_id) AS recorded_stockouts,
+            (SELECT AVG(quantity) FROM PURCHASE_ORDERS WHERE item_id = :item_id) AS order_qty;
+    """)
+    history = db.execute(history_query, {'item_id': item_id}).fetchone()
+
+    # First snapshot of every warehouse is the replay's starting point
+    stock_query = text("""
+        SELECT warehouse_id, snapshot_time::DATE AS snapshot_date, stock_on_hand
+        FROM INVENTORY_SNAPSHOT
+        WHERE item_id = :item_id
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY warehouse_id ORDER BY snapshot_time) = 1
+        ORDER BY warehouse_id;
+    """)
+    stocks = db.execute(stock_query, {'item_id': item_id}).fetchall()
+    if not stocks:
+        return None
+    start_date = min(row.snapshot_date for row in stocks)
+    warehouse_ids = [row.warehouse_id for row in stocks]
+    safety_stock, reorder_threshold, lead_time_days = warehouse_rules(warehouse_ids, rules)
+
+    demand_query = text("""
+        SELECT forecast_date, AVG(COALESCE(actual_demand, daily_demand)) AS demand
+        FROM DEMAND_FORECAST
+        WHERE item_id = :item_id
+          AND forecast_date > :start_date
+          AND forecast_date <= DATEADD(day, :days, :start_date)
+        GROUP BY forecast_date
+        ORDER BY forecast_date;
+    """)
+    demand = db.execute(demand_query, {
+        'item_id': item_id,
+        'start_date': start_date,
+        'days': days
+    }).fetchall()
+
+    return ReplayInputs(
+        item_id=item_id,
+        start_date=start_date,
+        warehouse_ids=warehouse_ids,
+        start_stock=np.array([row.stock_on_hand or 0 for row in stocks], dtype=np.float64),
+        demand=daily_demand(
+            start_date,
+            [row.forecast_date for row in demand],
+            [float(row.demand) if row.demand is not None else np.nan for row in demand],
+            days
+        ),
+        safety_stock=safety_stock,
+        reorder_threshold=reorder_threshold,
+        lead_time_days=lead_time_days,
+        order_qty=float(history.order_qty) if history.order_qty is not None else DEFAULT_ORDER_QTY,
+        recorded_stockouts=history.recorded_stockouts,
+    )
+
+
+def compare_configurations(
+    db: Session,
+    item_id: str,
+    new_safety_stock: int,
+    new_threshold: int,
+    days: int = 365
+):
+    """Current reorder configuration next to a proposed one, both replayed over recorded demand"""
+    inputs = get_replay_inputs(db, item_id.upper(), days)
+    if inputs is None:
+        return {}
+    return compare_replay(inputs, new_safety_stock, new_threshold)
+
+
+# Columns of the failure report, with the kinds used by columnar.TABLE_SCHEMAS
+FAILURE_REPORT_COLUMNS: Dict[str, str] = {
+    "item_id": "str",
+    "warehouse_id": "str",
+    "stockout_date": "date",
+    "failure_category": "str",
+    "root_cause": "str",
+    "responsible_person": "str",
+    "assigned_to": "str",
+}
+
+EXPORT_BATCH_SIZE = 5000
+
+
+@pluggable
+def iter_failure_report(
+    db: Session,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    batch_size: int = EXPORT_BATCH_SIZE
+) -> Iterator[List[Dict[str, Any]]]:
+    """Failure report rows, fetched from the cursor `batch_size` at a time"""
+    query = text("""
+        WITH rules AS (
+            SELECT item_id, warehouse_id, rule_owner
+            FROM REORDER_RULES
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY item_id, warehouse_id ORDER BY last_updated DESC) = 1
+        )
+        SELECT 
+            s.item_id,
+            s.warehouse_id,
+            s.stockout_date,
+            s.failure_category,
+            s.root_cause,
+            r.rule_owner AS responsible_person,
+            CASE s.root_cause
+                WHEN 'SUPPLIER_DELAY' THEN 'Operations Team'
+                WHEN 'FORECAST_UNDERESTIMATED' THEN 'Planning Team'
+                WHEN 'THRESHOLD_TOO_LOW' THEN r.rule_owner
+                ELSE 'System Admin'
+            END AS assigned_to
+        FROM STOCKOUT_EVENTS s
+        LEFT JOIN rules r ON s.item_id = r.item_id AND s.warehouse_id = r.warehouse_id
+        WHERE (:start_date IS NULL OR s.stockout_date >= :start_date)
+          AND (:end_date IS NULL OR s.stockout_date <= :end_date)
+        ORDER BY s.stockout_date DESC;
+    """)
+    result = db.execute(query, {'start_date': start_date, 'end_date': end_date})
+    yield from iter_dict_batches(result, batch_size)
+
+
+@cached("STOCKOUT_EVENTS")
+@pluggable
+def count_failure_report(
+    db: Session,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+) -> int:
+    """Rows iter_failure_report yields for the same range (one per event)"""
+    query = text("""
+        SELECT COUNT(*)
+        FROM STOCKOUT_EVENTS
+        WHERE (:start_date IS NULL OR stockout_date >= :start_date)
+          AND (:end_date IS NULL OR stockout_date <= :end_date)
+    """)
+    return int(db.execute(query, {'start_date': start_date, 'end_date': end_date}).scalar())
+
+
+@cached("STOCKOUT_EVENTS", "REORDER_RULES")
+def get_failure_report(
+    db: Session,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+):
+    """Stockouts in a date range with owners and assignees"""
+    return [row for rows in iter_failure_report(db, start_date, end_date) for row in rows]
+
+
+def stream_failure_report(
+    db: Session,
+    fmt: str,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+) -> Iterator[bytes]:
+    """Failure report encoded as `fmt`, one chunk per fetched batch"""
+    encoder = make_encoder(fmt, FAILURE_REPORT_COLUMNS)
+    yield from encode_batches(encoder, iter_failure_report(db, start_date, end_date))
+
+
+@pluggable
+def get_root_cause_inputs(
+    db: Session,
+    unanalyzed_only: bool = False,
+    analyzed_since: Optional[datetime] = None
+) -> Tuple[Table, Table, Table, Table]:
+    """Events to classify, with the forecasts, orders and rules their evidence comes from"""
+    conditions = ["analysis_confidence IS NULL"] if unanalyzed_only else []
+    if analyzed_since is not None:
+        conditions.append("analyzed_at >= :analyzed_since")
+    event_filter = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    queries = {
+        "STOCKOUT_EVENTS": f"""
+            SELECT item_id, warehouse_id, stockout_date, root_cause, failure_category, analysis_confidence, analyzed_at
+            FROM STOCKOUT_EVENTS
+            {event_filter}
+        """,
+        "DEMAND_FORECAST": f"""
+            SELECT item_id, forecast_date, daily_demand, actual_demand, generated_at
+            FROM DEMAND_FORECAST
+            WHERE item_id IN (SELECT item_id FROM STOCKOUT_EVENTS {event_filter})
+              AND forecast_date <= (SELECT MAX(stockout_date) FROM STOCKOUT_EVENTS {event_filter})
+              AND forecast_date >= DATEADD(
+                  day,
+                  -(SELECT COALESCE(MAX(lead_time_days), 0) FROM REORDER_RULES) - {WINDOW_PAD_DAYS + DEFAULT_LEAD_TIME_DAYS},
+                  (SELECT MIN(stockout_date) FROM STOCKOUT_EVENTS {event_filter})
+              )
+        """,
+        "PURCHASE_ORDERS": f"""
+            SELECT item_id, order_date, expected_arrival_date, actual_arrival_date
+            FROM PURCHASE_ORDERS
+            WHERE item_id IN (SELECT item_id FROM STOCKOUT_EVENTS {event_filter})
+        """,
+        "REORDER_RULES": f"""
+            SELECT item_id, warehouse_id, safety_stock, reorder_threshold, lead_time_days, last_updated
+            FROM REORDER_RULES
+            WHERE item_id IN (SELECT item_id FROM STOCKOUT_EVENTS {event_filter})
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY item_id, warehouse_id ORDER BY last_updated DESC) = 1
+        """,
+    }
+    params = {"analyzed_since": analyzed_since} if analyzed_since is not None else {}
+    tables = []
+    for name, query in queries.items():
+        result = db.execute(text(query), params)
+        tables.append(Table.from_rows(name, list(result.keys()), result.fetchall()))
+    return tuple(tables)
+
+
+@pluggable
+def update_root_causes(db: Session, updates: List[Dict[str, Any]]) -> int:
+    """Write reclassified root causes and confidences back to STOCKOUT_EVENTS"""
+    db.execute(text("""
+        CREATE OR REPLACE TEMPORARY TABLE ROOT_CAUSE_UPDATES (
+            item_id STRING, warehouse_id STRING, stockout_date DATE, root_cause STRING, analysis_confidence FLOAT
+        )
+    """))
+    db.execute(
+        text("""
+            INSERT INTO ROOT_CAUSE_UPDATES
+            VALUES (:item_id, :warehouse_id, :stockout_date, :root_cause, :analysis_confidence)
+        """),
+        updates
+    )
+    try:
+        result = db.execute(text("""
+            UPDATE STOCKOUT_EVENTS e
+            SET root_cause = u.root_cause,
+                analysis_confidence = u.analysis_confidence,
+                analyzed_at = CURRENT_TIMESTAMP()
+            FROM ROOT_CAUSE_UPDATES u
+            WHERE e.item_id = u.item_id
+              AND e.warehouse_id = u.warehouse_id
+              AND e.stockout_date = u.stockout_date
+        """))
+        updated = result.rowcount
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    invalidate_versions()
+    refresh_rollups(db)
+    return updated
+
+
+def reclassify_stockouts(
+    db: Session,
+    apply: bool = True,
+    unanalyzed_only: bool = False,
+    limit: int = 100
+) -> Dict[str, Any]:
+    """
+    Derive every stockout's root cause and confidence from evidence.
+
+    Returns the resulting distribution and up to `limit` of the events whose
+    classification changed, with their evidence; with `apply` the changes are
+    written back (bumping `analyzed_at`, so the dashboard rollups pick them up).
+    """
+    events, forecasts, orders, rules = get_root_cause_inputs(db, unanalyzed_only)
+    evidence = compute_evidence(events, forecasts, orders, rules)
+    causes, confidence = classify(evidence)
+
+    previous = events["root_cause"]
+    previous_confidence = np.asarray(events["analysis_confidence"], dtype=np.float64)
+    changed = np.flatnonzero(
+        (causes != previous)
+        | np.isnan(previous_confidence)
+        | (np.abs(previous_confidence - confidence) > 1e-4)
+    )
+
+    columns = {
+        "item_id": events["item_id"][changed],
+        "warehouse_id": events["warehouse_id"][changed],
+        "stockout_date": events["stockout_date"][changed],
+        "previous_root_cause": previous[changed],
+        "root_cause": causes[changed],
+        "analysis_confidence": confidence[changed],
+    }
+    columns.update({name: evidence[name][changed] for name in EVIDENCE_COLUMNS})
+    changes = Table("ROOT_CAUSE_CHANGES", columns).records()
+
+    updated = 0
+    if apply and changes:
+        updated = update_root_causes(db, [
+            {key: change[key] for key in ("item_id", "warehouse_id", "stockout_date", "root_cause", "analysis_confidence")}
+            for change in changes
+        ])
+
+    distribution, counts = np.unique(causes.astype(str), return_counts=True)
+    return {
+        "events": len(events),
+        "changed": len(changes),
+        "updated": updated,
+        "distribution": dict(zip(distribution.tolist(), counts.tolist())),
+        "changes": changes[:limit],
+    }
 
 # def get_reorder_triggers(db: Session, item_id: str = None, days: int = 30):
 #     """Show reorder trigger history (placeholder - requires REORDER_TRIGGERS table)"""
@@ -496,3 +1442,45 @@ def update_user_role(db, email: str, role: str):
         raise ValueError(f"User with email {email} not found")
     
     db.commit()
+
+
+def create_users(db, users: List[Dict[str, Any]], role: str):
+    """Insert users that do not exist yet; returns (created, skipped) emails"""
+    created = []
+    skipped = []
+
+    try:
+        for user in users:
+
+            email = user.get("email")
+            name = user.get("name", None)
+
+            if not email:
+                raise ValueError("Email is required for each user.")
+
+            # Check if exists
+            result = db.execute(
+                text("SELECT EMAIL FROM RETRACE_USER WHERE EMAIL = :email"),
+                {"email": email}
+            )
+            if result.fetchone():
+                skipped.append(email)
+                continue
+
+            # Insert with NAME + EMAIL + ROLE + UUID
+            db.execute(
+                text("""
+                    INSERT INTO RETRACE_USER (ID, NAME, EMAIL, ROLES)
+                    SELECT UUID_STRING(), :name, :email, :role
+                """),
+                {"name": name, "email": email, "role": role}
+            )
+
+            created.append(email)
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return created, skipped
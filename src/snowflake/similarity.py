@@ -0,0 +1,217 @@
+"""
+Nearest-neighbour index over stockout failure fingerprints.
+
+Every stockout event is described by a numeric fingerprint:
+
+- lead_time_days: lead time of the item's reorder rule at that warehouse
+- safety_stock_ratio: safety stock as a share of the reorder threshold
+- delay_days: days late of the last purchase order before the stockout
+- forecast_error: share of actual demand the forecast missed
+- days_of_cover: days of demand the reorder threshold covers
+
+and its warehouse. Features are centred on their median and scaled by their
+interquartile range (clipped to +/- FEATURE_CLIP), so one extreme item does
+not flatten everyone else; missing values sit at the median. The distance is
+Euclidean over the scaled features plus WAREHOUSE_WEIGHT when the warehouses
+differ.
+
+The index lives in memory and is kept current from an `analyzed_at`
+watermark: only events written or re-analyzed since the last refresh are
+fingerprinted again, and they replace their previous rows. Fingerprints also
+depend on forecasts, orders and rules, so a change in the versions of those
+tables rebuilds the index. A query is one
+vectorized pass over the index, milliseconds for hundreds of thousands of
+events.
+"""
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.snowflake.columnar import Table, to_python
+from src.snowflake.root_cause import compute_evidence
+
+FEATURES = (
+    "lead_time_days",
+    "safety_stock_ratio",
+    "delay_days",
+    "forecast_error",
+    "days_of_cover",
+)
+
+# Distance added when two events happened at different warehouses
+WAREHOUSE_WEIGHT = 1.0
+# Scaled features are clipped to this many interquartile ranges
+FEATURE_CLIP = 5.0
+# Candidates examined per requested result before widening the search
+CANDIDATES_PER_RESULT = 8
+
+EVENT_COLUMNS = ("item_id", "warehouse_id", "stockout_date", "root_cause", "failure_category")
+
+Inputs = Tuple[Table, Table, Table, Table]
+
+
+def fingerprints(events: Table, forecasts: Table, orders: Table, rules: Table) -> np.ndarray:
+    """[N, len(FEATURES)] raw fingerprints for every row of `events` (NaN when unknown)"""
+    evidence = compute_evidence(events, forecasts, orders, rules)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        safety_ratio = evidence["safety_stock"] / evidence["reorder_threshold"]
+        cover = evidence["reorder_threshold"] / evidence["mean_daily_demand"]
+    # No order before the stockout means nothing was late
+    delay = np.nan_to_num(evidence["supplier_delay_days"], nan=0.0)
+    columns = (evidence["lead_time_days"], safety_ratio, delay, evidence["forecast_underestimate"], cover)
+    matrix = np.column_stack(columns) if len(events) else np.empty((0, len(FEATURES)))
+    matrix[~np.isfinite(matrix)] = np.nan
+    return matrix
+
+
+def scale(raw: np.ndarray) -> np.ndarray:
+    """Robust per-feature scaling; missing values land on the median (0)"""
+    if not len(raw):
+        return raw.copy()
+    with np.errstate(invalid="ignore"):
+        median = np.nanmedian(raw, axis=0)
+        spread = np.nanpercentile(raw, 75, axis=0) - np.nanpercentile(raw, 25, axis=0)
+    median = np.nan_to_num(median)
+    spread = np.where(np.isfinite(spread) & (spread > 0), spread, 1.0)
+    scaled = np.clip((raw - median) / spread, -FEATURE_CLIP, FEATURE_CLIP)
+    return np.nan_to_num(scaled, nan=0.0).astype(np.float32)
+
+
+class FailureIndex:
+    """Fingerprints of every stockout event, searchable by distance"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._clear()
+
+    def _clear(self) -> None:
+        self.watermark: Optional[datetime] = None
+        self.sources: Any = None
+        self.size = 0
+        self._columns: Dict[str, np.ndarray] = {c: np.empty(0, dtype=object) for c in EVENT_COLUMNS}
+        self._raw = np.empty((0, len(FEATURES)))
+        self._scaled = np.empty((0, len(FEATURES)), dtype=np.float32)
+        self._warehouse = np.empty(0, dtype=np.int64)
+        self._warehouse_codes: Dict[Any, int] = {}
+        self._rows: Dict[Tuple, int] = {}
+        self._item_rows: Dict[Any, List[int]] = {}
+
+    def refresh(
+        self,
+        latest: Optional[datetime],
+        total: int,
+        load: Callable[[Optional[datetime]], Inputs],
+        sources: Any = None
+    ) -> int:
+        """
+        Bring the index up to `latest`, the newest `analyzed_at` of
+        STOCKOUT_EVENTS holding `total` events. `load(since)` returns the
+        root-cause inputs for events analyzed at or after `since` (all of
+        them for None). `sources` identifies the state of the other input
+        tables (their versions). Rebuilds from scratch when `sources` changed
+        or the event count moved without a newer `analyzed_at` (deleted or
+        reloaded events). Returns the number of events fingerprinted.
+        """
+        with self.lock:
+            if sources != self.sources:
+                self._clear()
+                self.sources = sources
+            current = self.watermark is not None and latest is not None and latest <= self.watermark
+            if current and total == self.size:
+                return 0
+            if current or self.watermark is None or latest is None or total < self.size:
+                self._clear()
+                self.sources = sources
+            if not total:
+                return 0
+            events, forecasts, orders, rules = load(self.watermark)
+            if len(events):
+                self._upsert(events, fingerprints(events, forecasts, orders, rules))
+                analyzed = np.asarray(events["analyzed_at"]).astype("datetime64[us]")
+                analyzed = analyzed[~np.isnat(analyzed)]
+                if len(analyzed):
+                    newest = analyzed.max().astype(datetime)
+                    self.watermark = newest if self.watermark is None else max(self.watermark, newest)
+            return len(events)
+
+    def _upsert(self, events: Table, raw: np.ndarray) -> None:
+        keys = list(zip(
+            events["item_id"].tolist(), events["warehouse_id"].tolist(), to_python(events["stockout_date"])
+        ))
+        positions = np.array([self._rows.get(key, -1) for key in keys], dtype=np.int64)
+        known = positions >= 0
+        fresh = np.flatnonzero(~known)
+
+        # Re-analyzed events keep their row; new ones are appended
+        for column in EVENT_COLUMNS:
+            values = np.asarray(events[column], dtype=object)
+            self._columns[column][positions[known]] = values[known]
+            self._columns[column] = np.concatenate([self._columns[column], values[fresh]])
+        self._raw[positions[known]] = raw[known]
+        self._raw = np.concatenate([self._raw, raw[fresh]])
+
+        warehouses = np.array([
+            self._warehouse_codes.setdefault(w, len(self._warehouse_codes))
+            for w in events["warehouse_id"].tolist()
+        ], dtype=np.int64)
+        self._warehouse[positions[known]] = warehouses[known]
+        self._warehouse = np.concatenate([self._warehouse, warehouses[fresh]])
+
+        for offset, i in enumerate(fresh.tolist()):
+            row = self.size + offset
+            self._rows[keys[i]] = row
+            self._item_rows.setdefault(keys[i][0], []).append(row)
+        self.size += len(fresh)
+        self._scaled = scale(self._raw)
+
+    def target(self, item_id: str, warehouse_id: Optional[str] = None) -> Optional[int]:
+        """Row of the item's most recent stockout (at `warehouse_id` if given)"""
+        rows = np.asarray(self._item_rows.get(item_id, []), dtype=np.int64)
+        if warehouse_id is not None:
+            rows = rows[self._columns["warehouse_id"][rows] == warehouse_id]
+        if not len(rows):
+            return None
+        dates = self._columns["stockout_date"][rows].astype("datetime64[D]")
+        # Latest date first, then the first warehouse, like get_latest_stockout
+        order = np.lexsort((self._columns["warehouse_id"][rows].astype(str), -dates.astype(np.int64)))
+        return int(rows[order[0]])
+
+    def distances(self, row: int) -> np.ndarray:
+        """Distance from event `row` to every indexed event"""
+        delta = self._scaled - self._scaled[row]
+        squared = np.einsum("ij,ij->i", delta, delta)
+        squared += (WAREHOUSE_WEIGHT ** 2) * (self._warehouse != self._warehouse[row])
+        return np.sqrt(squared)
+
+    def nearest(self, item_id: str, limit: int = 5, warehouse_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """The closest event of up to `limit` other items to the item's latest stockout"""
+        with self.lock:
+            row = self.target(item_id, warehouse_id)
+            if row is None or limit <= 0:
+                return []
+
+            distance = self.distances(row)
+            distance[self._item_rows[item_id]] = np.inf
+            candidates = min(self.size, limit * CANDIDATES_PER_RESULT)
+            while True:
+                picked = np.argpartition(distance, candidates - 1)[:candidates] if candidates < self.size else np.arange(self.size)
+                picked = picked[np.argsort(distance[picked], kind="stable")]
+                picked = picked[np.isfinite(distance[picked])]
+                # Closest event per item
+                _, first = np.unique(self._columns["item_id"][picked].astype(str), return_index=True)
+                chosen = picked[np.sort(first)][:limit]
+                if len(chosen) >= limit or candidates >= self.size:
+                    break
+                candidates = min(self.size, candidates * 4)
+
+            return [
+                {**record, "distance": round(float(d), 4)}
+                for record, d in zip(self._records(chosen), distance[chosen])
+            ]
+
+    def _records(self, rows: np.ndarray) -> List[Dict[str, Any]]:
+        columns = {c: self._columns[c][rows] for c in EVENT_COLUMNS}
+        columns.update({name: np.round(self._raw[rows, i], 4) for i, name in enumerate(FEATURES)})
+        return Table("FAILURE_FINGERPRINTS", columns).records()
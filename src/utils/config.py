@@ -8,6 +8,13 @@ SSO_CLIENT_ID = os.getenv("SSO_CLIENT_ID")
 SSO_CLIENT_SECRET = os.getenv("SSO_CLIENT_SECRET")
 SSO_TENANT_ID = os.getenv("SSO_TENANT_ID")
 
+# Sign-in: "azure" (default) or "stub" (in-process stand-in for Azure AD and Graph, see auth/sso_stub.py)
+SSO_BACKEND = os.getenv("SSO_BACKEND", "azure").lower()
+SSO_AUTHORITY_HOST = os.getenv("SSO_AUTHORITY_HOST", "https://login.microsoftonline.com").rstrip("/")
+GRAPH_API_URL = os.getenv("GRAPH_API_URL", "https://graph.microsoft.com/v1.0").rstrip("/")
+SSO_TIMEOUT_SECONDS = float(os.getenv("SSO_TIMEOUT_SECONDS", "10"))
+SSO_MAX_CONCURRENCY = int(os.getenv("SSO_MAX_CONCURRENCY", "8"))
+
 IT_COMMS_MAIL = os.getenv("IT_COMMS_MAIL")
 
 AD_CLIENT_ID = os.getenv("AD_CLIENT_ID")
@@ -40,4 +47,49 @@ SF_REHIRE_USER_INFO_TABLE = "USER_REHIRE"
 
 ENVIRONMENT = os.getenv("ENVIRONMENT")
 
+# Analytics backend: "snowflake" (default) or "local" (in-process columnar store)
+ANALYTICS_BACKEND = os.getenv("ANALYTICS_BACKEND", "snowflake").lower()
+LOCAL_DATA_DIR = os.getenv("LOCAL_DATA_DIR", ".")
+
+# Read cache for the analytics queries; READ_CACHE_DIR enables the shared on-disk tier
+READ_CACHE_TTL = int(os.getenv("READ_CACHE_TTL", "300"))
+READ_CACHE_MAX_ENTRIES = int(os.getenv("READ_CACHE_MAX_ENTRIES", "1024"))
+READ_CACHE_DIR = os.getenv("READ_CACHE_DIR")
+DATA_VERSION_CHECK_SECONDS = int(os.getenv("DATA_VERSION_CHECK_SECONDS", "60"))
+
+# Cortex LLM calls run on their own connection pool, apart from the analytics queries
+CORTEX_MODEL = os.getenv("CORTEX_MODEL", "mistral-large")
+CORTEX_MAX_CONCURRENCY = int(os.getenv("CORTEX_MAX_CONCURRENCY", "4"))
+CORTEX_QUEUE_DEPTH = int(os.getenv("CORTEX_QUEUE_DEPTH", "16"))
+CORTEX_TIMEOUT_SECONDS = int(os.getenv("CORTEX_TIMEOUT_SECONDS", "60"))
+CORTEX_BATCH_SIZE = int(os.getenv("CORTEX_BATCH_SIZE", "500"))
+CORTEX_BATCH_TIMEOUT_SECONDS = int(os.getenv("CORTEX_BATCH_TIMEOUT_SECONDS", "900"))
+
+# Completions are memoized on disk by hash(model, prompt)
+CORTEX_CACHE_DIR = os.getenv("CORTEX_CACHE_DIR", ".cache")
+CORTEX_CACHE_TTL = int(os.getenv("CORTEX_CACHE_TTL", str(7 * 24 * 3600)))
+CORTEX_CACHE_MAX_ENTRIES = int(os.getenv("CORTEX_CACHE_MAX_ENTRIES", "10000"))
+
+# Background jobs: worker threads, and how long finished jobs and their results are kept
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+JOB_MAX_RETAINED = int(os.getenv("JOB_MAX_RETAINED", "500"))
+JOB_RESULT_DIR = os.getenv("JOB_RESULT_DIR")
+
+# Seconds between scheduled dashboard rollup refreshes in every worker (0 turns the timer off)
+ROLLUP_REFRESH_SECONDS = int(os.getenv("ROLLUP_REFRESH_SECONDS", "0"))
+
+# Statements at or above SLOW_QUERY_SECONDS are logged; the latest QUERY_HISTORY_SIZE are kept with their query IDs
+SLOW_QUERY_SECONDS = float(os.getenv("SLOW_QUERY_SECONDS", "10"))
+QUERY_HISTORY_SIZE = int(os.getenv("QUERY_HISTORY_SIZE", "500"))
+
+# Requests at or above SLOW_REQUEST_SECONDS are recorded; the latest SLOW_REQUEST_HISTORY are kept
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "2"))
+SLOW_REQUEST_HISTORY = int(os.getenv("SLOW_REQUEST_HISTORY", "200"))
+
+# Verified bearer tokens kept in memory, so repeat requests skip signature and claim checks
+JWT_CACHE_MAX_ENTRIES = int(os.getenv("JWT_CACHE_MAX_ENTRIES", "10000"))
+# SQLite store of logged-out tokens, shared by the worker processes on a host
+JWT_REVOCATION_DIR = os.getenv("JWT_REVOCATION_DIR", ".cache")
+
 FRONT_END_URI = f"{urlparse(REDIRECT_URI).scheme}://{urlparse(REDIRECT_URI).netloc}"
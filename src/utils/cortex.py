@@ -0,0 +1,232 @@
+"""
+Execution pool for SNOWFLAKE.CORTEX.COMPLETE.
+
+LLM calls take seconds, so they get their own engine, connection pool and
+worker threads. A burst of AI requests can then neither hold the connections
+the analytics queries need nor pile up without bound: at most
+CORTEX_MAX_CONCURRENCY calls run, CORTEX_QUEUE_DEPTH more may wait, and
+anything beyond that is refused straight away.
+
+Prompts are deterministic for a given event, so completions are memoized by
+hash(model, prompt) in memory and in a SQLite file that survives restarts
+and is shared by the workers on the host. Only the memory tier is consulted
+on the event loop: disk lookups run on a small executor of their own, and new
+completions are stored by the Cortex worker that fetched them.
+"""
+import asyncio
+import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from sqlalchemy import create_engine
+
+from src.utils.cache import LRUCache, SQLiteCache, TieredCache, digest
+from src.utils.config import (
+    CORTEX_BATCH_SIZE,
+    CORTEX_BATCH_TIMEOUT_SECONDS,
+    CORTEX_CACHE_DIR,
+    CORTEX_CACHE_MAX_ENTRIES,
+    CORTEX_CACHE_TTL,
+    CORTEX_MAX_CONCURRENCY,
+    CORTEX_MODEL,
+    CORTEX_QUEUE_DEPTH,
+    CORTEX_TIMEOUT_SECONDS,
+)
+from src.utils.database import DATABASE_URL
+from src.utils.metrics import InstrumentedQueuePool, instrument_engine
+
+cortex_engine = create_engine(
+    DATABASE_URL,
+    poolclass=InstrumentedQueuePool,
+    pool_size=CORTEX_MAX_CONCURRENCY,
+    max_overflow=0,               # The executor below never asks for more
+    pool_timeout=CORTEX_TIMEOUT_SECONDS,
+    pool_recycle=1800,
+    pool_pre_ping=True,
+)
+instrument_engine(cortex_engine, "cortex")
+
+cortex_executor = ThreadPoolExecutor(max_workers=CORTEX_MAX_CONCURRENCY, thread_name_prefix="cortex")
+# SQLite tier reads; writes to the file serialize anyway, so two threads are plenty
+_cache_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cortex-cache")
+
+cortex_cache = TieredCache(
+    LRUCache(max_entries=min(CORTEX_CACHE_MAX_ENTRIES, 1024), ttl=CORTEX_CACHE_TTL),
+    SQLiteCache(f"{CORTEX_CACHE_DIR}/cortex.sqlite", max_entries=CORTEX_CACHE_MAX_ENTRIES, ttl=CORTEX_CACHE_TTL),
+)
+
+# Identical prompts already on their way to Cortex; later callers await the same call
+_pending: Dict[str, "asyncio.Future[Optional[str]]"] = {}
+
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+
+
+class CortexBusy(Exception):
+    """Every Cortex slot and queue position is taken"""
+
+
+def complete(prompt: str, model: str = CORTEX_MODEL) -> Optional[str]:
+    """Blocking COMPLETE call on a pooled Cortex connection"""
+    conn = cortex_engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        try:
+            # Snowflake cancels the statement itself if it runs past the limit
+            cursor.execute(
+                "SELECT SNOWFLAKE.CORTEX.COMPLETE(%s, %s)",
+                (model, prompt),
+                timeout=CORTEX_TIMEOUT_SECONDS,
+            )
+            row = cursor.fetchone()
+            return row[0] if row else None
+        finally:
+            cursor.close()
+    finally:
+        # Returns the connection to the pool; the session stays logged in
+        conn.close()
+
+
+def complete_many(prompts: List[str], model: str = CORTEX_MODEL) -> List[Optional[str]]:
+    """
+    Blocking COMPLETE over many prompts in one set-based statement. The prompts
+    travel as a single JSON array and Snowflake fans the calls out itself.
+    """
+    conn = cortex_engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                """
+                SELECT f.index, SNOWFLAKE.CORTEX.COMPLETE(%s, f.value::STRING)
+                FROM TABLE(FLATTEN(INPUT => PARSE_JSON(%s))) f
+                """,
+                (model, json.dumps(prompts)),
+                timeout=CORTEX_BATCH_TIMEOUT_SECONDS,
+            )
+            completions: List[Optional[str]] = [None] * len(prompts)
+            for index, completion in cursor.fetchall():
+                completions[int(index)] = completion
+            return completions
+        finally:
+            cursor.close()
+    finally:
+        conn.close()
+
+
+def completion_key(prompt: str, model: str = CORTEX_MODEL) -> str:
+    return digest("cortex", model, prompt)
+
+
+def cached_completion(prompt: str, model: str = CORTEX_MODEL) -> Optional[str]:
+    return cortex_cache.get(completion_key(prompt, model))
+
+
+def store_completion(prompt: str, completion: Optional[str], model: str = CORTEX_MODEL) -> None:
+    # Empty answers are not kept, so the next request tries again
+    if completion:
+        cortex_cache.set(completion_key(prompt, model), completion)
+
+
+def _complete_and_store(prompt: str, model: str) -> Optional[str]:
+    completion = complete(prompt, model)
+    store_completion(prompt, completion, model)
+    return completion
+
+
+def _complete_many_and_store(prompts: List[str], model: str) -> List[Optional[str]]:
+    completions = complete_many(prompts, model)
+    for prompt, completion in zip(prompts, completions):
+        store_completion(prompt, completion, model)
+    return completions
+
+
+def _cached_completions(keys: List[str]) -> Dict[str, Optional[str]]:
+    """Blocking lookup of both tiers; disk hits are copied into memory"""
+    return {key: cortex_cache.get(key) for key in keys}
+
+
+async def _lookup(keys: List[str]) -> Dict[str, Optional[str]]:
+    """Memoized completions by key: memory on the loop, the disk tier off it"""
+    found = {key: cortex_cache.memory.get(key) for key in keys}
+    missing = [key for key, completion in found.items() if completion is None]
+    if missing and cortex_cache.disk is not None:
+        loop = asyncio.get_running_loop()
+        found.update(await loop.run_in_executor(_cache_executor, _cached_completions, missing))
+    return found
+
+
+def _acquire_slot() -> None:
+    global _in_flight
+    with _in_flight_lock:
+        if _in_flight >= CORTEX_MAX_CONCURRENCY + CORTEX_QUEUE_DEPTH:
+            raise CortexBusy("Cortex is at capacity, retry shortly")
+        _in_flight += 1
+
+
+def _release_slot(_future=None) -> None:
+    global _in_flight
+    with _in_flight_lock:
+        _in_flight -= 1
+
+
+def submit_many(prompts: List[str], model: str = CORTEX_MODEL) -> "Future[List[Optional[str]]]":
+    """
+    Queue one set-based statement on the Cortex pool, holding a slot until it
+    finishes. Raises CortexBusy when none is free; the completions are cached
+    by the worker that fetches them.
+    """
+    _acquire_slot()
+    future = cortex_executor.submit(_complete_many_and_store, prompts, model)
+    future.add_done_callback(_release_slot)
+    return future
+
+
+async def _complete_on_pool(prompt: str, model: str) -> Optional[str]:
+    _acquire_slot()
+    future = cortex_executor.submit(_complete_and_store, prompt, model)
+    # Fires when the worker finishes, or when a timeout cancels a call still in the queue
+    future.add_done_callback(_release_slot)
+    return await asyncio.wait_for(asyncio.wrap_future(future), timeout=CORTEX_TIMEOUT_SECONDS)
+
+
+async def run_cortex(prompt: str, model: str = CORTEX_MODEL) -> Optional[str]:
+    """
+    Memoized completion, else `complete` on the Cortex pool. Raises CortexBusy
+    when the queue is full and asyncio.TimeoutError when the call, queueing
+    included, exceeds the limit.
+    """
+    key = completion_key(prompt, model)
+    completion = (await _lookup([key]))[key]
+    if completion is not None:
+        return completion
+
+    pending = _pending.get(key)
+    if pending is None:
+        pending = asyncio.ensure_future(_complete_on_pool(prompt, model))
+        _pending[key] = pending
+        pending.add_done_callback(lambda _: _pending.pop(key, None))
+    # Shielded so one caller disconnecting does not cancel the call for the others
+    return await asyncio.shield(pending)
+
+
+async def run_cortex_many(prompts: List[str], model: str = CORTEX_MODEL) -> Dict[str, Optional[str]]:
+    """
+    Completion per distinct prompt. Memoized prompts are answered from the
+    cache; the rest go out CORTEX_BATCH_SIZE at a time, one statement each,
+    holding a single Cortex slot per statement. New completions are cached.
+    """
+    keys = {prompt: completion_key(prompt, model) for prompt in dict.fromkeys(prompts)}
+    cached = await _lookup(list(keys.values()))
+    results: Dict[str, Optional[str]] = {prompt: cached[key] for prompt, key in keys.items()}
+    missing = [prompt for prompt, completion in results.items() if completion is None]
+
+    for start in range(0, len(missing), CORTEX_BATCH_SIZE):
+        chunk = missing[start:start + CORTEX_BATCH_SIZE]
+        future = submit_many(chunk, model)
+        completions = await asyncio.wait_for(
+            asyncio.wrap_future(future), timeout=CORTEX_BATCH_TIMEOUT_SECONDS
+        )
+        results.update(zip(chunk, completions))
+    return results
@@ -1,11 +1,17 @@
 # app/database.py
 
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import QueuePool
 
 from src.utils.config import SF_USER, SF_PASSWORD, SF_ACCOUNT, SF_WAREHOUSE, SF_SCHEMA, SF_DATABASE, SF_ROLE
+from src.utils.metrics import InstrumentedQueuePool, instrument_engine, query_label
 
 user = SF_USER
 password = SF_PASSWORD
@@ -19,15 +25,19 @@ role = SF_ROLE
 DATABASE_URL = f"snowflake://{user}:{password}@{account}/{database}/{schema}?warehouse={warehouse}&role={role}"
 
 
+POOL_SIZE = 5
+MAX_OVERFLOW = 10
+
 # Configure the connection pool
 engine = create_engine(
     DATABASE_URL,
-    poolclass=QueuePool,  # Use the QueuePool for connection pooling
-    pool_size=5,          # Max number of connections to keep in the pool
-    max_overflow=10,      # Allow up to 10 additional connections to be created if needed
+    poolclass=InstrumentedQueuePool,  # QueuePool that reports checkout waits
+    pool_size=POOL_SIZE,  # Max number of connections to keep in the pool
+    max_overflow=MAX_OVERFLOW,  # Allow up to 10 additional connections to be created if needed
     pool_timeout=30,      # Timeout (in seconds) to wait for a connection from the pool
     pool_recycle=1800,    # Connections are recycled after this many seconds
 )
+instrument_engine(engine, "analytics")
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -39,4 +49,68 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# Worker threads for blocking queries. Sized to the pool so a query never waits
+# on a connection, and kept apart from Starlette's threadpool so slow queries
+# cannot starve auth or health endpoints.
+db_executor = ThreadPoolExecutor(max_workers=POOL_SIZE + MAX_OVERFLOW, thread_name_prefix="db")
+
+
+_DONE = object()
+
+
+@contextmanager
+def session_scope():
+    """Session for code that runs outside a request (executor threads, jobs)"""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def _call_with_session(fn, args, kwargs):
+    with query_label(fn.__name__), session_scope() as db:
+        return fn(db, *args, **kwargs)
+
+
+async def run_db(fn, *args, **kwargs):
+    """Run `fn(db, *args, **kwargs)` on the DB executor with its own session"""
+    loop = asyncio.get_running_loop()
+    # Carry the caller's context (e.g. the request's timings) onto the worker thread
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(db_executor, partial(context.run, _call_with_session, fn, args, kwargs))
+
+
+def _iterate_with_session(fn, args, kwargs):
+    with session_scope() as db:
+        yield from fn(db, *args, **kwargs)
+
+
+def _labelled(label, step, *args):
+    # Each hop may land on a different worker thread, so the label is set per hop
+    with query_label(label):
+        return step(*args)
+
+
+async def stream_db(fn, *args, **kwargs):
+    """
+    Iterate the generator `fn(db, *args, **kwargs)` on the DB executor with its
+    own session, one item per hop, so a long result never blocks the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    iterator = _iterate_with_session(fn, args, kwargs)
+    try:
+        while True:
+            item = await loop.run_in_executor(
+                db_executor, partial(context.run, _labelled, fn.__name__, next, iterator, _DONE)
+            )
+            if item is _DONE:
+                break
+            yield item
+    finally:
+        # Closes the session on the worker side too, e.g. when the client disconnects
+        await loop.run_in_executor(db_executor, partial(context.run, _labelled, fn.__name__, iterator.close))
@@ -0,0 +1,78 @@
+"""
+Shape-preserving downsampling for chart series.
+
+Largest-Triangle-Three-Buckets (LTTB) keeps the first and last points and,
+from each of `max_points - 2` equal buckets in between, the point that forms
+the largest triangle with the point kept from the previous bucket and the
+mean of the next one. Peaks, troughs and step changes survive; flat runs are
+thinned out.
+"""
+from datetime import date, datetime
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+
+def _numeric(values: Sequence[Any]) -> np.ndarray:
+    """x values as floats; dates and datetimes become microseconds"""
+    if len(values) and isinstance(values[0], (date, datetime, np.datetime64)):
+        return np.asarray(values, dtype="datetime64[us]").astype(np.int64).astype(np.float64)
+    return np.asarray(values, dtype=np.float64)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """Positions of the points LTTB keeps, in order; `x` must be sorted"""
+    n = len(x)
+    if max_points <= 0 or n <= max_points:
+        return np.arange(n)
+    if max_points < 3:
+        return np.array([0, n - 1][:max_points])
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64))
+    # Bucket edges over the points between the first and the last
+    edges = np.arange(max_points - 1) * (n - 2) // (max_points - 2) + 1
+    kept = np.empty(max_points, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+
+    previous = 0
+    for b in range(max_points - 2):
+        start, end = edges[b], max(edges[b + 1], edges[b] + 1)
+        next_start, next_end = end, (edges[b + 2] if b + 2 < len(edges) else n)
+        next_end = max(next_end, next_start + 1)
+        mean_x = x[next_start:next_end].mean()
+        mean_y = y[next_start:next_end].mean()
+
+        px, py = x[previous], y[previous]
+        area = np.abs((px - mean_x) * (y[start:end] - py) - (px - x[start:end]) * (mean_y - py))
+        previous = start + int(np.argmax(area))
+        kept[b + 1] = previous
+    return kept
+
+
+def downsample_records(
+    records: List[Dict[str, Any]],
+    x_key: str,
+    y_key: str,
+    max_points: int,
+    series_keys: Sequence[str] = ()
+) -> List[Dict[str, Any]]:
+    """
+    Keep at most `max_points` records per series (rows sharing `series_keys`)
+    with LTTB over (x_key, y_key). Records must be ordered by `x_key` within
+    each series; the kept ones stay in their original order.
+    """
+    if max_points <= 0 or len(records) <= max_points:
+        return records
+
+    series: Dict[tuple, List[int]] = {}
+    for i, record in enumerate(records):
+        series.setdefault(tuple(record.get(k) for k in series_keys), []).append(i)
+
+    keep = []
+    for positions in series.values():
+        x = _numeric([records[i][x_key] for i in positions])
+        y = [records[i][y_key] for i in positions]
+        y = np.array([np.nan if v is None else v for v in y], dtype=np.float64)
+        keep.extend(np.asarray(positions)[lttb_indices(x, y, max_points)].tolist())
+    return [records[i] for i in sorted(keep)]
@@ -0,0 +1,263 @@
+"""
+Streaming encoders for tabular exports.
+
+An encoder turns batches of row dicts into bytes one batch at a time, so a
+report of any size is written with the memory of a single batch. Arrow and
+Parquet need pyarrow, which is optional.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+    pq = None
+
+# Format name -> media type
+EXPORT_FORMATS: Dict[str, str] = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Media types accepted in an Accept header besides the ones above
+_MEDIA_ALIASES: Dict[str, str] = {
+    "application/jsonl": "ndjson",
+    "application/json-lines": "ndjson",
+    "application/vnd.apache.arrow.file": "arrow",
+    "application/x-parquet": "parquet",
+    "*/*": "json",
+    "application/*": "json",
+    "text/*": "csv",
+}
+
+ARROW_FORMATS = ("arrow", "parquet")
+ARROW_AVAILABLE = pa is not None
+
+
+class UnsupportedFormat(ValueError):
+    pass
+
+
+def negotiate_format(fmt: Optional[str], accept: Optional[str]) -> str:
+    """Export format from an explicit `format` parameter, else the Accept header (JSON by default)"""
+    if fmt:
+        fmt = fmt.lower()
+        if fmt not in EXPORT_FORMATS:
+            raise UnsupportedFormat(f"Unknown format '{fmt}'")
+        return fmt
+    if not accept:
+        return "json"
+
+    by_media = {media: name for name, media in EXPORT_FORMATS.items()}
+    by_media.update(_MEDIA_ALIASES)
+    ranges = []
+    for position, part in enumerate(accept.split(",")):
+        media, _, params = part.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        ranges.append((-quality, position, media.strip().lower()))
+
+    for neg_quality, _, media in sorted(ranges):
+        if neg_quality < 0 and media in by_media:
+            return by_media[media]
+    raise UnsupportedFormat(f"None of '{accept}' can be produced")
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _dumps(row: Dict[str, Any]) -> str:
+    return json.dumps(row, default=_json_default, separators=(",", ":"))
+
+
+class Encoder:
+    """begin() once, encode() per batch, end() once; each returns the bytes to send"""
+
+    def __init__(self, columns: Dict[str, str]):
+        self.columns = columns
+
+    def begin(self) -> bytes:
+        return b""
+
+    def encode(self, rows: List[Dict[str, Any]]) -> bytes:
+        raise NotImplementedError
+
+    def end(self) -> bytes:
+        return b""
+
+
+class JSONEncoder(Encoder):
+    """A single JSON array, the same body the non-streaming endpoint returned"""
+
+    def begin(self) -> bytes:
+        self._first = True
+        return b"["
+
+    def encode(self, rows: List[Dict[str, Any]]) -> bytes:
+        if not rows:
+            return b""
+        body = ",".join(_dumps(row) for row in rows)
+        if not self._first:
+            body = "," + body
+        self._first = False
+        return body.encode("utf-8")
+
+    def end(self) -> bytes:
+        return b"]"
+
+
+class NDJSONEncoder(Encoder):
+    def encode(self, rows: List[Dict[str, Any]]) -> bytes:
+        return "".join(_dumps(row) + "\n" for row in rows).encode("utf-8")
+
+
+class CSVEncoder(Encoder):
+    def _write(self, rows: Iterable[Iterable[Any]]) -> bytes:
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="\n").writerows(rows)
+        return buffer.getvalue().encode("utf-8")
+
+    def begin(self) -> bytes:
+        return self._write([list(self.columns)])
+
+    def encode(self, rows: List[Dict[str, Any]]) -> bytes:
+        names = list(self.columns)
+        return self._write(
+            ["" if row.get(name) is None else row.get(name) for name in names]
+            for row in rows
+        )
+
+
+_ARROW_TYPES = {
+    "str": lambda: pa.string(),
+    "int": lambda: pa.int64(),
+    "float": lambda: pa.float64(),
+    "bool": lambda: pa.bool_(),
+    "date": lambda: pa.date32(),
+    "datetime": lambda: pa.timestamp("us"),
+}
+
+
+class _Sink(io.RawIOBase):
+    """Write-only file that hands out what was written since the last drain"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        # Parquet footers hold absolute offsets, so this never resets
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class _ArrowEncoder(Encoder):
+    def __init__(self, columns: Dict[str, str]):
+        if pa is None:
+            raise UnsupportedFormat("pyarrow is not installed")
+        super().__init__(columns)
+        self.schema = pa.schema([(name, _ARROW_TYPES[kind]()) for name, kind in columns.items()])
+        self._sink = _Sink()
+
+    def _batch(self, rows: List[Dict[str, Any]]):
+        return pa.RecordBatch.from_pylist(rows, schema=self.schema)
+
+
+class ArrowEncoder(_ArrowEncoder):
+    """Arrow IPC stream format"""
+
+    def begin(self) -> bytes:
+        self._writer = pa.ipc.new_stream(self._sink, self.schema)
+        return self._sink.drain()
+
+    def encode(self, rows: List[Dict[str, Any]]) -> bytes:
+        if rows:
+            self._writer.write_batch(self._batch(rows))
+        return self._sink.drain()
+
+    def end(self) -> bytes:
+        self._writer.close()
+        return self._sink.drain()
+
+
+class ParquetEncoder(_ArrowEncoder):
+    """One row group per batch; the footer goes out with the last chunk"""
+
+    def begin(self) -> bytes:
+        self._writer = pq.ParquetWriter(self._sink, self.schema)
+        return self._sink.drain()
+
+    def encode(self, rows: List[Dict[str, Any]]) -> bytes:
+        if rows:
+            self._writer.write_batch(self._batch(rows))
+        return self._sink.drain()
+
+    def end(self) -> bytes:
+        self._writer.close()
+        return self._sink.drain()
+
+
+_ENCODERS = {
+    "json": JSONEncoder,
+    "ndjson": NDJSONEncoder,
+    "csv": CSVEncoder,
+    "arrow": ArrowEncoder,
+    "parquet": ParquetEncoder,
+}
+
+
+def make_encoder(fmt: str, columns: Dict[str, str]) -> Encoder:
+    """`columns` maps names to the column kinds used by columnar.TABLE_SCHEMAS"""
+    return _ENCODERS[fmt](columns)
+
+
+def encode_batches(encoder: Encoder, batches: Iterable[List[Dict[str, Any]]]) -> Iterable[bytes]:
+    """Encoded chunks for `batches`; the first batch is fetched before anything is emitted"""
+    batches = iter(batches)
+    first = next(batches, None)
+    yield encoder.begin()
+    if first is not None:
+        yield encoder.encode(first)
+        for rows in batches:
+            yield encoder.encode(rows)
+    yield encoder.end()
+
+
+async def prepend(first: bytes, rest: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    yield first
+    async for chunk in rest:
+        yield chunk
@@ -0,0 +1,199 @@
+"""
+Prometheus metrics for the database layer.
+
+Engine event hooks time every statement, count the rows it returned or
+changed, and count failures; InstrumentedQueuePool times every connection
+checkout and counts the ones that found the pool exhausted. Statement and
+checkout series are labelled with the service function they ran for (the
+`fn` given to run_db / stream_db, or the job function), read from a context
+variable that `query_label` sets.
+
+Snowflake query IDs are not labels (one series per query would be
+unbounded); the latest statements are kept in a ring buffer instead, so a
+slow one can be looked up in QUERY_HISTORY.
+
+While a request is being served, `track_request` also adds each statement's
+time, checkout wait and query ID to that request's RequestTimings, so the
+request middleware can split its latency into DB and Python time.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from src.utils.config import QUERY_HISTORY_SIZE, SLOW_QUERY_SECONDS
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "Statement execution time", ["function"], buckets=LATENCY_BUCKETS
+)
+QUERY_ROWS = Counter("db_query_rows_total", "Rows returned or changed by statements", ["function"])
+QUERY_ERRORS = Counter("db_query_errors_total", "Statements that raised", ["function"])
+CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_wait_seconds", "Time to get a connection from the pool", ["pool", "function"],
+    buckets=LATENCY_BUCKETS
+)
+POOL_WAITS = Counter(
+    "db_pool_waits_total", "Checkouts that found no idle connection and no overflow left", ["pool", "function"]
+)
+POOL_TIMEOUTS = Counter("db_pool_timeouts_total", "Checkouts that gave up after pool_timeout", ["pool", "function"])
+POOL_SIZE = Gauge("db_pool_size", "Connections the pool keeps", ["pool"])
+POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Connections in use", ["pool"])
+POOL_OVERFLOW = Gauge("db_pool_overflow", "Connections open beyond the pool size", ["pool"])
+
+# Query IDs kept per request
+REQUEST_QUERY_IDS = 20
+
+_function: ContextVar[str] = ContextVar("db_function", default="other")
+
+_statements: deque = deque(maxlen=QUERY_HISTORY_SIZE)
+_statements_lock = threading.Lock()
+
+
+@contextmanager
+def query_label(function: str):
+    """Attribute the statements and checkouts inside the block to `function`"""
+    token = _function.set(function)
+    try:
+        yield
+    finally:
+        _function.reset(token)
+
+
+def current_label() -> str:
+    return _function.get()
+
+
+class RequestTimings:
+    """Database time spent on behalf of one request"""
+
+    def __init__(self):
+        self.db_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+        self.statements = 0
+        self.query_ids: List[str] = []
+        self._lock = threading.Lock()
+
+    def add_statement(self, seconds: float, query_id: Optional[str]) -> None:
+        with self._lock:
+            self.db_seconds += seconds
+            self.statements += 1
+            if query_id and len(self.query_ids) < REQUEST_QUERY_IDS:
+                self.query_ids.append(query_id)
+
+    def add_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.pool_wait_seconds += seconds
+
+
+_request: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def track_request():
+    """Collect the DB time of the statements run inside the block (and in run_db calls it makes)"""
+    timings = RequestTimings()
+    token = _request.set(timings)
+    try:
+        yield timings
+    finally:
+        _request.reset(token)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that reports checkout waits, labelled with its name and the calling function"""
+
+    name = "db"
+
+    def _do_get(self):
+        function = current_label()
+        exhausted = self.checkedin() == 0 and self._max_overflow > -1 and self.overflow() >= self._max_overflow
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            POOL_TIMEOUTS.labels(self.name, function).inc()
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            CHECKOUT_SECONDS.labels(self.name, function).observe(waited)
+            timings = _request.get()
+            if timings is not None:
+                timings.add_wait(waited)
+            if exhausted:
+                POOL_WAITS.labels(self.name, function).inc()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.name = self.name
+        return pool
+
+
+def instrument_engine(engine: Engine, name: str) -> None:
+    """Statement hooks on `engine` and pool gauges under `name`"""
+    engine.pool.name = name
+    # engine.pool is replaced on dispose(), so read it at scrape time
+    POOL_SIZE.labels(name).set_function(lambda: engine.pool.size())
+    POOL_CHECKED_OUT.labels(name).set_function(lambda: engine.pool.checkedout())
+    POOL_OVERFLOW.labels(name).set_function(lambda: max(engine.pool.overflow(), 0))
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        function = current_label()
+        rows = cursor.rowcount if cursor.rowcount is not None and cursor.rowcount >= 0 else 0
+        query_id = getattr(cursor, "sfqid", None)
+        QUERY_SECONDS.labels(function).observe(elapsed)
+        QUERY_ROWS.labels(function).inc(rows)
+        _remember(function, query_id, elapsed, rows, statement)
+        timings = _request.get()
+        if timings is not None:
+            timings.add_statement(elapsed, query_id)
+        if elapsed >= SLOW_QUERY_SECONDS:
+            logger.warning("Slow statement in %s: %.2fs, %d rows, query id %s", function, elapsed, rows, query_id)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        if context.connection is not None and context.connection.info.get("query_start"):
+            context.connection.info["query_start"].pop()
+        QUERY_ERRORS.labels(current_label()).inc()
+
+
+def _remember(function: str, query_id: Any, seconds: float, rows: int, statement: str) -> None:
+    with _statements_lock:
+        _statements.append({
+            "function": function,
+            "query_id": query_id,
+            "seconds": round(seconds, 4),
+            "rows": rows,
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "statement": " ".join(statement.split())[:200],
+        })
+
+
+def recent_statements(limit: int = 100) -> List[Dict[str, Any]]:
+    """Latest statements with their Snowflake query IDs, newest first"""
+    with _statements_lock:
+        return list(reversed(_statements))[:limit]
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Body and content type of a Prometheus scrape"""
+    return generate_latest(), CONTENT_TYPE_LATEST
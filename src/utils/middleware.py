@@ -0,0 +1,130 @@
+"""
+Request latency middleware.
+
+Records, per method and route template (`/events/items/{itemId}/timeline`,
+not the concrete path), a latency histogram by status and the response
+size, plus the requests in flight per method (the route is only known once
+routing has run). A request that takes SLOW_REQUEST_SECONDS or longer is
+written to a bounded ring buffer with its route, parameters, user, and its
+time split into DB time (statements on the analytics engine, see
+metrics.track_request), pool wait and the rest (Python, serialization,
+executor queueing, Cortex calls).
+"""
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl
+
+from prometheus_client import Gauge, Histogram
+
+from src.utils.config import SLOW_REQUEST_HISTORY, SLOW_REQUEST_SECONDS
+from src.utils.metrics import LATENCY_BUCKETS, track_request
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Request latency", ["method", "route", "status"], buckets=LATENCY_BUCKETS
+)
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests being served", ["method"])
+RESPONSE_BYTES = Histogram(
+    "http_response_size_bytes", "Response body size", ["method", "route"],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+)
+
+# Route label of requests no route matches, so scans cannot mint series
+UNMATCHED = "unmatched"
+
+
+class SlowRequestLog:
+    """The latest slow requests, newest first"""
+
+    def __init__(self, max_entries: int = SLOW_REQUEST_HISTORY):
+        self._entries: deque = deque(maxlen=max_entries)
+        self._lock = threading.Lock()
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries.append(entry)
+
+    def records(self, limit: int = 50, route: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            entries = list(reversed(self._entries))
+        if route is not None:
+            entries = [e for e in entries if e["route"] == route]
+        return entries[:limit]
+
+
+slow_requests = SlowRequestLog()
+
+
+def _route_template(scope) -> str:
+    """
+    Path template of the route that served the request; routing puts the
+    matched route in the scope, and an included router's prefix is already
+    part of its path
+    """
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED
+
+
+class RequestMetricsMiddleware:
+    """Pure ASGI middleware, so streamed responses are timed to their last chunk"""
+
+    def __init__(self, app, slow_seconds: float = SLOW_REQUEST_SECONDS, log: SlowRequestLog = slow_requests):
+        self.app = app
+        self.slow_seconds = slow_seconds
+        self.log = log
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        # authorize_token stores the caller here through request.state
+        state = scope.setdefault("state", {})
+        status, size = 500, 0
+
+        async def send_measured(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        in_flight = REQUESTS_IN_FLIGHT.labels(method)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            with track_request() as timings:
+                await self.app(scope, receive, send_measured)
+        finally:
+            elapsed = time.perf_counter() - start
+            in_flight.dec()
+            route = _route_template(scope)
+            REQUEST_SECONDS.labels(method, route, str(status)).observe(elapsed)
+            RESPONSE_BYTES.labels(method, route).observe(size)
+            if elapsed >= self.slow_seconds:
+                self.log.record(self._slow_entry(scope, route, state, status, size, elapsed, timings))
+
+    @staticmethod
+    def _slow_entry(scope, route, state, status, size, elapsed, timings) -> Dict[str, Any]:
+        return {
+            "at": datetime.now(timezone.utc).isoformat(),
+            "method": scope["method"],
+            "route": route,
+            "path": scope["path"],
+            "path_params": dict(scope.get("path_params") or {}),
+            "query_params": dict(parse_qsl(scope.get("query_string", b"").decode("latin-1"))),
+            "user": state.get("user"),
+            "status": status,
+            "response_bytes": size,
+            "seconds": round(elapsed, 4),
+            "db_seconds": round(timings.db_seconds, 4),
+            "pool_wait_seconds": round(timings.pool_wait_seconds, 4),
+            # Concurrent run_db calls can overlap, so DB time may exceed the wall time
+            "python_seconds": round(max(elapsed - timings.db_seconds - timings.pool_wait_seconds, 0.0), 4),
+            "statements": timings.statements,
+            "query_ids": list(timings.query_ids),
+        }
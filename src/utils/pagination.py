@@ -0,0 +1,44 @@
+"""
+Opaque cursors for keyset pagination.
+
+A cursor holds the sort order it was issued for and the sort key of the
+last row on the page. The next page continues strictly after that key, so
+each page costs the same however deep the client has paged.
+"""
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, Sequence, Tuple
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} cannot go in a cursor")
+
+
+def encode_cursor(sort: str, key: Sequence[Any]) -> str:
+    payload = json.dumps([sort, list(key)], default=_default, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[date, str, str]:
+    """
+    (stockout_date, item_id, warehouse_id) stored in `cursor`; ValueError if it
+    is malformed or from another sort order, so a bad cursor is a 400 and
+    never reaches the query
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, key = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception as e:
+        raise ValueError("Malformed cursor") from e
+    if cursor_sort != sort:
+        raise ValueError("Cursor was issued for a different sort order")
+    if not isinstance(key, list) or len(key) != 3 or not all(isinstance(part, str) for part in key):
+        raise ValueError("Malformed cursor")
+    try:
+        stockout_date = date.fromisoformat(key[0])
+    except ValueError as e:
+        raise ValueError("Malformed cursor") from e
+    return stockout_date, key[1], key[2]
@@ -0,0 +1,88 @@
+"""
+Result fetching for the Snowflake reads.
+
+`dict(row._mapping)` builds a Row proxy and a mapping view for every row. On
+Snowflake the connector can hand back whole result chunks as Arrow tables,
+which pyarrow turns into dicts in C. Other drivers, or queries the connector
+cannot serve as Arrow, fall back to zipping plain tuples with the column
+names, which still skips the Row proxy.
+"""
+import logging
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+
+def _arrow_batches(result) -> Optional[Iterator[Any]]:
+    """Arrow tables for the rest of `result`, or None when they are not available"""
+    if pa is None:
+        return None
+    cursor = getattr(result, "cursor", None)
+    fetch = getattr(cursor, "fetch_arrow_batches", None)
+    if fetch is None:
+        return None
+    try:
+        return fetch()
+    except Exception:
+        # Non-Arrow result format (e.g. SHOW/DESCRIBE) or unsupported platform
+        logger.debug("Arrow fetch unavailable, using row fetch", exc_info=True)
+        return None
+
+
+def _to_dicts(table, keys: List[str]) -> List[Dict[str, Any]]:
+    """
+    Rows of an Arrow chunk with the types the row path returns: NUMBER(p, 0)
+    as int, NUMBER(p, s > 0) as Decimal (left as decimal128, never squeezed
+    through float64)
+    """
+    beyond_int64 = []
+    for i, column in enumerate(table.schema):
+        if pa.types.is_decimal(column.type) and column.type.scale == 0:
+            try:
+                table = table.set_column(i, column.name, table.column(i).cast(pa.int64()))
+            except pa.ArrowInvalid:
+                # Values past int64 stay decimal here and become Python ints below
+                beyond_int64.append(keys[i])
+    rows = table.rename_columns(keys).to_pylist()
+    for key in beyond_int64:
+        for row in rows:
+            if row[key] is not None:
+                row[key] = int(row[key])
+    return rows
+
+
+def iter_dict_batches(result, batch_size: int = 5000) -> Iterator[List[Dict[str, Any]]]:
+    """Rows of `result` as lists of dicts, one list per fetched chunk"""
+    keys = list(result.keys())
+    batches = _arrow_batches(result)
+    try:
+        if batches is not None:
+            for table in batches:
+                if table.num_rows:
+                    yield _to_dicts(table, keys)
+            return
+        while True:
+            rows = result.fetchmany(batch_size)
+            if not rows:
+                return
+            yield [dict(zip(keys, row)) for row in rows]
+    finally:
+        result.close()
+
+
+def rows_to_dicts(result) -> List[Dict[str, Any]]:
+    """All rows of `result` as dicts keyed by column name"""
+    return [row for rows in iter_dict_batches(result) for row in rows]
+
+
+def first_row(result) -> Optional[Dict[str, Any]]:
+    """First row of `result` as a dict, or None when there are no rows"""
+    keys = list(result.keys())
+    row = result.fetchone()
+    result.close()
+    return dict(zip(keys, row)) if row is not None else None